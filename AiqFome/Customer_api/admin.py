@@ -1,3 +1,230 @@
+"""
+    Admin para tabelas grandes (milhões de linhas):
+
+    - contagem estimada na listagem sem filtros, em vez de COUNT(*) na tabela inteira;
+    - busca só por colunas indexadas (id, e-mail exato, api_id e o índice FTS de produtos);
+    - chaves estrangeiras com raw id/autocomplete, sem <select> com a tabela inteira;
+    - ações em lote com UPDATE/DELETE por conjunto no lugar do delete_selected, que
+      carrega cada objeto (e cada relacionado) na memória.
+
+    Favoritos são listados um shard por vez (filtro "shard"); com tudo no 'default' os
+    produtos e clientes vêm no mesmo SELECT (list_select_related), com shards são
+    buscados em uma consulta por página (prefetch_related), já que o JOIN não atravessa bancos.
+"""
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from . import catalog, purge, search
+from .models import Customer, FavoriteProduct, Product
+from .routers import get_shards, shard_for
+
+RECOUNT_BATCH_SIZE = 500
+
+
+def estimate_rows(model, using):
+    """Total aproximado de linhas sem varrer a tabela (None se o banco não oferece estimativa)"""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Estatística do planner, atualizada pelo autovacuum/ANALYZE
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # MIN/MAX do rowid saem das pontas da B-tree; buracos de ids apagados superestimam um pouco
+            cursor.execute(f'SELECT MAX(rowid) - MIN(rowid) + 1 FROM {table}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+def is_unfiltered(queryset):
+    # Mesmo WHERE do manager padrão: sem busca nem filtros da changelist
+    return queryset.query.where == queryset.model._default_manager.all().query.where
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator que usa a estimativa do banco quando a listagem não está filtrada e a tabela é grande"""
+    exact_limit = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and is_unfiltered(queryset):
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_limit:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # O "N no total" da changelist faria um COUNT(*) a mais em toda busca
+    show_full_result_count = False
+    list_per_page = 50
+    # Ordem pelo índice da chave primária (também no autocomplete)
+    ordering = ('-pk',)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        # A confirmação padrão lista cada objeto relacionado (todos os favoritos de um cliente)
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+
+class CategoryFilter(admin.SimpleListFilter):
+    """Categorias da tabela de facetas (em cache), sem SELECT DISTINCT em Product"""
+    title = 'categoria'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        return [(category, f'{category} ({total})') for category, total in catalog.get_category_facets().items()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category=self.value())
+        return queryset
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Shard listado; a seleção em si é aplicada em FavoriteProductAdmin.get_queryset"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        shards = get_shards()
+        return [(alias, alias) for alias in shards] if len(shards) > 1 else []
+
+    def choices(self, changelist):
+        current = self.value() or get_shards()[0]
+        for value, label in self.lookup_choices:
+            yield {
+                'selected': current == value,
+                'query_string': changelist.get_query_string({self.parameter_name: value}),
+                'display': label,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset
+
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'email', 'date_register')
+    # Apenas para habilitar a caixa de busca; a busca real está em get_search_results
+    search_fields = ('email',)
+    search_help_text = 'Id do cliente ou e-mail completo'
+    actions = ['soft_delete_selected']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=term), False
+        # Igualdade exata: usa o índice único de e-mail (LIKE/ILIKE varreria a tabela)
+        return queryset.filter(email=term), False
+
+    def delete_model(self, request, obj):
+        purge.soft_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        purge.soft_delete_many(queryset)
+
+    @admin.action(description='Remover clientes selecionados (favoritos apagados pelo purge)', permissions=['delete'])
+    def soft_delete_selected(self, request, queryset):
+        removed = purge.soft_delete_many(queryset)
+        self.message_user(request, f'{removed} cliente(s) removido(s)')
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('id', 'api_id', 'title', 'category', 'price', 'favorite_count')
+    list_filter = (CategoryFilter,)
+    search_fields = ('title',)
+    search_help_text = 'Id, api_id ou palavras do título, descrição e categoria'
+    actions = ['recount_favorites']
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=term) | queryset.filter(api_id=term), False
+        if search.fts_available(queryset.db):
+            match = search.build_match(term)
+            if not match:
+                return queryset.none(), False
+            return queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s', [match]
+            )), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.action(description='Recalcular contador de favoritos', permissions=['change'])
+    def recount_favorites(self, request, queryset):
+        product_ids = queryset.order_by().values_list('pk', flat=True)
+        batch, updated = [], 0
+        for product_id in product_ids.iterator(chunk_size=RECOUNT_BATCH_SIZE):
+            batch.append(product_id)
+            if len(batch) == RECOUNT_BATCH_SIZE:
+                updated += catalog.recount_favorites(batch)
+                batch = []
+        if batch:
+            updated += catalog.recount_favorites(batch)
+        self.message_user(request, f'{updated} produto(s) com contador corrigido')
+
+
+@admin.register(FavoriteProduct)
+class FavoriteProductAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'product_id', 'price', 'date_addition')
+    list_filter = (ShardFilter,)
+    # Sem página de edição: o pk de um favorito só é único dentro do shard
+    list_display_links = None
+    raw_id_fields = ('customer',)
+    autocomplete_fields = ('product_id',)
+    search_fields = ('customer__id',)
+    search_help_text = 'Id do cliente'
+    actions = ['delete_selected_favorites']
+
+    @admin.display(description='Preço')
+    def price(self, obj):
+        return obj.product_id.price
+
+    def get_shard(self, request):
+        alias = request.GET.get(ShardFilter.parameter_name)
+        return alias if alias in get_shards() else get_shards()[0]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).using(self.get_shard(request))
+        if len(get_shards()) > 1:
+            queryset = queryset.prefetch_related('customer', 'product_id')
+        return queryset
+
+    def get_list_select_related(self, request):
+        return ('customer', 'product_id') if len(get_shards()) == 1 else ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if not term.isdigit():
+            return queryset.none(), False
+        # Vai direto ao shard do cliente; índice (customer, product_id) do unique_together
+        return queryset.using(shard_for(int(term))).filter(customer_id=term), False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
-# Register your models here.
+    @admin.action(description='Remover favoritos selecionados', permissions=['delete'])
+    def delete_selected_favorites(self, request, queryset):
+        config = purge.get_config()
+        removed = purge.delete_favorites(queryset, config['BATCH_SIZE'], config['PAUSE'])
+        self.message_user(request, f'{removed} favorito(s) removido(s)')
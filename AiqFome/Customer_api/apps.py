@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CustomerApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Customer_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .middleware import check_admin_scope
+
+        checks.register(check_admin_scope)
@@ -0,0 +1,166 @@
+import contextlib
+import contextvars
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import CategoryFacet, FavoriteProduct, Product
+from .routers import get_shards
+
+FACETS_CACHE_KEY = 'catalog:category-facets'
+FACETS_CACHE_TIMEOUT = 60 * 60
+
+POPULAR_CACHE_KEY = 'catalog:popular'
+POPULAR_CACHE_TIMEOUT = 30
+POPULAR_MAX = 100
+
+_pending_favorite_counts = contextvars.ContextVar('pending_favorite_counts', default=None)
+
+
+def update_category_counts(deltas):
+    """
+        Aplica variações de contagem por categoria ({categoria: +n/-n}) com F(),
+        sem recalcular o GROUP BY. O cache é invalidado após o commit.
+        Decrementos param em zero: uma faceta divergente não pode falhar a escrita do
+        produto (CHECK do PositiveIntegerField); rebuild_category_facets corrige a contagem.
+    """
+    deltas = {category: delta for category, delta in Counter(deltas).items() if delta}
+    if not deltas:
+        return
+    using = router.db_for_write(CategoryFacet)
+    with transaction.atomic(using=using):
+        for category, delta in deltas.items():
+            value = F('product_count') + delta
+            if delta < 0:
+                value = Greatest(value, 0)
+            updated = CategoryFacet.objects.using(using).filter(category=category).update(product_count=value)
+            if not updated and delta > 0:
+                CategoryFacet.objects.using(using).create(category=category, product_count=delta)
+    transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY), using=using, robust=True)
+
+
+def get_category_facets():
+    """Contagem por categoria, servida do cache; a tabela CategoryFacet é pequena e indexada"""
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = dict(
+            CategoryFacet.objects.filter(product_count__gt=0)
+            .order_by('category')
+            .values_list('category', 'product_count')
+        )
+        cache.set(FACETS_CACHE_KEY, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def rebuild_category_facets():
+    """Recalcula todas as contagens com um GROUP BY (reconciliação de divergências)"""
+    counts = dict(Product.objects.values_list('category').annotate(total=Count('id')).order_by())
+    using = router.db_for_write(CategoryFacet)
+    with transaction.atomic(using=using):
+        CategoryFacet.objects.using(using).exclude(category__in=counts).delete()
+        for category, total in counts.items():
+            CategoryFacet.objects.using(using).update_or_create(category=category, defaults={'product_count': total})
+    transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY), using=using, robust=True)
+    return counts
+
+
+@contextlib.contextmanager
+def batch_favorite_counts(apply=True):
+    """
+        Acumula as variações de favorite_count (count_favorites) do bloco e aplica tudo no
+        final com update_favorite_counts: um delete em cascata vira um UPDATE por variação
+        em vez de um por favorito. Com apply=False as variações são descartadas.
+    """
+    pending = Counter()
+    token = _pending_favorite_counts.set(pending)
+    try:
+        yield pending
+    finally:
+        _pending_favorite_counts.reset(token)
+    if apply:
+        update_favorite_counts(pending)
+
+
+def count_favorites(deltas):
+    """update_favorite_counts, ou acumula no batch_favorite_counts em andamento"""
+    pending = _pending_favorite_counts.get()
+    if pending is None:
+        update_favorite_counts(deltas)
+    else:
+        pending.update(deltas)
+
+
+def update_favorite_counts(deltas):
+    """
+        Aplica variações ({product_id: +n/-n}) em Product.favorite_count com F(),
+        agrupando os produtos com a mesma variação em um único UPDATE.
+    """
+    by_delta = {}
+    for product_id, delta in Counter(deltas).items():
+        if delta:
+            by_delta.setdefault(delta, []).append(product_id)
+    for delta, product_ids in by_delta.items():
+        value = F('favorite_count') + delta
+        if delta < 0:
+            value = Greatest(value, 0)
+        Product.objects.filter(pk__in=product_ids).update(favorite_count=value)
+
+
+def get_popular_products(limit):
+    """
+        Top N produtos por favorite_count. A lista (até POPULAR_MAX itens, já serializada)
+        fica em cache por alguns segundos; a reconstrução percorre o índice de popularidade,
+        sem COUNT/GROUP BY sobre os favoritos.
+    """
+    from .serializers import ProductSerializer
+
+    popular = cache.get(POPULAR_CACHE_KEY)
+    if popular is None:
+        products = Product.objects.filter(favorite_count__gt=0).order_by('-favorite_count', 'id')[:POPULAR_MAX]
+        popular = ProductSerializer(products, many=True).data
+        cache.set(POPULAR_CACHE_KEY, popular, POPULAR_CACHE_TIMEOUT)
+    return popular[:limit]
+
+
+def correct_favorite_counts(product_ids):
+    """
+        Corrige favorite_count dos produtos informados a partir de um GROUP BY por shard.
+        A correção entra como variação (F() + contagem real - valor lido): incrementos e
+        decrementos que chegam entre a leitura e o UPDATE não são sobrescritos.
+        Retorna a quantidade de produtos corrigidos.
+    """
+    seen = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'favorite_count'))
+    totals = Counter()
+    for alias in dict.fromkeys(get_shards()):
+        rows = (
+            FavoriteProduct.objects.using(alias).filter(product_id__in=seen)
+            .values_list('product_id').annotate(total=Count('id')).order_by()
+        )
+        totals.update(dict(rows))
+    deltas = {product_id: totals[product_id] - count for product_id, count in seen.items() if totals[product_id] != count}
+    update_favorite_counts(deltas)
+    return len(deltas)
+
+
+def reconcile_favorite_counts(batch_size=1000):
+    """Corrige os contadores divergentes de todos os produtos, um lote de ids por vez"""
+    fixed, batch = 0, []
+    for product_id in Product.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size):
+        batch.append(product_id)
+        if len(batch) == batch_size:
+            fixed += correct_favorite_counts(batch)
+            batch = []
+    if batch:
+        fixed += correct_favorite_counts(batch)
+    cache.delete(POPULAR_CACHE_KEY)
+    return fixed
+
+
+def recount_favorites(product_ids):
+    """favorite_count exato para os produtos informados (ação do admin) -> produtos corrigidos"""
+    fixed = correct_favorite_counts(product_ids)
+    cache.delete(POPULAR_CACHE_KEY)
+    return fixed
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FavoriteChange, FavoriteProduct
+from .routers import get_shards, shard_for
+from .search import decode_cursor, encode_cursor
+
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 1000
+
+
+class CursorExpired(Exception):
+    """O cursor é anterior à retenção do log (ou de outro shard): o cliente precisa ressincronizar"""
+
+
+def get_retention():
+    return timedelta(days=getattr(settings, 'FAVORITE_CHANGES_RETENTION_DAYS', 30))
+
+
+def record_changes(using, rows):
+    """Grava eventos [(customer_id, product_id, action), ...] no shard `using` (na transação corrente)"""
+    if rows:
+        FavoriteChange.objects.using(using).bulk_create(
+            FavoriteChange(customer_id=customer_id, product_id=product_id, action=action)
+            for customer_id, product_id, action in rows
+        )
+
+
+def serialize_change(change):
+    return {
+        'id': change.id,
+        'product_id': change.product_id,
+        'action': change.action,
+        'created_at': change.created_at,
+    }
+
+
+def get_changes(customer_id, since=None, limit=CHANGES_PAGE_SIZE):
+    """
+        Eventos de favoritos do cliente depois do cursor `since`, em ordem de id.
+        Sem cursor retorna um snapshot (todos os favoritos atuais como 'add', com
+        reset=True) e o cursor para as próximas chamadas.
+
+        O cursor é (shard, último id, instante até onde o cliente está em dia). Como a
+        compactação só apaga eventos mais antigos que a retenção, um cursor mais novo
+        que ela nunca perde eventos; os mais antigos levantam CursorExpired.
+    """
+    alias = shard_for(customer_id)
+    now = timezone.now()
+    events = FavoriteChange.objects.using(alias).filter(customer_id=customer_id)
+
+    if since is None:
+        # O topo do log é lido antes do snapshot: uma mudança concorrente aparece nas
+        # duas leituras (add/remove são idempotentes no cliente), mas nunca se perde
+        last_id = events.order_by('-id').values_list('id', flat=True).first() or 0
+        favorites = FavoriteProduct.objects.for_customer(customer_id).order_by('pk')
+        return {
+            'reset': True,
+            'changes': [
+                {'id': None, 'product_id': favorite.product_id_id, 'action': FavoriteChange.ADD,
+                 'created_at': favorite.date_addition}
+                for favorite in favorites
+            ],
+            'cursor': encode_cursor(alias, last_id, now.timestamp()),
+            'has_more': False,
+        }
+
+    try:
+        cursor_alias, last_id, seen_at = decode_cursor(since)
+        last_id, seen_at = int(last_id), float(seen_at)
+    except (TypeError, ValueError):
+        raise ValueError('Cursor inválido') from None
+    if cursor_alias != alias or seen_at < (now - get_retention()).timestamp():
+        raise CursorExpired
+
+    page = list(events.filter(id__gt=last_id).order_by('id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    if page:
+        last_id = page[-1].id
+    # Com mais páginas pendentes o cliente só está em dia até o último evento recebido
+    seen_at = page[-1].created_at.timestamp() if has_more else now.timestamp()
+    return {
+        'reset': False,
+        'changes': [serialize_change(change) for change in page],
+        'cursor': encode_cursor(alias, last_id, seen_at),
+        'has_more': has_more,
+    }
+
+
+def compact_changes(batch_size=5000):
+    """Apaga, em lotes e em todos os shards, os eventos mais antigos que a retenção"""
+    cutoff = timezone.now() - get_retention()
+    deleted = 0
+    for alias in dict.fromkeys(get_shards()):
+        old = FavoriteChange.objects.using(alias).filter(created_at__lt=cutoff)
+        while True:
+            ids = list(old.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic(using=alias):
+                deleted += FavoriteChange.objects.using(alias).filter(id__in=ids).delete()[0]
+    return deleted
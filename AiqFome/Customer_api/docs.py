@@ -0,0 +1,59 @@
+"""
+    Decorators de documentação sem custo quando a documentação está desligada.
+
+    `openapi` aqui é um proxy: openapi.Parameter(...), openapi.TYPE_INTEGER etc. só
+    registram a chamada. Com 'drf_yasg' em INSTALLED_APPS o swagger_auto_schema resolve
+    os objetos reais e aplica o decorator do drf_yasg; no perfil só-API
+    (RUNTIME_PROFILE=api) devolve a view intacta e o drf_yasg nunca é importado.
+"""
+from django.apps import apps
+from django.utils.module_loading import import_string
+
+
+class Deferred:
+    """Atributo ou chamada de drf_yasg.openapi, resolvido só quando a documentação é montada"""
+    __slots__ = ('_path', '_call')
+
+    def __init__(self, path, call=None):
+        self._path = path
+        self._call = call
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Deferred(f'{self._path}.{name}')
+
+    def __call__(self, *args, **kwargs):
+        return Deferred(self._path, (args, kwargs))
+
+    def resolve(self):
+        target = import_string(self._path)
+        if self._call is None:
+            return target
+        args, kwargs = self._call
+        return target(*resolve(args), **resolve(kwargs))
+
+
+def resolve(value):
+    if isinstance(value, Deferred):
+        return value.resolve()
+    if isinstance(value, dict):
+        return {resolve(key): resolve(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+    return value
+
+
+openapi = Deferred('drf_yasg.openapi')
+
+
+def docs_enabled():
+    return apps.is_installed('drf_yasg')
+
+
+def swagger_auto_schema(**kwargs):
+    if not docs_enabled():
+        return lambda view: view
+    from drf_yasg.utils import swagger_auto_schema as decorator
+
+    return decorator(**resolve(kwargs))
@@ -0,0 +1,126 @@
+"""
+    Documento materializado do perfil do cliente (/api/customers/<id>/profile/): cliente,
+    favoritos e os dados de cada produto favoritado, em uma única chave do cache.
+
+    Cada cliente tem uma versão no cache (um token aleatório) e o documento é gravado junto
+    com a versão lida antes de montá-lo. Escritas não remontam nada: depois do commit trocam
+    a versão (e apagam o documento para liberar memória):
+    - cliente alterado ou removido, favorito adicionado/alterado/removido, operações em lote
+      (bulk_create, ações do admin, purge): a versão dos clientes envolvidos;
+    - produto alterado ou removido: a versão dos clientes que o favoritaram (a importação
+      só cria produtos novos, que nenhum documento embute).
+
+    Na leitura, documento e versão vêm de um único get_many; um documento com versão
+    diferente da atual é descartado e remontado. Assim uma leitura que montou o documento
+    antes de um commit e grava depois dele (ou escritas cujos callbacks rodam fora de ordem)
+    nunca deixa um documento velho servido até o TTL. Versão expirada ou despejada equivale
+    a uma troca de versão. O documento é montado a partir dos bancos de escrita: uma réplica
+    atrasada geraria um documento velho marcado com a versão atual.
+    favorite_count fica de fora do produto embutido: muda a cada favorito de qualquer cliente.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import Customer, FavoriteProduct, Product
+from .routers import get_shards
+
+DEFAULTS = {
+    'TTL': 24 * 60 * 60,
+    'INVALIDATION_BATCH_SIZE': 1000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CUSTOMER_PROFILE', {})}
+
+
+def cache_key(customer_id):
+    return f'customer-profile:{customer_id}'
+
+
+def version_key(customer_id):
+    return f'customer-profile-version:{customer_id}'
+
+
+def build(customer_id):
+    """Monta o documento a partir dos bancos (None se o cliente não existe ou foi removido)"""
+    from .serializers import CustomerSerializer, ProfileProductSerializer
+
+    customer = Customer.objects.using(router.db_for_write(Customer)).filter(pk=customer_id).first()
+    if customer is None:
+        return None
+    favorites = list(
+        FavoriteProduct.objects.for_customer(customer_id).order_by('-date_addition', '-pk')
+        .values_list('product_id', 'date_addition')
+    )
+    products = Product.objects.using(router.db_for_write(Product)).in_bulk(
+        [product_id for product_id, _ in favorites]
+    ).values()
+    embedded = {product['id']: product for product in ProfileProductSerializer(products, many=True).data}
+    return {
+        'customer': dict(CustomerSerializer(customer).data),
+        'favorites': [
+            {
+                'product_id': product_id,
+                'date_addition': date_addition.isoformat(),
+                'product': embedded.get(product_id),
+            }
+            for product_id, date_addition in favorites
+        ],
+    }
+
+
+def get_document(customer_id):
+    key, current_key = cache_key(customer_id), version_key(customer_id)
+    cached = cache.get_many([key, current_key])
+    version = cached.get(current_key)
+    if version is None:
+        # add: se outra leitura (ou uma escrita) gravou a versão antes, vale a dela
+        cache.add(current_key, uuid4().hex, get_config()['TTL'])
+        version = cache.get(current_key)
+    entry = cached.get(key)
+    if entry is not None and entry['version'] == version:
+        return entry['document']
+    # A versão é lida antes de montar: um commit depois dela troca a versão e descarta este documento
+    document = build(customer_id)
+    if document is not None:
+        cache.set(key, {'version': version, 'document': document}, get_config()['TTL'])
+    return document
+
+
+def invalidate(customer_ids):
+    customer_ids = list(customer_ids)
+    cache.set_many({version_key(customer_id): uuid4().hex for customer_id in customer_ids}, get_config()['TTL'])
+    cache.delete_many([cache_key(customer_id) for customer_id in customer_ids])
+
+
+def invalidate_on_commit(customer_ids, using):
+    customer_ids = list(dict.fromkeys(customer_ids))
+    if customer_ids:
+        transaction.on_commit(lambda: invalidate(customer_ids), using=using, robust=True)
+
+
+def invalidate_products(product_ids):
+    """Invalida os documentos que embutem algum dos produtos (uma consulta por shard, pelo índice de product_id)"""
+    batch_size = get_config()['INVALIDATION_BATCH_SIZE']
+    for alias in dict.fromkeys(get_shards()):
+        customer_ids = (
+            FavoriteProduct.objects.using(alias).filter(product_id__in=product_ids)
+            .values_list('customer_id', flat=True).distinct().order_by()
+        )
+        batch = []
+        for customer_id in customer_ids.iterator(chunk_size=batch_size):
+            batch.append(customer_id)
+            if len(batch) == batch_size:
+                invalidate(batch)
+                batch = []
+        invalidate(batch)
+
+
+def invalidate_products_on_commit(product_ids, using):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: invalidate_products(product_ids), using=using, robust=True)
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('favorite', 'catalog')
+
+DEFAULTS = {
+    'STREAM': 'events',
+    'MAXLEN': 10_000,       # eventos mantidos para o replay (Last-Event-ID)
+    'QUEUE_SIZE': 256,      # eventos pendentes por assinante antes de cair para o replay
+    'HEARTBEAT': 15,        # segundos entre comentários "ping" em conexões ociosas
+    'BLOCK_MS': 5000,
+    'BATCH': 500,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'EVENTS', {})}
+
+
+def parse_id(event_id):
+    """'1714000000000-3' -> (1714000000000, 3), comparável como tupla; ids inválidos levantam ValueError"""
+    ms, _, seq = str(event_id).partition('-')
+    return int(ms), int(seq or 0)
+
+
+def format_event(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+
+
+class LocalBackend:
+    """Stream em memória, restrito ao processo: usado quando o cache não é Redis (dev e testes)"""
+    def __init__(self, maxlen):
+        self.entries = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+        self.waiters = set()
+        self.last = (0, 0)
+
+    def add(self, fields):
+        with self.lock:
+            ms = max(int(time.time() * 1000), self.last[0])
+            seq = self.last[1] + 1 if ms == self.last[0] else 0
+            self.last = (ms, seq)
+            event_id = f'{ms}-{seq}'
+            self.entries.append((event_id, fields))
+            waiters = list(self.waiters)
+        # add() roda em threads síncronas; o aviso chega aos loops pelo call_soon_threadsafe
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+        return event_id
+
+    def _after(self, after, count):
+        key = parse_id(after)
+        with self.lock:
+            return [(event_id, fields) for event_id, fields in self.entries if parse_id(event_id) > key][:count]
+
+    async def read(self, after, block_ms, count):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            self.waiters.add(waiter)
+        try:
+            entries = self._after(after, count)
+            if not entries:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), block_ms / 1000)
+                except asyncio.TimeoutError:
+                    return []
+                entries = self._after(after, count)
+            return entries
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+    async def range(self, after, count):
+        return self._after(after, count)
+
+    async def first_id(self):
+        with self.lock:
+            return self.entries[0][0] if self.entries else None
+
+    async def last_id(self):
+        with self.lock:
+            return self.entries[-1][0] if self.entries else '0-0'
+
+
+class RedisBackend:
+    """
+        Stream do Redis do cache configurado (XADD com MAXLEN aproximado). A escrita usa a
+        conexão síncrona do django_redis; a leitura, um cliente redis.asyncio por event loop.
+    """
+    def __init__(self, location, stream, maxlen):
+        self.location = location
+        self.stream = stream
+        self.maxlen = maxlen
+        self._clients = weakref.WeakKeyDictionary()
+
+    def add(self, fields):
+        from django_redis import get_redis_connection
+
+        event_id = get_redis_connection('default').xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        return event_id.decode() if isinstance(event_id, bytes) else event_id
+
+    def client(self):
+        import redis.asyncio
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = redis.asyncio.from_url(self.location, decode_responses=True)
+        return self._clients[loop]
+
+    async def read(self, after, block_ms, count):
+        response = await self.client().xread({self.stream: after}, count=count, block=block_ms)
+        return response[0][1] if response else []
+
+    async def range(self, after, count):
+        return await self.client().xrange(self.stream, min=f'({after}', max='+', count=count)
+
+    async def first_id(self):
+        entries = await self.client().xrange(self.stream, count=1)
+        return entries[0][0] if entries else None
+
+    async def last_id(self):
+        entries = await self.client().xrevrange(self.stream, count=1)
+        return entries[0][0] if entries else '0-0'
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = get_config()
+            cache = settings.CACHES['default']
+            if cache['BACKEND'].startswith('django_redis.'):
+                location = cache['LOCATION']
+                location = location[0] if isinstance(location, (list, tuple)) else location
+                _backend = RedisBackend(location, config['STREAM'], config['MAXLEN'])
+            else:
+                _backend = LocalBackend(config['MAXLEN'])
+        return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('CACHES', 'EVENTS'):
+        _backend = None
+        _brokers.clear()
+
+
+def publish(event_type, data):
+    """Publica um evento; falhas são só logadas (o log de mudanças é a fonte durável)"""
+    try:
+        return get_backend().add({'type': event_type, 'data': json.dumps(data, cls=DjangoJSONEncoder)})
+    except Exception:
+        logger.warning('Falha ao publicar o evento %s', event_type, exc_info=True)
+
+
+def publish_on_commit(event_type, data, using='default'):
+    transaction.on_commit(lambda: publish(event_type, data), using=using)
+
+
+class Subscriber:
+    def __init__(self, queue_size, types=None, customer_id=None):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.types = set(types or EVENT_TYPES)
+        self.customer_id = customer_id
+        self.overflowed = False
+
+    def wants(self, event_type, data):
+        if event_type not in self.types:
+            return False
+        if event_type == 'favorite' and self.customer_id is not None:
+            return data.get('customer_id') == self.customer_id
+        return True
+
+
+class Broker:
+    """
+        Pub/sub local de um worker: uma única task lê o stream (leitura bloqueante, sem
+        polling) e distribui cada evento, serializado uma vez, para as filas dos assinantes.
+        Assinante ocioso é só uma corrotina parada em queue.get(). Fila cheia não bloqueia
+        os demais: o assinante é desligado e retoma pelo replay a partir do seu cursor.
+    """
+    def __init__(self, backend, config):
+        self.backend = backend
+        self.config = config
+        self.subscribers = set()
+        self.position = None
+        self._task = None
+        self._ready = None
+
+    async def subscribe(self, types=None, customer_id=None):
+        subscriber = Subscriber(self.config['QUEUE_SIZE'], types, customer_id)
+        self.subscribers.add(subscriber)
+        if self._task is None:
+            self.position = None
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run(self._ready))
+        # Só devolve depois que o leitor fixou a posição: o replay cobre tudo até ela
+        await self._ready.wait()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        # Sem assinantes o leitor para (e libera a conexão com o Redis)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def dispatch(self, event_id, fields):
+        try:
+            data = json.loads(fields['data'])
+        except (KeyError, ValueError):
+            return
+        message = format_event(event_id, fields.get('type', ''), fields['data'])
+        for subscriber in list(self.subscribers):
+            if not subscriber.wants(fields.get('type'), data):
+                continue
+            try:
+                subscriber.queue.put_nowait((event_id, message))
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self.subscribers.discard(subscriber)
+
+    async def _run(self, ready):
+        try:
+            while self.subscribers:
+                try:
+                    if self.position is None:
+                        self.position = await self.backend.last_id()
+                        ready.set()
+                    entries = await self.backend.read(self.position, self.config['BLOCK_MS'], self.config['BATCH'])
+                except Exception:
+                    # Sem o stream os assinantes seguem conectados (só recebem ping) até ele voltar
+                    logger.warning('Falha ao ler o stream de eventos', exc_info=True)
+                    ready.set()
+                    await asyncio.sleep(1)
+                    continue
+                for event_id, fields in entries:
+                    self.position = event_id
+                    self.dispatch(event_id, fields)
+        finally:
+            ready.set()
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def replay(self, after):
+        """Eventos do stream depois de `after`, em lotes; vazio se o backend falhar"""
+        while True:
+            try:
+                entries = await self.backend.range(after, self.config['BATCH'])
+            except Exception:
+                logger.warning('Falha no replay do stream de eventos', exc_info=True)
+                return
+            for event_id, fields in entries:
+                yield event_id, fields
+                after = event_id
+            if len(entries) < self.config['BATCH']:
+                return
+
+    async def is_trimmed(self, after):
+        # Conservador: se o evento mais antigo retido é posterior ao cursor, pode ter havido corte
+        try:
+            first = await self.backend.first_id()
+        except Exception:
+            return False
+        return first is not None and parse_id(first) > parse_id(after)
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    if loop not in _brokers:
+        _brokers[loop] = Broker(get_backend(), get_config())
+    return _brokers[loop]
+
+
+async def stream(types=None, customer_id=None, last_event_id=None):
+    """
+        Gerador SSE. Com `last_event_id` reenvia o que o cliente perdeu; se o stream já
+        foi cortado antes desse ponto envia um evento "reset" (ressincronizar via REST).
+    """
+    broker = get_broker()
+    heartbeat = broker.config['HEARTBEAT']
+    cursor = last_event_id
+    yield f"retry: {heartbeat * 1000}\n\n"
+    while True:
+        subscriber = await broker.subscribe(types, customer_id)
+        try:
+            if cursor is None:
+                cursor = broker.position
+            elif await broker.is_trimmed(cursor):
+                yield 'event: reset\ndata: {}\n\n'
+            if cursor is not None:
+                async for event_id, fields in broker.replay(cursor):
+                    cursor = event_id
+                    data = json.loads(fields['data'])
+                    if subscriber.wants(fields.get('type'), data):
+                        yield format_event(event_id, fields['type'], fields['data'])
+
+            while not subscriber.overflowed:
+                try:
+                    event_id, message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                if cursor is not None and parse_id(event_id) <= parse_id(cursor):
+                    continue
+                cursor = event_id
+                yield message
+        finally:
+            broker.unsubscribe(subscriber)
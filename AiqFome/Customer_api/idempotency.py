@@ -0,0 +1,96 @@
+"""
+    Header Idempotency-Key para POSTs repetidos por clientes (retries em timeout).
+
+    A primeira requisição com uma chave executa e a resposta (< 500) fica no cache por
+    IDEMPOTENCY['TTL']; repetições com a mesma chave recebem a resposta guardada, com o
+    header Idempotent-Replayed. Enquanto a primeira está em andamento, um lock no cache
+    (cache.add, atômico no Redis) faz as duplicadas esperarem o resultado em vez de
+    executar de novo. A chave vale por usuário e por endpoint; reutilizá-la com outro
+    body é erro (422).
+"""
+import functools
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+DEFAULTS = {
+    'TTL': 24 * 60 * 60,    # segundos que a resposta fica disponível para replay
+    'LOCK_TIMEOUT': 30,     # segundos até um lock órfão (worker morto) expirar
+    'WAIT': 10,             # segundos que uma duplicada espera a primeira terminar
+    'POLL_INTERVAL': 0.05,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'IDEMPOTENCY', {})}
+
+
+def cache_keys(request, key):
+    user = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+    scope = hashlib.sha256(f'{user}:{request.method}:{request.path}:{key}'.encode()).hexdigest()
+    return f'idempotency:{scope}', f'idempotency:{scope}:lock'
+
+
+def fingerprint(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def replay(entry):
+    response = Response(entry['data'], status=entry['status'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(method):
+    """Decorator para handlers POST de views do DRF"""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'detail': f'{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        config = get_config()
+        result_key, lock_key = cache_keys(request, key)
+        body = fingerprint(request)
+        deadline = time.monotonic() + config['WAIT']
+        token = uuid.uuid4().hex
+        while True:
+            entry = cache.get(result_key)
+            if entry is not None:
+                if entry['fingerprint'] != body:
+                    return Response({'detail': f'{HEADER} já usada com outro conteúdo.'},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(entry)
+            if cache.add(lock_key, token, config['LOCK_TIMEOUT']):
+                break
+            if time.monotonic() >= deadline:
+                return Response({'detail': f'Requisição com a mesma {HEADER} ainda em andamento.'},
+                                status=status.HTTP_409_CONFLICT)
+            time.sleep(config['POLL_INTERVAL'])
+
+        try:
+            response = method(self, request, *args, **kwargs)
+            # Erros do servidor não são guardados: o retry tem de poder executar de novo
+            if isinstance(response, Response) and response.status_code < 500:
+                cache.set(result_key, {
+                    'fingerprint': body,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, config['TTL'])
+            return response
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    return wrapper
@@ -0,0 +1,164 @@
+import atexit
+import contextvars
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import uuid
+import weakref
+from datetime import datetime, timezone
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# QueueLogHandlers do processo, para recriar as listeners depois de um fork
+_queue_handlers = weakref.WeakSet()
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Associa um request id (recebido no header X-Request-ID ou gerado) a cada request"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        request.request_id = request_id
+        token = _request_id.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    """Copia o request id do contexto para o record (precisa rodar na thread do request)"""
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém apenas 1 a cada `every` records de nível DEBUG; os demais níveis passam sempre"""
+    def __init__(self, every=20, level=logging.DEBUG):
+        super().__init__()
+        self.every = max(int(every), 1)
+        self.level = level
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        return next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada record como uma linha JSON"""
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+        Handler não bloqueante: o request apenas enfileira o record e uma
+        QueueListener em background formata e grava em arquivo rotativo
+        (e opcionalmente no console). Com a fila cheia o record é descartado
+        em vez de bloquear o request.
+
+        A thread da listener não sobrevive a um fork (gunicorn com preload_app
+        configura o logging no master): o processo filho recria fila, handlers
+        e listener (restart_listeners, registrado em os.register_at_fork).
+    """
+    def __init__(self, filename='debug.log', max_bytes=10 * 1024 * 1024, backup_count=5,
+                 console=True, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.options = {
+            'filename': filename, 'max_bytes': max_bytes, 'backup_count': backup_count, 'console': console,
+        }
+        self.dropped = 0
+        self.listener = None
+        self.start_listener()
+        _queue_handlers.add(self)
+        atexit.register(self._stop_listener)
+
+    def build_handlers(self):
+        formatter = JsonFormatter()
+        handlers = [logging.handlers.RotatingFileHandler(
+            self.options['filename'], maxBytes=self.options['max_bytes'],
+            backupCount=self.options['backup_count'], encoding='utf-8', delay=True,
+        )]
+        if self.options['console']:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        return handlers
+
+    def start_listener(self):
+        # Fila nova: a herdada do pai pode ter records do pai e locks em estado inconsistente
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.build_handlers(), respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Apenas junta msg + args; a formatação JSON e o traceback ficam na listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if not hasattr(record, 'request_id'):
+            record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _stop_listener(self):
+        # Esvazia a fila antes de encerrar o processo
+        if self.listener._thread is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+
+    def close(self):
+        _queue_handlers.discard(self)
+        self._stop_listener()
+        super().close()
+
+
+def restart_listeners():
+    """Processo filho de um fork: a thread da listener ficou no pai, então cada handler recria a sua"""
+    for handler in list(_queue_handlers):
+        handler.start_listener()
+
+
+def stop_listeners():
+    """Esvazia as filas e encerra as listeners (master do gunicorn, depois do aquecimento)"""
+    for handler in list(_queue_handlers):
+        handler._stop_listener()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=restart_listeners)
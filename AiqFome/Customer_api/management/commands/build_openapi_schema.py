@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Customer_api.schema import generate_schema, get_artifact_path, write_artifact
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera o documento OpenAPI público (JSON + .gz) servido em /docs/swagger.json/. '
+        'Rode no deploy; os workers só leem o artefato.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Caminho do artefato (padrão: OPENAPI_SCHEMA_PATH)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        body = generate_schema()
+        path = write_artifact(body, options['output'] or get_artifact_path())
+        self.stdout.write(self.style.SUCCESS(
+            f'{path} gerado ({len(body)} bytes) em {time.perf_counter() - started:.2f}s'
+        ))
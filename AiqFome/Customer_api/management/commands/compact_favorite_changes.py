@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Customer_api.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga do log de mudanças de favoritos (todos os shards) os eventos mais antigos que '
+        'FAVORITE_CHANGES_RETENTION_DAYS. Pensado para rodar periodicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = compact_changes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} evento(s) removido(s)'))
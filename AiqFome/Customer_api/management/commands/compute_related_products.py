@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Customer_api.recommendations import compute_related_products
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as recomendações "quem favoritou este também favoritou" a partir dos favoritos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20, help='Relacionados guardados por produto')
+        parser.add_argument('--block-size', type=int, default=2048,
+                            help='Produtos por bloco na multiplicação esparsa (limita a memória)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pairs, products = compute_related_products(top_k=options['top_k'], block_size=options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{pairs} favoritos processados, {products} produtos com relacionados '
+            f'em {time.perf_counter() - started:.1f}s'
+        ))
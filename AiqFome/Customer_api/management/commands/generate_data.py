@@ -0,0 +1,97 @@
+import io
+import multiprocessing
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from Customer_api import synthetic
+
+# Volumes de --scale 1; --customers/--products/--favorites sobrescrevem
+BASE_CUSTOMERS = 100_000
+BASE_PRODUCTS = 10_000
+BASE_FAVORITES = 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera clientes, produtos e favoritos sintéticos e determinísticos (mesma --seed, mesmos '
+        'dados) para testes de carga, com INSERTs em lote. --scale 10 gera 1M de clientes, '
+        '100 mil produtos e 10M de favoritos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplica os volumes base')
+        parser.add_argument('--customers', type=int)
+        parser.add_argument('--products', type=int)
+        parser.add_argument('--favorites', type=int, help='Total aproximado de favoritos')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help='Expoente da Pareto de favoritos por cliente (menor = cauda mais longa)')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Expoente de Zipf da popularidade dos produtos')
+        parser.add_argument('--max-favorites', type=int, default=2000, help='Teto de favoritos por cliente')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processos gerando os favoritos (a gravação fica no processo principal)')
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Clientes por bloco')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Linhas por executemany')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Não recalcula contadores, facetas e índice de busca no fim')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        customers = options['customers'] if options['customers'] is not None else int(BASE_CUSTOMERS * scale)
+        products = options['products'] if options['products'] is not None else int(BASE_PRODUCTS * scale)
+        favorites = options['favorites'] if options['favorites'] is not None else int(BASE_FAVORITES * scale)
+        if customers <= 0 or products <= 0:
+            raise CommandError('São necessários clientes e produtos.')
+        seed, batch_size = options['seed'], options['batch_size']
+        started = time.perf_counter()
+
+        product_ids = synthetic.create_products(products, seed, batch_size)
+        self.stdout.write(f'{products:,} produtos ({time.perf_counter() - started:.1f}s)')
+        first_customer_id = synthetic.create_customers(customers, seed, batch_size)
+        self.stdout.write(f'{customers:,} clientes ({time.perf_counter() - started:.1f}s)')
+
+        cap = min(options['max_favorites'], products)
+        counts = synthetic.favorite_counts(customers, favorites, options['alpha'], cap, seed)
+        chunk_size = options['chunk_size']
+        starts = range(0, customers, chunk_size)
+        tasks = [
+            (first_customer_id + start, counts[start:start + chunk_size], chunk_seed)
+            for start, chunk_seed in zip(starts, synthetic.chunk_seeds(seed, len(starts)))
+        ]
+        order, cdf = synthetic.popularity(product_ids, options['zipf'], seed)
+
+        inserted, digest, reported = 0, 0, time.perf_counter()
+        target = int(counts.sum())
+        fav_started = time.perf_counter()
+        for chunk in self.generate(tasks, order, cdf, options['workers']):
+            inserted += synthetic.insert_favorites(*chunk, batch_size)
+            digest = synthetic.checksum(chunk[0], chunk[1], digest)
+            if time.perf_counter() - reported >= 2 or inserted >= target:
+                reported = time.perf_counter()
+                elapsed = reported - fav_started
+                self.stdout.write(f'favoritos: {inserted:,} (~{inserted / max(target, 1):.0%}) '
+                                  f'{inserted / max(elapsed, 1e-9):,.0f}/s')
+
+        if not options['skip_derived']:
+            derived_started = time.perf_counter()
+            for command in ('reconcile_favorite_counts', 'rebuild_product_facets', 'rebuild_product_search'):
+                call_command(command, stdout=io.StringIO())
+            self.stdout.write(f'contadores, facetas e índice de busca ({time.perf_counter() - derived_started:.1f}s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{customers:,} clientes, {products:,} produtos e {inserted:,} favoritos em '
+            f'{time.perf_counter() - started:.1f}s (checksum {digest:08x})'
+        ))
+
+    def generate(self, tasks, order, cdf, workers):
+        """Blocos na ordem das tarefas; com workers > 1 a geração roda em paralelo com a gravação"""
+        if workers <= 1:
+            synthetic.init_worker(order, cdf)
+            yield from map(synthetic.generate_favorites, tasks)
+            return
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with context.Pool(workers, initializer=synthetic.init_worker, initargs=(order, cdf)) as pool:
+            yield from pool.imap(synthetic.generate_favorites, tasks)
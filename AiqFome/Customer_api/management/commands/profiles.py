@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Customer_api.profiling import get_store
+
+
+class Command(BaseCommand):
+    help = 'Lista ou exporta os perfis de requests gravados pelo ProfilingMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Nome do perfil a exportar (sem nome lista todos)')
+        parser.add_argument('--collapsed', action='store_true', help='Exporta apenas as pilhas no formato collapsed')
+        parser.add_argument('-o', '--output', help='Arquivo de saída (padrão: stdout)')
+
+    def handle(self, *args, **options):
+        store = get_store()
+        name = options['name']
+
+        if not name:
+            for profile in store.list():
+                self.stdout.write(
+                    f"{profile['name']}  {profile['status']}  {profile['duration_ms']:>10.1f}ms  "
+                    f"{profile['method']} {profile['path']}"
+                )
+            return
+
+        profile = store.get(name)
+        if profile is None:
+            raise CommandError(f'Perfil não encontrado: {name}')
+
+        content = profile['collapsed'] if options['collapsed'] else json.dumps(profile, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+            self.stdout.write(self.style.SUCCESS(f"Perfil salvo em {options['output']}"))
+        else:
+            self.stdout.write(content)
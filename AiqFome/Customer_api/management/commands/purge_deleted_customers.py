@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from Customer_api.purge import purge_deleted_customers
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga definitivamente os clientes removidos pela API: favoritos e log de mudanças em '
+        'lotes pequenos, com pausa entre as transações. Pensado para rodar periodicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Linhas por transação (padrão: CUSTOMER_PURGE["BATCH_SIZE"])')
+        parser.add_argument('--pause', type=float, help='Segundos entre lotes (padrão: CUSTOMER_PURGE["PAUSE"])')
+        parser.add_argument('--limit', type=int, help='Máximo de clientes por execução')
+
+    def handle(self, *args, **options):
+        customers, favorites = purge_deleted_customers(
+            batch_size=options['batch_size'], pause=options['pause'], limit=options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{customers} cliente(s) e {favorites} favorito(s) apagado(s)'))
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+
+from Customer_api.models import FavoriteProduct
+from Customer_api.purge import delete_ids
+from Customer_api.routers import get_shards, shard_for
+
+
+def copy_favorites(using, favorites):
+    """
+        Grava cópias de `favorites` no shard `using` com INSERT direto (como synthetic.insert_rows):
+        sem o pre_save, que sobrescreveria a date_addition original (auto_now_add), e ignorando
+        as que já estão lá (rodada anterior interrompida).
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = [FavoriteProduct._meta.get_field(name) for name in ('customer', 'product_id', 'date_addition')]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        quote(FavoriteProduct._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    )
+    rows = [
+        [field.get_db_prep_save(getattr(favorite, field.attname), connection) for field in fields]
+        for favorite in favorites
+    ]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move os favoritos que não estão no shard correto (hash do customer_id sobre '
+        'FAVORITE_SHARDS). Use após mudar a quantidade de shards ou para migrar do '
+        "'default' para os shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', action='append', dest='sources',
+                            help="Alias a varrer (repetível). Padrão: todos os shards e o 'default'")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta o que seria movido')
+
+    def handle(self, *args, **options):
+        sources = options['sources'] or list(dict.fromkeys(get_shards() + ['default']))
+        unknown = [alias for alias in sources if alias not in settings.DATABASES]
+        if unknown:
+            raise CommandError(f"Aliases inexistentes em DATABASES: {', '.join(unknown)}")
+
+        total = 0
+        for alias in sources:
+            moved = self.rebalance(alias, options['batch_size'], options['dry_run'])
+            total += moved
+            self.stdout.write(f'{alias}: {moved} favorito(s) fora do shard')
+        verb = 'seriam movidos' if options['dry_run'] else 'movidos'
+        self.stdout.write(self.style.SUCCESS(f'{total} favorito(s) {verb}'))
+
+    def rebalance(self, alias, batch_size, dry_run):
+        moved = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                FavoriteProduct.objects.using(alias).filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return moved
+            last_pk = batch[-1].pk
+
+            by_target = {}
+            for favorite in batch:
+                target = shard_for(favorite.customer_id)
+                if target != alias:
+                    by_target.setdefault(target, []).append(favorite)
+
+            for target, favorites in by_target.items():
+                moved += len(favorites)
+                if dry_run:
+                    continue
+                # Copia antes de apagar: se o comando for interrompido basta rodar de novo
+                copy_favorites(target, favorites)
+                # SQL direto: o favorito só mudou de shard, então sem os signals de post_delete
+                # (evento de remoção, log de mudanças, documento do perfil e contadores)
+                with transaction.atomic(using=alias):
+                    delete_ids(alias, FavoriteProduct, [favorite.pk for favorite in favorites])
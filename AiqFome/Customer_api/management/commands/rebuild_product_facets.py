@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from Customer_api.catalog import rebuild_category_facets
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a contagem de produtos por categoria (reconcilia divergências das atualizações incrementais)'
+
+    def handle(self, *args, **options):
+        counts = rebuild_category_facets()
+        for category, total in sorted(counts.items()):
+            self.stdout.write(f'{category}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'{len(counts)} categoria(s) recalculada(s)'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+
+from Customer_api import search
+from Customer_api.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice FTS5 da busca de produtos a partir da tabela de produtos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Alias do banco (padrão: o de escrita de Product)')
+
+    def handle(self, *args, **options):
+        using = options['database'] or router.db_for_write(Product)
+        if not search.fts_available(using):
+            self.stdout.write(self.style.WARNING(f"'{using}' não é SQLite: a busca usa icontains, nada a fazer."))
+            return
+        with transaction.atomic(using=using):
+            indexed = search.rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS(f'{indexed} produto(s) indexado(s) em {using}'))
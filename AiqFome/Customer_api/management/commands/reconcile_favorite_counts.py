@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Customer_api.catalog import reconcile_favorite_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula Product.favorite_count a partir dos favoritos (todos os shards) e corrige '
+        'divergências. Pensado para rodar periodicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_favorite_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{fixed} produto(s) com contador corrigido'))
@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula a replicação copiando o banco SQLite primário para as réplicas '
+        '(DATABASE_REPLICAS) com a API de backup do SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repete a cópia a cada N segundos (0 executa uma vez)')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('O comando só se aplica quando o primário é SQLite.')
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('Nenhuma réplica configurada (defina DB_REPLICAS).')
+
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                self.replicate(primary['NAME'], settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'{len(replicas)} réplica(s) atualizada(s) em {(time.perf_counter() - started) * 1000:.1f}ms'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def replicate(self, source_path, target_path):
+        # Backup direto no arquivo da réplica: o SQLite trava o destino durante a cópia
+        # (leitores esperam pelo busy_timeout e nunca veem uma réplica pela metade) e as
+        # conexões já abertas dos processos da API (CONN_MAX_AGE) passam a ler o conteúdo
+        # novo. Trocar o arquivo (os.replace) as deixaria lendo o inode antigo.
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from Customer_api.server import Application, build_options, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Servidor de produção: gunicorn com a aplicação pré-carregada, workers por fork, '
+        'aquecimento antes de aceitar tráfego e reciclagem por requests ou memória.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', help='Endereço (padrão: SERVE["BIND"])')
+        parser.add_argument('--workers', type=int, help='Quantidade de workers')
+        parser.add_argument('--timeout', type=int, help='Segundos até um worker travado ser reiniciado')
+        parser.add_argument('--max-requests', type=int, help='Requests por worker antes de reciclar (0 desliga)')
+        parser.add_argument('--max-memory', type=int, dest='max_memory_mb',
+                            help='RSS em MB acima do qual o worker é reciclado (0 desliga)')
+        parser.add_argument('--ready-file', help='Arquivo criado quando todos os workers estão aquecidos')
+        parser.add_argument('--asgi', action='store_true', default=None,
+                            help='Workers uvicorn (ASGI), para o pool que serve /api/events/')
+
+    def handle(self, *args, **options):
+        config = get_config()
+        for key in ('bind', 'workers', 'timeout', 'max_requests', 'max_memory_mb', 'ready_file', 'asgi'):
+            if options[key] is not None:
+                config[key.upper()] = options[key]
+        Application(build_options(config), asgi=config['ASGI']).run()
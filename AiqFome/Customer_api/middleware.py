@@ -0,0 +1,178 @@
+"""
+    Pilhas de middleware por prefixo de path (MIDDLEWARE_SCOPES).
+
+    O ScopedMiddleware entra no fim de MIDDLEWARE e monta, uma vez por processo, uma cadeia
+    para cada prefixo, do mesmo jeito que o BaseHandler.load_middleware. O request percorre
+    só a cadeia do primeiro prefixo que casar com o path; process_view, process_exception e
+    process_template_response dos middlewares internos são repassados na mesma ordem que o
+    Django usaria. Com MIDDLEWARE_TIMING o tempo próprio de cada middleware (incluindo os
+    hooks) vai no header Server-Timing.
+"""
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+APP = 'app'
+
+ADMIN_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+)
+
+
+class MiddlewareTimings:
+    """Tempos de um request: cumulativo de cada camada da cadeia e tempo gasto nos hooks"""
+    def __init__(self):
+        self.cumulative = {}
+        self.hooks = defaultdict(float)
+
+    def self_times(self, names):
+        # Tempo próprio = cumulativo da camada - cumulativo da camada de dentro + hooks
+        layers = [*names, APP]
+        times = []
+        for index, name in enumerate(layers):
+            if name not in self.cumulative:
+                continue  # uma camada de fora respondeu antes de chegar aqui
+            inner = self.cumulative.get(layers[index + 1], 0) if name != APP else sum(self.hooks.values())
+            times.append((name, self.cumulative[name] - inner + self.hooks.get(name, 0)))
+        return times
+
+    def header(self, names):
+        return ', '.join(f'{name};dur={seconds * 1000:.3f}' for name, seconds in self.self_times(names))
+
+
+class Scope:
+    """Cadeia de middlewares de um prefixo, montada como no BaseHandler.load_middleware"""
+    def __init__(self, prefix, middleware, get_response, timing=False):
+        self.prefix = prefix
+        self.names = []
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        handler = self.timed(APP, get_response) if timing else get_response
+        for path in reversed(middleware):
+            factory = import_string(path)
+            try:
+                instance = factory(handler)
+            except MiddlewareNotUsed:
+                continue
+            name = factory.__name__
+            self.names.insert(0, name)
+            if hasattr(instance, 'process_view'):
+                self.view_middleware.insert(0, (name, instance.process_view))
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_middleware.append((name, instance.process_template_response))
+            if hasattr(instance, 'process_exception'):
+                self.exception_middleware.append((name, instance.process_exception))
+            handler = convert_exception_to_response(instance)
+            if timing:
+                handler = self.timed(name, handler)
+        self.handler = handler
+
+    def matches(self, path):
+        return path.startswith(self.prefix)
+
+    @staticmethod
+    def timed(name, handler):
+        def timed_handler(request):
+            started = time.perf_counter()
+            try:
+                return handler(request)
+            finally:
+                request._middleware_timings.cumulative[name] = time.perf_counter() - started
+        return timed_handler
+
+
+class ScopedMiddleware:
+    """
+        Escolhe a pilha de middlewares pelo prefixo do path. Paths sem escopo seguem direto
+        para a view. Os escopos são avaliados na ordem de MIDDLEWARE_SCOPES.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timing = getattr(settings, 'MIDDLEWARE_TIMING', False)
+        self.scopes = [
+            Scope(prefix, middleware, get_response, self.timing)
+            for prefix, middleware in getattr(settings, 'MIDDLEWARE_SCOPES', [])
+        ]
+
+    def get_scope(self, request):
+        for scope in self.scopes:
+            if scope.matches(request.path_info):
+                return scope
+        return None
+
+    def __call__(self, request):
+        scope = self.get_scope(request)
+        request._middleware_scope = scope
+        if scope is None:
+            return self.get_response(request)
+        if not self.timing:
+            return scope.handler(request)
+
+        timings = request._middleware_timings = MiddlewareTimings()
+        response = scope.handler(request)
+        value = timings.header(scope.names)
+        if response.has_header('Server-Timing'):
+            value = f"{response['Server-Timing']}, {value}"
+        response['Server-Timing'] = value
+        return response
+
+    def call_hook(self, request, name, method, *args):
+        if not self.timing:
+            return method(request, *args)
+        started = time.perf_counter()
+        try:
+            return method(request, *args)
+        finally:
+            request._middleware_timings.hooks[name] += time.perf_counter() - started
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = getattr(request, '_middleware_scope', None)
+        for name, method in scope.view_middleware if scope else ():
+            response = self.call_hook(request, name, method, view_func, view_args, view_kwargs)
+            if response:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        scope = getattr(request, '_middleware_scope', None)
+        for name, method in scope.template_response_middleware if scope else ():
+            response = self.call_hook(request, name, method, response)
+        return response
+
+    def process_exception(self, request, exception):
+        scope = getattr(request, '_middleware_scope', None)
+        for name, method in scope.exception_middleware if scope else ():
+            response = self.call_hook(request, name, method, exception)
+            if response:
+                return response
+        return None
+
+
+def check_admin_scope(app_configs=None, **kwargs):
+    """
+        Substitui admin.E408-E410 (silenciados): o admin só enxerga MIDDLEWARE, mas aqui
+        sessions/auth/messages ficam no escopo que atende /admin/.
+    """
+    if not apps.is_installed('django.contrib.admin'):
+        return []
+    scopes = getattr(settings, 'MIDDLEWARE_SCOPES', [])
+    middleware = list(settings.MIDDLEWARE)
+    for prefix, scoped in scopes:
+        if '/admin/'.startswith(prefix):
+            middleware += scoped
+            break
+    return [
+        checks.Error(f"'{path}' deve estar em MIDDLEWARE ou no escopo de /admin/ em MIDDLEWARE_SCOPES.",
+                     id='Customer_api.E001')
+        for path in ADMIN_MIDDLEWARE if path not in middleware
+    ]
@@ -1,12 +1,32 @@
-from django.db import models
+from collections import Counter
+from django.db import models, router, transaction
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
+from .routers import get_shards, shard_for
 import requests
 
+class ActiveCustomerManager(models.Manager):
+    """Clientes não removidos; os removidos (aguardando o purge) ficam em Customer.all_objects"""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Customer(models.Model):
     name = models.CharField(max_length=100)
-    email = models.EmailField(unique=True)
+    email = models.EmailField()
     date_register = models.DateTimeField(auto_now_add=True)
+    # Remoção em duas fases: o cliente some na hora e os favoritos são apagados em lotes (ver purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ActiveCustomerManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            # O e-mail de um cliente removido pode ser cadastrado de novo antes do purge
+            models.UniqueConstraint(
+                fields=['email'], condition=models.Q(deleted_at__isnull=True), name='customer_active_email_unique'
+            ),
+        ]
     
     def clean(self):
         try:
@@ -14,6 +34,13 @@ class Customer(models.Model):
         except ValidationError:
             raise ValidationError({'email': 'E-mail inválido'})
     
+    def delete(self, *args, **kwargs):
+        # Favoritos apagados em cascata: contadores em um UPDATE por variação
+        from .catalog import batch_favorite_counts
+
+        with batch_favorite_counts():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.email})"
 
@@ -26,21 +53,128 @@ class Product(models.Model):
     image_url = models.URLField()
     rating_rate = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
     rating_count = models.IntegerField(null=True, blank=True)
+    # Denormalizado: atualizado com F() a cada favorito adicionado/removido (ver catalog.py)
+    favorite_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
+        indexes = [
+            # Filtros e ordenações da listagem de produtos
+            models.Index(fields=['category', 'price']),
+            models.Index(fields=['price']),
+            models.Index(fields=['rating_rate']),
+            # Top N de produtos mais favoritados
+            models.Index(fields=['-favorite_count', 'id'], name='product_popularity_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+class CategoryFacet(models.Model):
+    """Contagem de produtos por categoria, mantida de forma incremental (ver catalog.py)"""
+    category = models.CharField(max_length=100, unique=True)
+    product_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category}: {self.product_count}"
+
+class RelatedProducts(models.Model):
+    """Produtos favoritados pelos mesmos clientes, pré-calculados em lote (ver recommendations.py)"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='related_products')
+    # [[product_id, clientes em comum], ...] ordenado do mais relacionado para o menos
+    items = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Relacionados de {self.product_id}: {len(self.items)}"
+
+class FavoriteProductQuerySet(models.QuerySet):
+    def for_customer(self, customer_id):
+        """Favoritos de um cliente, lidos do shard desse cliente"""
+        return self.using(shard_for(customer_id)).filter(customer_id=customer_id)
+
+    def for_customers(self, customer_ids):
+        """Favoritos de vários clientes (lista): uma consulta IN por shard envolvido"""
+        by_shard = {}
+        for customer_id in customer_ids:
+            by_shard.setdefault(shard_for(customer_id), []).append(customer_id)
+        favorites = []
+        for alias, ids in by_shard.items():
+            favorites += self.using(alias).filter(customer_id__in=ids)
+        return favorites
+
+    def delete(self):
+        # Contadores de favoritos do lote inteiro em um UPDATE por variação, não um por favorito
+        from .catalog import batch_favorite_counts
+
+        with batch_favorite_counts():
+            return super().delete()
+
+    def create(self, **kwargs):
+        # Sem alias explícito o save() roteia pelo customer da instância (hint do router)
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+    def group_by_shard(self, objs):
+        """Objetos agrupados pelo shard do cliente (todos no alias do queryset, se houver um explícito)"""
+        if self._db is not None:
+            return {self._db: objs}
+        shards = get_shards()
+        # Com um shard só, o alias dele (self.db sem hint resolveria para o 'default')
+        if len(shards) == 1:
+            return {shards[0]: objs}
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(shard_for(obj.customer_id), []).append(obj)
+        return by_shard
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # Sem alias explícito os objetos são agrupados e gravados no shard de cada cliente
+        from .changes import record_changes
+
+        by_shard = self.group_by_shard(list(objs))
+
+        # Com ignore_conflicts não se sabe o que foi inserido: sem eventos, e os contadores ficam para a reconciliação
+        track = not kwargs.get('ignore_conflicts')
+        created = []
+        for alias, shard_objs in by_shard.items():
+            with transaction.atomic(using=alias):
+                shard_created = super(FavoriteProductQuerySet, self.using(alias)).bulk_create(shard_objs, *args, **kwargs)
+                if track:
+                    record_changes(alias, [
+                        (obj.customer_id, obj.product_id_id, FavoriteChange.ADD) for obj in shard_created
+                    ])
+            created += shard_created
+
+        if track:
+            from .catalog import update_favorite_counts
+            from .documents import invalidate_on_commit
+
+            update_favorite_counts(Counter(obj.product_id_id for obj in created))
+            for alias, shard_objs in by_shard.items():
+                invalidate_on_commit([obj.customer_id for obj in shard_objs], alias)
+        return created
+
 class FavoriteProduct(models.Model):
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='favoritos')
-    product_id = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='produtos')
+    # Sem constraint no banco: o favorito pode ficar em um shard diferente de Customer/Product
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='favoritos', db_constraint=False)
+    product_id = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='produtos', db_constraint=False)
     date_addition = models.DateTimeField(auto_now_add=True)
+
+    objects = FavoriteProductQuerySet.as_manager()
     
     class Meta:
         unique_together = ('customer', 'product_id')
+
+    def save(self, *args, **kwargs):
+        # O evento do log de mudanças (signal post_save) entra na mesma transação do favorito
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
     
     @classmethod
     def validar_product(cls, product_id):
@@ -62,4 +196,32 @@ class FavoriteProduct(models.Model):
             raise ValidationError('Produto inválido ou não encontrado na API externa')
     
     def __str__(self):
-        return f"Favorito: {self.product_id.title} (R$ {self.product_id.price})"
+        # Sem consulta extra: título e preço só quando o produto já veio junto (select_related/prefetch)
+        if FavoriteProduct.product_id.is_cached(self):
+            return f"Favorito: {self.product_id.title} (R$ {self.product_id.price})"
+        return f"Favorito: produto {self.product_id_id} do cliente {self.customer_id}"
+
+class FavoriteChange(models.Model):
+    """
+        Log append-only de favoritos adicionados/removidos, no mesmo shard do cliente.
+        Alimenta a sincronização incremental (ver changes.py); eventos antigos são
+        compactados pelo comando compact_favorite_changes.
+    """
+    ADD = 'add'
+    REMOVE = 'remove'
+    ACTIONS = [(ADD, 'Adicionado'), (REMOVE, 'Removido')]
+
+    # Inteiros simples: o evento de remoção sobrevive ao cliente/produto apagado
+    customer_id = models.BigIntegerField()
+    product_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer_id', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()}: cliente {self.customer_id}, produto {self.product_id}"
@@ -0,0 +1,185 @@
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+DEFAULTS = {
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'TOKEN': '',
+    # Fora da árvore do projeto: os dumps amostrados não vão parar no repositório
+    'DIRECTORY': os.path.join(tempfile.gettempdir(), 'aiqfome-profiles'),
+    'MAX_PROFILES': 50,
+    'TOP_FUNCTIONS': 30,
+    'STACK_INTERVAL': 0.001,
+}
+
+
+# cProfile (sys.monitoring a partir do 3.12) admite um único profiler ativo por processo
+PROFILER_LOCK = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread e agrega no formato collapsed (flamegraph)"""
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Anel limitado de perfis em disco: ao passar de `max_profiles` os mais antigos são removidos"""
+    def __init__(self, directory, max_profiles):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def _files(self):
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('*.json'))
+
+    def save(self, data):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        tmp = self.directory / f'{name}.tmp'
+        tmp.write_text(json.dumps({'name': name, **data}), encoding='utf-8')
+        tmp.replace(self.directory / f'{name}.json')
+        for old in self._files()[:-self.max_profiles]:
+            old.unlink(missing_ok=True)
+        return name
+
+    def list(self):
+        profiles = []
+        for path in reversed(self._files()):
+            data = json.loads(path.read_text(encoding='utf-8'))
+            data.pop('top_functions', None)
+            data.pop('collapsed', None)
+            profiles.append(data)
+        return profiles
+
+    def get(self, name):
+        if not re.fullmatch(r'[\w-]+', name):
+            return None
+        path = self.directory / f'{name}.json'
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding='utf-8'))
+
+
+def get_store():
+    config = get_config()
+    directory = Path(config['DIRECTORY'])
+    if not directory.is_absolute():
+        directory = Path(settings.BASE_DIR) / directory
+    return ProfileStore(directory, config['MAX_PROFILES'])
+
+
+def top_functions(profiler, limit):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            'function': f'{name} ({filename}:{line})',
+            'calls': nc,
+            'total_time': round(tt, 6),
+            'cumulative_time': round(ct, 6),
+        })
+    rows.sort(key=lambda row: row['cumulative_time'], reverse=True)
+    return rows[:limit]
+
+
+class ProfilingMiddleware:
+    """
+        Perfila uma amostra configurável de requests (PROFILING['SAMPLE_RATE']) ou
+        qualquer request que envie o header PROFILING['HEADER'] com o PROFILING['TOKEN'].
+        Requests não amostrados seguem direto para a view, sem custo de profiling.
+    """
+    def __init__(self, get_response):
+        config = get_config()
+        self.sample_rate = config['SAMPLE_RATE']
+        self.token = config['TOKEN']
+        if not self.sample_rate and not self.token:
+            raise MiddlewareNotUsed
+        self.header = config['HEADER']
+        self.top = config['TOP_FUNCTIONS']
+        self.interval = config['STACK_INTERVAL']
+        self.store = get_store()
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if self.token:
+            value = request.headers.get(self.header)
+            if value and hmac.compare_digest(value, self.token):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        # Com outro request já sendo perfilado (servidor com threads), este segue sem profiling
+        if not self.should_profile(request) or not PROFILER_LOCK.acquire(blocking=False):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            profiler.enable()
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            PROFILER_LOCK.release()
+        elapsed = time.perf_counter() - started
+
+        name = self.store.save({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3),
+            'created': time.time(),
+            'top_functions': top_functions(profiler, self.top),
+            'collapsed': sampler.collapsed(),
+        })
+        response['X-Profile-Id'] = name
+        return response
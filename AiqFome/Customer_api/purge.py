@@ -0,0 +1,125 @@
+"""
+    Remoção de clientes em duas fases.
+
+    O DELETE da API só marca Customer.deleted_at (o cliente some de todas as views na
+    hora); o comando purge_deleted_customers apaga depois os favoritos e o log de
+    mudanças no shard do cliente em lotes de CUSTOMER_PURGE['BATCH_SIZE'], cada lote em
+    uma transação curta e com uma pausa entre eles, e por fim a linha do cliente. Assim
+    um cliente com 100 mil favoritos não segura o banco em uma única transação.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import documents
+from .catalog import update_favorite_counts
+from .changes import record_changes
+from .models import Customer, FavoriteChange, FavoriteProduct
+from .routers import shard_for
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.1,   # segundos entre lotes, para as escritas concorrentes pegarem o lock
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CUSTOMER_PURGE', {})}
+
+
+def soft_delete(customer):
+    """Esconde o cliente; devolve False se ele já estava removido"""
+    updated = Customer.all_objects.filter(pk=customer.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+    documents.invalidate_on_commit([customer.pk], router.db_for_write(Customer))
+    return bool(updated)
+
+
+def soft_delete_many(customers, batch_size=None):
+    """soft_delete de um queryset em UPDATEs por lote de ids (a seleção pode ser a tabela inteira)"""
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    using = router.db_for_write(Customer)
+    ids = list(customers.order_by('pk').values_list('pk', flat=True))
+    removed = 0
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        removed += Customer.all_objects.filter(pk__in=batch, deleted_at__isnull=True).update(deleted_at=timezone.now())
+        documents.invalidate_on_commit(batch, using)
+    return removed
+
+
+def delete_ids(using, model, ids):
+    # SQL direto: o delete() do ORM carregaria cada linha para disparar os signals de post_delete
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} IN ({})'.format(
+        quote(model._meta.db_table), quote(model._meta.pk.column), ', '.join(['%s'] * len(ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids)
+
+
+def delete_favorites(favorites, batch_size, pause, log_changes=True):
+    """
+        Apaga os favoritos de `favorites` (queryset de um shard, com .using()) em lotes.
+        Os contadores dos produtos e, com log_changes, o log de mudanças acompanham cada lote.
+    """
+    alias = favorites.db
+    favorites = favorites.order_by('pk')
+    removed = 0
+    while True:
+        with transaction.atomic(using=alias):
+            rows = list(favorites.values_list('pk', 'customer_id', 'product_id')[:batch_size])
+            if not rows:
+                break
+            delete_ids(alias, FavoriteProduct, [pk for pk, _, _ in rows])
+            if log_changes:
+                record_changes(alias, [
+                    (customer_id, product_id, FavoriteChange.REMOVE) for _, customer_id, product_id in rows
+                ])
+            documents.invalidate_on_commit([customer_id for _, customer_id, _ in rows], alias)
+        update_favorite_counts({product_id: -count for product_id, count in Counter(row[2] for row in rows).items()})
+        removed += len(rows)
+        time.sleep(pause)
+    return removed
+
+
+def purge_favorites(customer_id, batch_size, pause):
+    # O log do cliente é apagado logo depois (purge_changes): não há o que registrar
+    return delete_favorites(FavoriteProduct.objects.for_customer(customer_id), batch_size, pause, log_changes=False)
+
+
+def purge_changes(customer_id, batch_size, pause):
+    # Sem cliente ninguém lê o log; não precisa esperar a compactação por retenção
+    alias = shard_for(customer_id)
+    events = FavoriteChange.objects.using(alias).filter(customer_id=customer_id).order_by('pk')
+    while True:
+        with transaction.atomic(using=alias):
+            ids = list(events.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            delete_ids(alias, FavoriteChange, ids)
+        time.sleep(pause)
+
+
+def purge_customer(customer_id, batch_size=None, pause=None):
+    config = get_config()
+    batch_size = batch_size or config['BATCH_SIZE']
+    pause = config['PAUSE'] if pause is None else pause
+    removed = purge_favorites(customer_id, batch_size, pause)
+    purge_changes(customer_id, batch_size, pause)
+    # Os favoritos já foram apagados: o cascade não encontra mais nada
+    Customer.all_objects.filter(pk=customer_id, deleted_at__isnull=False).delete()
+    return removed
+
+
+def purge_deleted_customers(batch_size=None, pause=None, limit=None):
+    """Purga os clientes removidos, dos mais antigos para os mais novos -> (clientes, favoritos)"""
+    customer_ids = list(
+        Customer.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    favorites = sum(purge_customer(customer_id, batch_size, pause) for customer_id in customer_ids)
+    return len(customer_ids), favorites
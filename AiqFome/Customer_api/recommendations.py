@@ -0,0 +1,140 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import FavoriteProduct, Product, RelatedProducts
+from .routers import get_shards
+
+logger = logging.getLogger(__name__)
+
+RELATED_CACHE_TIMEOUT = 60 * 60
+RELATED_GENERATION_KEY = 'related:generation'
+
+
+def stream_pairs(chunk_size=100_000):
+    """Lê os pares (customer_id, product_id) de todos os shards em arrays int64, por blocos"""
+    import numpy as np
+
+    customers = []
+    products = []
+    for alias in dict.fromkeys(get_shards()):
+        rows = FavoriteProduct.objects.using(alias).values_list('customer_id', 'product_id').order_by()
+        buffer = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            buffer.append(row)
+            if len(buffer) == chunk_size:
+                chunk = np.array(buffer, dtype=np.int64)
+                customers.append(chunk[:, 0])
+                products.append(chunk[:, 1])
+                buffer = []
+        if buffer:
+            chunk = np.array(buffer, dtype=np.int64)
+            customers.append(chunk[:, 0])
+            products.append(chunk[:, 1])
+
+    if not customers:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(customers), np.concatenate(products)
+
+
+def top_k_cooccurrence(customer_ids, product_ids, top_k=20, block_size=2048):
+    """
+        Monta a matriz esparsa cliente x produto (binária) e calcula, para cada produto,
+        os top_k produtos com mais clientes em comum (co-ocorrência de X.T @ X).
+        O produto é feito em blocos de `block_size` linhas para limitar a memória.
+        Retorna {product_id: [(related_id, score), ...]}.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    if not len(product_ids):
+        return {}
+
+    product_keys, product_index = np.unique(product_ids, return_inverse=True)
+    _, customer_index = np.unique(customer_ids, return_inverse=True)
+    n_customers = int(customer_index.max()) + 1
+    n_products = len(product_keys)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(product_index), dtype=np.float32), (customer_index.astype(np.int32), product_index.astype(np.int32))),
+        shape=(n_customers, n_products),
+    )
+    matrix.data[:] = 1  # pares duplicados contam uma vez
+    transposed = matrix.T.tocsr()
+
+    results = {}
+    for start in range(0, n_products, block_size):
+        stop = min(start + block_size, n_products)
+        block = (transposed[start:stop] @ matrix).tocsr()
+        block.setdiag(0, k=start)
+        block.eliminate_zeros()
+        for row in range(stop - start):
+            begin, end = block.indptr[row], block.indptr[row + 1]
+            if begin == end:
+                continue
+            scores = block.data[begin:end]
+            columns = block.indices[begin:end]
+            if len(scores) > top_k:
+                # Tudo acima do k-ésimo score entra; empates no corte são decididos pelo menor id
+                kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                ties = np.flatnonzero(scores == kth)
+                ties = ties[np.argsort(product_keys[columns[ties]], kind='stable')]
+                above = np.flatnonzero(scores > kth)
+                best = np.concatenate([above, ties[:top_k - len(above)]])
+                scores, columns = scores[best], columns[best]
+            order = np.lexsort((product_keys[columns], -scores))
+            results[int(product_keys[start + row])] = [
+                (int(product_keys[columns[i]]), int(scores[i])) for i in order
+            ]
+    return results
+
+
+def compute_related_products(top_k=20, block_size=2048, batch_size=5000):
+    """Job em lote: recalcula RelatedProducts para todo o catálogo e invalida o cache"""
+    started = time.perf_counter()
+    customer_ids, product_ids = stream_pairs()
+    loaded = time.perf_counter()
+    related = top_k_cooccurrence(customer_ids, product_ids, top_k=top_k, block_size=block_size)
+    computed = time.perf_counter()
+
+    using = router.db_for_write(RelatedProducts)
+    with transaction.atomic(using=using):
+        RelatedProducts.objects.using(using).all().delete()
+        RelatedProducts.objects.using(using).bulk_create(
+            (RelatedProducts(product_id=product_id, items=items) for product_id, items in related.items()),
+            batch_size=batch_size,
+        )
+    bump_generation()
+
+    logger.info(
+        'Recomendações: %s pares, %s produtos (leitura %.1fs, cálculo %.1fs, gravação %.1fs)',
+        len(product_ids), len(related), loaded - started, computed - loaded, time.perf_counter() - computed,
+    )
+    return len(product_ids), len(related)
+
+
+def bump_generation():
+    # Chaves versionadas: uma nova geração invalida todo o cache de uma vez
+    if not cache.add(RELATED_GENERATION_KEY, 1, None):
+        cache.incr(RELATED_GENERATION_KEY)
+
+
+def get_related_products(product_id, limit):
+    """Produtos relacionados já serializados; uma leitura por PK + um IN, cacheados por geração"""
+    from .serializers import ProductSerializer
+
+    generation = cache.get(RELATED_GENERATION_KEY, 0)
+    key = f'related:{generation}:{product_id}'
+    data = cache.get(key)
+    if data is None:
+        entry = RelatedProducts.objects.filter(product_id=product_id).first()
+        items = entry.items if entry else []
+        products = Product.objects.in_bulk([related_id for related_id, _ in items])
+        data = [
+            {**ProductSerializer(products[related_id]).data, 'score': score}
+            for related_id, score in items if related_id in products
+        ]
+        cache.set(key, data, RELATED_CACHE_TIMEOUT)
+    return data[:limit]
@@ -0,0 +1,163 @@
+import contextvars
+import random
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Modelos particionados por customer_id entre os aliases de FAVORITE_SHARDS
+SHARDED_MODELS = {'Customer_api.FavoriteProduct', 'Customer_api.FavoriteChange'}
+
+
+def get_shards():
+    return list(getattr(settings, 'FAVORITE_SHARDS', [DEFAULT_DB_ALIAS]))
+
+
+def shard_for(customer_id):
+    """Alias do shard de um cliente (crc32 do id, estável entre processos)"""
+    shards = get_shards()
+    return shards[zlib.crc32(str(customer_id).encode()) % len(shards)]
+
+
+def is_sharded(model):
+    return model._meta.label in SHARDED_MODELS
+
+
+def is_sharded_label(label):
+    return label.lower() in {model.lower() for model in SHARDED_MODELS}
+
+
+# Depois de uma escrita, as leituras seguintes do mesmo request ficam no primário (read-your-writes)
+_pinned = contextvars.ContextVar('db_pinned_to_primary', default=False)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def pin_to_primary():
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def check_replica(alias):
+    """Executa um SELECT 1 na réplica; qualquer erro a marca como indisponível"""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except Exception:
+        connections[alias].close()
+        return False
+
+
+def is_healthy(alias):
+    """
+        Estado de saúde da réplica, revalidado a cada HEALTH_CHECK_INTERVAL segundos.
+        Uma réplica que falha fica fora do pool por HEALTH_COOLDOWN segundos.
+    """
+    config = getattr(settings, 'DATABASE_REPLICA_HEALTH', {})
+    interval = config.get('INTERVAL', 5)
+    cooldown = config.get('COOLDOWN', 30)
+    now = time.monotonic()
+
+    with _health_lock:
+        healthy, next_check = _health.get(alias, (True, 0))
+        if now < next_check:
+            return healthy
+        # Reserva a checagem para esta thread; as demais usam o último estado conhecido
+        _health[alias] = (healthy, now + interval)
+
+    healthy = check_replica(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now + (interval if healthy else cooldown))
+    return healthy
+
+
+class FavoriteShardRouter:
+    """
+        Roteia os modelos de SHARDED_MODELS para o shard do cliente, a partir do
+        hint `instance` (o próprio favorito ou o Customer de `customer.favoritos`).
+        Consultas sem hint devem usar `FavoriteProduct.objects.for_customer()`.
+    """
+    def _db_for_instance(self, model, instance):
+        if not is_sharded(model) or instance is None:
+            return None
+        if is_sharded(type(instance)):
+            customer_id = instance.customer_id
+        elif instance._meta.label == 'Customer_api.Customer':
+            customer_id = instance.pk
+        else:
+            return None
+        return shard_for(customer_id) if customer_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded(type(obj1)) or is_sharded(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        shards = get_shards()
+        if model_name and is_sharded_label(f'{app_label}.{model_name}'):
+            # A tabela também existe (vazia) no 'default' para o cascade do Collector
+            return db in shards or db == DEFAULT_DB_ALIAS
+        if db in shards and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+class PrimaryReplicaRouter:
+    """
+        Leituras vão para uma réplica saudável escolhida ao acaso (DATABASE_REPLICAS)
+        e escritas para o primário. Sem réplicas configuradas tudo fica no 'default'.
+    """
+    def db_for_read(self, model, **hints):
+        if is_pinned():
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in get_replicas() if is_healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o schema pela replicação
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Limita o 'pin' no primário ao request em que a escrita aconteceu"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _pinned.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned.reset(token)
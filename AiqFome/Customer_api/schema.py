@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views import View
+
+logger = logging.getLogger(__name__)
+
+
+def get_artifact_path():
+    path = Path(getattr(settings, 'OPENAPI_SCHEMA_PATH', 'openapi.json'))
+    return path if path.is_absolute() else Path(settings.BASE_DIR) / path
+
+
+def generate_schema():
+    """Gera o documento OpenAPI público (mesmo gerador/info do Swagger) em JSON"""
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson
+
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(swagger_settings.DEFAULT_INFO)
+    schema = generator.get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_artifact(body, path=None):
+    """Grava o JSON e a versão gzip ao lado (tmp + replace, leitores nunca veem arquivo parcial)"""
+    path = Path(path or get_artifact_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for target, content in ((path, body), (path.with_name(path.name + '.gz'), compress(body))):
+        tmp = target.with_name(target.name + '.tmp')
+        tmp.write_bytes(content)
+        tmp.replace(target)
+    return path
+
+
+def compress(body):
+    # mtime=0: o mesmo schema gera sempre os mesmos bytes
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class SchemaArtifact:
+    def __init__(self, body, gzip_body=None):
+        self.body = body
+        self.gzip_body = gzip_body or compress(body)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # ETag forte por representação: os bytes gzip e os sem compressão são diferentes
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+    @classmethod
+    def load(cls, path):
+        body = path.read_bytes()
+        gz_path = path.with_name(path.name + '.gz')
+        gzip_body = gz_path.read_bytes() if gz_path.exists() else None
+        if gzip_body is not None and gzip.decompress(gzip_body) != body:
+            gzip_body = None
+        return cls(body, gzip_body)
+
+
+_artifact = None
+_artifact_lock = threading.Lock()
+
+
+def get_artifact():
+    """
+        Schema em memória, carregado uma vez por processo do artefato gerado no deploy
+        (build_openapi_schema). Sem o arquivo, gera na primeira chamada e mantém em memória.
+    """
+    global _artifact
+    if _artifact is None:
+        with _artifact_lock:
+            if _artifact is None:
+                path = get_artifact_path()
+                if path.exists():
+                    _artifact = SchemaArtifact.load(path)
+                else:
+                    logger.warning('Artefato OpenAPI %s não encontrado; gerando em memória', path)
+                    _artifact = SchemaArtifact(generate_schema())
+    return _artifact
+
+
+def reset_artifact():
+    global _artifact
+    _artifact = None
+
+
+def accepts_gzip(accept_encoding):
+    """Accept-Encoding com q-values: 'gzip;q=0' recusa; '*' vale para gzip quando ele não é listado"""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0))) > 0
+
+
+class SchemaArtifactView(View):
+    """ Documento OpenAPI pré-gerado
+    /docs/swagger.json/
+
+        GET - Servido da memória, com ETag (304 para If-None-Match) e gzip pré-comprimido
+    """
+    def get(self, request):
+        artifact = get_artifact()
+        use_gzip = accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = artifact.gzip_etag if use_gzip else artifact.etag
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        elif use_gzip:
+            response = HttpResponse(artifact.gzip_body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(artifact.body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=300'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,149 @@
+import base64
+import json
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'customer_api_product_fts'
+# Pesos do bm25 por coluna: title, description, category
+FTS_WEIGHTS = (10.0, 1.0, 4.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_fts_table(using='default'):
+    """Cria a tabela FTS5 de produtos (idempotente)"""
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, description, category, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def rebuild_index(using='default'):
+    """Recria o índice inteiro a partir da tabela de produtos"""
+    if not fts_available(using):
+        return 0
+    ensure_fts_table(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description, category) '
+            f'SELECT id, title, description, category FROM {Product._meta.db_table}'
+        )
+        return cursor.rowcount
+
+
+def index_products(products, using='default'):
+    """Insere ou atualiza produtos no índice (usado pelos signals e pela importação em lote)"""
+    if not fts_available(using):
+        return
+    rows = [(p.pk, p.title, p.description, p.category) for p in products]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description, category) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def remove_products(product_ids, using='default'):
+    if not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+
+def build_match(query):
+    """Transforma o texto do usuário em uma expressão FTS5: todos os termos, com prefixo"""
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def is_cursor_value(value):
+    # bool é subclasse de int; inteiros fora de 64 bits estouram no bind do SQLite
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, float) or (isinstance(value, int) and -2 ** 63 <= value < 2 ** 63)
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido') from None
+
+
+def decode_keyset_cursor(cursor, length):
+    """Cursor da busca: lista de `length` números, senão ValueError (400 na view)"""
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != length or not all(map(is_cursor_value, values)):
+        raise ValueError('Cursor inválido')
+    return values
+
+
+def search_products(query, limit=20, cursor=None):
+    """
+        Busca produtos por title/description/category. Retorna (produtos, próximo cursor).
+        No SQLite usa o índice FTS5 ordenado por relevância (bm25), com paginação
+        keyset sobre (rank, id); nos demais bancos cai para icontains ordenado por id.
+    """
+    using = router.db_for_read(Product)
+    if not fts_available(using):
+        return _search_icontains(query, limit, decode_keyset_cursor(cursor, 1) if cursor else None)
+    # (rank, rowid) do último resultado da página anterior
+    after = decode_keyset_cursor(cursor, 2) if cursor else None
+
+    match = build_match(query)
+    if not match:
+        return [], None
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f'SELECT rowid, rank FROM ('
+        f'  SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        f')'
+    )
+    params = [match]
+    if after:
+        sql += ' WHERE rank > %s OR (rank = %s AND rowid > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    page = rows[:limit]
+    products = Product.objects.using(using).in_bulk([row[0] for row in page])
+    results = [products[pk] for pk, _ in page if pk in products]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+    return results, next_cursor
+
+
+def _search_icontains(query, limit, after):
+    filters = Q()
+    for token in TOKEN_RE.findall(query):
+        filters &= Q(title__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token)
+    queryset = Product.objects.filter(filters).order_by('id')
+    if after:
+        queryset = queryset.filter(id__gt=after[0])
+    rows = list(queryset[:limit + 1])
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(rows) > limit else None
+    return page, next_cursor
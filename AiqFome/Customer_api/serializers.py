@@ -18,6 +18,12 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = '__all__'
 
+class ProfileProductSerializer(serializers.ModelSerializer):
+    """Produto embutido no documento de perfil: sem favorite_count, que muda a todo favorito"""
+    class Meta:
+        model = Product
+        exclude = ['favorite_count']
+
 class FavoriteProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = FavoriteProduct
@@ -0,0 +1,128 @@
+"""
+    Servidor de produção (manage.py serve): gunicorn com a aplicação pré-carregada no
+    master e workers criados por fork, compartilhando a memória por copy-on-write.
+
+    - master, antes do fork: URLconf, settings do DRF e schema OpenAPI carregados;
+      conexões fechadas e gc.freeze() para o coletor não sujar as páginas compartilhadas;
+      a listener do log assíncrono é encerrada (a thread não passa pelo fork);
+    - worker, antes de aceitar conexões: recria a listener do log (no fork) e abre as
+      conexões com os bancos e com o cache;
+    - reciclagem: depois de SERVE['MAX_REQUESTS'] requests (com jitter) ou quando o RSS
+      passa de SERVE['MAX_MEMORY_MB'], ao fim do request em andamento;
+    - prontidão: /api/health/ready/ responde depois do aquecimento do worker; o arquivo
+      SERVE['READY_FILE'] só aparece quando todos os workers terminaram o aquecimento.
+
+    Workers sync (WSGI) servem a API REST com conexões persistentes com o banco. O stream
+    SSE (/api/events/) precisa de ASGI: SERVE['ASGI'] (--asgi) sobe workers uvicorn,
+    um pool separado para onde o proxy encaminha /api/events/.
+"""
+import os
+import shutil
+import signal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+from .log import stop_listeners
+from .warmup import rss_bytes, warm_up_process, warm_up_worker
+
+DEFAULTS = {
+    'BIND': '0.0.0.0:8000',
+    'WORKERS': (os.cpu_count() or 1) * 2 + 1,
+    'TIMEOUT': 30,
+    'MAX_REQUESTS': 5000,
+    'MAX_REQUESTS_JITTER': 500,   # evita que todos os workers reciclem juntos
+    'MAX_MEMORY_MB': 512,         # RSS de um worker; 0 desliga
+    'READY_FILE': '',             # criado quando todos os workers terminam o aquecimento
+    'ASGI': False,                # workers uvicorn, para o /api/events/
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SERVE', {})}
+
+
+class AsgiWorker(UvicornWorker):
+    """Worker uvicorn com a reciclagem por memória (o post_request do gunicorn não roda no ASGI)"""
+    max_memory = 0
+    recycling = False
+
+    async def callback_notify(self):
+        # Chamado pelo uvicorn a cada `timeout` segundos, também com streams SSE abertos
+        await super().callback_notify()
+        if self.max_memory and not self.recycling and rss_bytes() > self.max_memory:
+            self.log.info('Worker %s acima de %s MB, reciclando', self.pid, self.max_memory // (1024 * 1024))
+            self.recycling = True
+            # Desligamento gracioso do uvicorn; o master cria outro worker
+            os.kill(self.pid, signal.SIGTERM)
+
+
+def build_options(config):
+    """Configuração do gunicorn; os hooks fecham sobre `config` (já com os argumentos da linha de comando)"""
+    max_memory = config['MAX_MEMORY_MB'] * 1024 * 1024
+    ready_file = config['READY_FILE']
+    # Um arquivo por worker aquecido (pid); o último a aquecer cria o READY_FILE
+    warm_dir = Path(f'{ready_file}.workers') if ready_file else None
+
+    def on_starting(server):
+        warm_up_process()
+        # O master não atende requests: grava o que o aquecimento logou e encerra a listener;
+        # cada worker recria a sua depois do fork (log.restart_listeners)
+        stop_listeners()
+        if warm_dir:
+            shutil.rmtree(warm_dir, ignore_errors=True)
+            warm_dir.mkdir(parents=True)
+
+    def post_worker_init(worker):
+        worker.max_memory = max_memory
+        if warm_up_worker() and warm_dir:
+            (warm_dir / str(worker.pid)).touch()
+            if sum(1 for _ in warm_dir.iterdir()) >= config['WORKERS']:
+                Path(ready_file).touch()
+
+    def post_request(worker, req, environ, resp):
+        if max_memory and rss_bytes() > max_memory:
+            worker.log.info('Worker %s acima de %s MB, reciclando', worker.pid, config['MAX_MEMORY_MB'])
+            worker.alive = False
+
+    def child_exit(server, worker):
+        if warm_dir:
+            (warm_dir / str(worker.pid)).unlink(missing_ok=True)
+
+    def on_exit(server):
+        if ready_file:
+            Path(ready_file).unlink(missing_ok=True)
+            shutil.rmtree(warm_dir, ignore_errors=True)
+
+    return {
+        'bind': config['BIND'],
+        'workers': config['WORKERS'],
+        'worker_class': 'Customer_api.server.AsgiWorker' if config['ASGI'] else 'sync',
+        'timeout': config['TIMEOUT'],
+        'max_requests': config['MAX_REQUESTS'],
+        'max_requests_jitter': config['MAX_REQUESTS_JITTER'],
+        'preload_app': True,
+        'on_starting': on_starting,
+        'post_worker_init': post_worker_init,
+        'post_request': post_request,
+        'child_exit': child_exit,
+        'on_exit': on_exit,
+    }
+
+
+class Application(BaseApplication):
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return get_asgi_application() if self.asgi else get_wsgi_application()
@@ -0,0 +1,141 @@
+from django.db import router
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalog, changes, documents, events, search
+from .models import Customer, FavoriteChange, FavoriteProduct, Product
+from .routers import get_shards, shard_for
+from .sqlite import apply_sqlite_pragmas
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
+
+
+@receiver(pre_delete, sender=Customer)
+def delete_sharded_favorites_for_customer(sender, instance, using, **kwargs):
+    # O cascade do Collector só enxerga o banco do cliente; o shard pode ser outro
+    alias = shard_for(instance.pk)
+    if alias != using:
+        FavoriteProduct.objects.using(alias).filter(customer_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=Product)
+def delete_sharded_favorites_for_product(sender, instance, using, **kwargs):
+    # O contador de favoritos sai junto com o produto: as variações são descartadas
+    with catalog.batch_favorite_counts(apply=False):
+        for alias in get_shards():
+            if alias != using:
+                FavoriteProduct.objects.using(alias).filter(product_id=instance.pk).delete()
+
+
+@receiver(post_migrate)
+def create_product_search_index(sender, using, **kwargs):
+    if sender.name == 'Customer_api' and router.allow_migrate_model(using, Product):
+        search.ensure_fts_table(using)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, using, **kwargs):
+    search.index_products([instance], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using, **kwargs):
+    search.remove_products([instance.pk], using=using)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, raw, using, **kwargs):
+    instance._previous_category = None
+    if instance.pk and not raw:
+        instance._previous_category = (
+            Product.objects.using(using).filter(pk=instance.pk).values_list('category', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def count_product_category(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_category', None)
+    if created or previous is None:
+        catalog.update_category_counts({instance.category: 1})
+    elif previous != instance.category:
+        catalog.update_category_counts({previous: -1, instance.category: 1})
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product_category(sender, instance, **kwargs):
+    catalog.update_category_counts({instance.category: -1})
+
+
+@receiver(post_save, sender=FavoriteProduct)
+def count_favorite(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        catalog.count_favorites({instance.product_id_id: 1})
+
+
+@receiver(post_delete, sender=FavoriteProduct)
+def uncount_favorite(sender, instance, origin=None, **kwargs):
+    # Cascade de um produto apagado: não há contador para atualizar
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not Product:
+        catalog.count_favorites({instance.product_id_id: -1})
+
+
+@receiver(post_save, sender=FavoriteProduct)
+def log_favorite_added(sender, instance, created, raw, using, **kwargs):
+    # Mesmo alias (e transação, ver FavoriteProduct.save) do favorito
+    if created and not raw:
+        changes.record_changes(using, [(instance.customer_id, instance.product_id_id, FavoriteChange.ADD)])
+        publish_favorite_event(instance, FavoriteChange.ADD, using)
+
+
+@receiver(post_delete, sender=FavoriteProduct)
+def log_favorite_removed(sender, instance, using, **kwargs):
+    changes.record_changes(using, [(instance.customer_id, instance.product_id_id, FavoriteChange.REMOVE)])
+    publish_favorite_event(instance, FavoriteChange.REMOVE, using)
+
+
+def publish_favorite_event(instance, action, using):
+    # Só depois do commit: assinantes do SSE nunca veem um favorito que sofreu rollback
+    events.publish_on_commit('favorite', {
+        'customer_id': instance.customer_id,
+        'product_id': instance.product_id_id,
+        'action': action,
+    }, using=using)
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_customer_document(sender, instance, created, raw, using, **kwargs):
+    if not created and not raw:
+        documents.invalidate_on_commit([instance.pk], using)
+
+
+@receiver(post_delete, sender=Customer)
+def drop_customer_document(sender, instance, using, **kwargs):
+    documents.invalidate_on_commit([instance.pk], using)
+
+
+@receiver(post_save, sender=FavoriteProduct)
+def invalidate_document_on_favorite_saved(sender, instance, raw, using, **kwargs):
+    if not raw:
+        documents.invalidate_on_commit([instance.customer_id], using)
+
+
+@receiver(post_delete, sender=FavoriteProduct)
+def invalidate_document_on_favorite_removed(sender, instance, using, **kwargs):
+    documents.invalidate_on_commit([instance.customer_id], using)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_documents_on_product_saved(sender, instance, created, raw, using, **kwargs):
+    # Produto novo ainda não está em nenhum favorito
+    if not created and not raw:
+        documents.invalidate_products_on_commit([instance.pk], using)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_documents_on_product_removed(sender, instance, using, **kwargs):
+    documents.invalidate_products_on_commit([instance.pk], using)
@@ -0,0 +1,57 @@
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Aplica settings.SQLITE_PRAGMAS em cada nova conexão SQLite (signal connection_created)"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return any(error in message for error in LOCK_ERRORS)
+
+
+def in_atomic_block():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def retry_on_lock(func=None, *, attempts=5, base_delay=0.05, max_delay=1.0):
+    """
+        Repete a função quando o SQLite responde "database is locked", com backoff
+        exponencial e jitter completo. Dentro de um atomic() externo não há o que
+        repetir (a transação já falhou), então o erro sobe na hora.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if not is_lock_error(exc) or attempt == attempts - 1 or in_atomic_block():
+                        raise
+                    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                    logger.warning('SQLite ocupado em %s, nova tentativa em %.3fs', func.__qualname__, delay)
+                    time.sleep(delay)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,167 @@
+"""
+    Dados sintéticos determinísticos para testes de carga (comando generate_data).
+
+    Os favoritos são gerados com NumPy em blocos de clientes, cada bloco com a sua
+    semente derivada de --seed: o resultado é o mesmo com qualquer número de processos.
+    Favoritos por cliente seguem uma distribuição de Pareto (poucos clientes com muitos
+    favoritos) e a popularidade dos produtos uma lei de Zipf. A gravação é feita com
+    INSERTs em lote (executemany), sem Model.save(), signals ou bulk_create; contadores,
+    facetas e índice de busca são recalculados no fim.
+"""
+import zlib
+
+import numpy as np
+from django.db import connections, transaction
+
+from .models import Customer, FavoriteProduct, Product
+from .routers import shard_for
+
+CATEGORIES = ["men's clothing", "women's clothing", 'jewelery', 'electronics']
+WORDS = (
+    'camiseta calça jaqueta vestido saia tênis bolsa anel colar brinco relógio fone cabo '
+    'monitor teclado mouse notebook carregador caixa som algodão couro prata ouro slim '
+    'casual esportivo clássico premium básico digital sem fio portátil'
+).split()
+
+START = np.datetime64('2024-01-01T00:00:00', 'us')
+SPAN_US = 365 * 24 * 3600 * 10**6
+
+_popularity = None
+
+
+def chunk_seeds(seed, count):
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def popularity(product_ids, exponent, seed):
+    """(ids em ordem de popularidade, CDF de Zipf): a ordem é embaralhada para não seguir o id"""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, 1]))
+    order = rng.permutation(np.asarray(product_ids, dtype=np.int64))
+    weights = np.arange(1, len(order) + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    return order, cdf / cdf[-1]
+
+
+def favorite_counts(customers, total, alpha, cap, seed):
+    """Favoritos por cliente (Pareto), normalizados para somar ~`total` respeitando o teto"""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, 2]))
+    weights = rng.pareto(alpha, customers) + 1
+    counts = np.zeros(customers, dtype=np.int64)
+    capped = np.zeros(customers, dtype=bool)
+    # O que passa do teto é redistribuído entre os demais, proporcionalmente
+    for _ in range(10):
+        remaining = total - cap * capped.sum()
+        free = weights * ~capped
+        if remaining <= 0 or not free.any():
+            break
+        # Arredondamento estocástico: a soma fica perto de `total` mesmo com muitos clientes pequenos
+        expected = free / free.sum() * remaining
+        counts = np.where(capped, cap, np.floor(expected + rng.random(customers))).astype(np.int64)
+        over = counts > cap
+        if not over.any():
+            break
+        capped |= over
+    return np.minimum(counts, cap)
+
+
+def timestamps(rng, size):
+    # Mesmo formato que o Django grava no SQLite ("AAAA-MM-DD HH:MM:SS.ffffff"), comparável como texto
+    values = START + rng.integers(0, SPAN_US, size=size).astype('timedelta64[us]')
+    return np.char.replace(np.datetime_as_string(values, unit='us'), 'T', ' ')
+
+
+def init_worker(order, cdf):
+    global _popularity
+    _popularity = (order, cdf)
+
+
+def generate_favorites(task):
+    """Um bloco de clientes -> arrays (customer_id, product_id, date_addition) sem pares repetidos"""
+    first_customer_id, counts, seed = task
+    order, cdf = _popularity
+    rng = np.random.default_rng(seed)
+    ids = np.arange(first_customer_id, first_customer_id + len(counts), dtype=np.int64)
+    base = int(order.max()) + 1
+    keys = np.empty(0, dtype=np.int64)
+    missing = counts
+    # Amostragem com reposição: repetidos de um mesmo cliente são descartados e repostos
+    for _ in range(8):
+        customers = np.repeat(ids, missing)
+        if not len(customers):
+            break
+        ranks = np.minimum(np.searchsorted(cdf, rng.random(len(customers)), side='right'), len(order) - 1)
+        keys = np.union1d(keys, customers * base + order[ranks])
+        missing = counts - np.bincount(keys // base - first_customer_id, minlength=len(counts))
+    return keys // base, keys % base, timestamps(rng, len(keys))
+
+
+def insert_rows(using, model, columns, rows, batch_size):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(name).column) for name in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def next_id(model, field='id'):
+    last = model.objects.order_by(f'-{field}').values_list(field, flat=True).first()
+    return (last or 0) + 1
+
+
+def create_products(count, seed, batch_size):
+    rng = np.random.default_rng(np.random.SeedSequence([seed, 3]))
+    first_id, first_api_id = next_id(Product), next_id(Product, 'api_id')
+    words = rng.integers(0, len(WORDS), size=(count, 3))
+    categories = rng.integers(0, len(CATEGORIES), size=count)
+    prices = rng.integers(100, 100_000, size=count) / 100
+    rates = rng.integers(10, 51, size=count) / 10
+    rating_counts = rng.integers(0, 1000, size=count)
+    rows = [
+        (
+            first_id + i, first_api_id + i,
+            ' '.join(WORDS[w] for w in words[i]).capitalize(), f'{prices[i]:.2f}',
+            f'Produto sintético {first_api_id + i}', CATEGORIES[categories[i]],
+            f'https://example.com/products/{first_api_id + i}.jpg', f'{rates[i]:.1f}', int(rating_counts[i]), 0,
+        )
+        for i in range(count)
+    ]
+    insert_rows('default', Product, [
+        'id', 'api_id', 'title', 'price', 'description', 'category', 'image_url',
+        'rating_rate', 'rating_count', 'favorite_count',
+    ], rows, batch_size)
+    return list(range(first_id, first_id + count))
+
+
+def create_customers(count, seed, batch_size):
+    rng = np.random.default_rng(np.random.SeedSequence([seed, 4]))
+    first_id = next_id(Customer)
+    dates = timestamps(rng, count)
+    rows = [
+        (first_id + i, f'Cliente {first_id + i}', f'cliente{first_id + i}@synthetic.example.com', dates[i])
+        for i in range(count)
+    ]
+    insert_rows('default', Customer, ['id', 'name', 'email', 'date_register'], rows, batch_size)
+    return first_id
+
+
+def insert_favorites(customers, products, dates, batch_size):
+    """Grava um bloco de favoritos no shard de cada cliente"""
+    ids, inverse = np.unique(customers, return_inverse=True)
+    aliases = [shard_for(customer_id) for customer_id in ids.tolist()]
+    shards = list(dict.fromkeys(aliases))
+    positions = np.array([shards.index(alias) for alias in aliases], dtype=np.int64)[inverse]
+    for position, alias in enumerate(shards):
+        mask = positions == position
+        rows = list(zip(customers[mask].tolist(), products[mask].tolist(), dates[mask].tolist()))
+        insert_rows(alias, FavoriteProduct, ['customer', 'product_id', 'date_addition'], rows, batch_size)
+    return len(customers)
+
+
+def checksum(customers, products, value=0):
+    """Impressão digital acumulada dos blocos (para conferir o determinismo entre execuções)"""
+    return zlib.crc32(products.tobytes(), zlib.crc32(customers.tobytes(), value))
@@ -2,7 +2,41 @@ from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Customer, Product, FavoriteProduct
+from django.conf import settings
+from django.test import override_settings
+from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.cache import cache
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Customer, Product, FavoriteProduct, CategoryFacet, FavoriteChange
+from . import admin as api_admin, catalog, changes, docs, documents, events, idempotency, profiling, purge, recommendations, schema, server, synthetic, warmup
+from .log import JsonFormatter, QueueLogHandler, RequestIdFilter, SamplingFilter
+from .management.commands.rebalance_favorites import copy_favorites
+from .management.commands.replicate_sqlite import Command as ReplicateSQLiteCommand
+from .routers import FavoriteShardRouter, PrimaryReplicaRouter, shard_for
+from .sqlite import apply_sqlite_pragmas, retry_on_lock
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock, skipUnless
+from collections import Counter
+import asyncio
+import base64
+import contextvars
+import copy
+import gzip
+import io
+import json
+import logging
+import logging.config
+import os
+import re
+import signal
+import sqlite3
+import tempfile
+import numpy as np
 
 User = get_user_model()
 
@@ -77,7 +111,7 @@ class CustomerTests(APITestCase):
         customer = Customer.objects.create(name="Customer", email="customer@example.com")
         url = reverse('customer-detail', args=[customer.id])
         response = self.client.delete(url, format='json')
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
 class FavoriteProductTests(APITestCase):
 
@@ -146,3 +180,1322 @@ class ProductImportTests(APITestCase):
         with self.assertRaises(requests.exceptions.RequestException):
             response = self.client.post(url, format='json')
             self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+class LoggingPipelineTests(APITestCase):
+
+    def test_request_id_header(self):
+        url = reverse('register')
+        response = self.client.post(url, {}, format='json', HTTP_X_REQUEST_ID='abc123')
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+
+        response = self.client.post(url, {}, format='json')
+        self.assertTrue(response['X-Request-ID'])
+
+    def test_json_formatter(self):
+        record = logging.LogRecord('django', logging.INFO, __file__, 1, 'olá %s', ('mundo',), None)
+        RequestIdFilter().filter(record)
+        payload = json.loads(JsonFormatter().format(record))
+        self.assertEqual(payload['message'], 'olá mundo')
+        self.assertEqual(payload['request_id'], '-')
+        self.assertEqual(payload['level'], 'INFO')
+
+    def test_settings_logging_handler(self):
+        # Handler do settings montado pelo dictConfig, com o arquivo em um diretório temporário
+        # (dictConfig() inteiro fecharia os handlers do processo de teste)
+        spec = copy.deepcopy(settings.LOGGING['handlers']['async'])
+        spec.update(filename=os.path.join(tempfile.mkdtemp(), 'debug.log'), console=False)
+        del spec['filters']
+        handler = logging.config.DictConfigurator({'version': 1}).configure_handler(spec)
+        self.assertIsInstance(handler, QueueLogHandler)
+        handler.handle(logging.LogRecord('django', logging.INFO, __file__, 1, 'configurado', None, None))
+        handler.close()
+        with open(spec['filename'], encoding='utf-8') as log_file:
+            self.assertEqual(json.loads(log_file.readline())['message'], 'configurado')
+
+    @skipUnless(hasattr(os, 'fork'), 'fork indisponível')
+    def test_listener_restarted_after_fork(self):
+        # Como o worker do gunicorn com preload_app: o handler foi criado no processo pai
+        filename = os.path.join(tempfile.mkdtemp(), 'debug.log')
+        handler = QueueLogHandler(filename=filename, console=False)
+        self.addCleanup(handler.close)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                handler.handle(logging.LogRecord('django', logging.INFO, __file__, 1, 'filho', None, None))
+                handler.close()
+                code = 0
+            finally:
+                os._exit(code)
+        _, status_code = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status_code), 0)
+        with open(filename, encoding='utf-8') as log_file:
+            self.assertEqual([json.loads(line)['message'] for line in log_file], ['filho'])
+
+    def test_debug_sampling(self):
+        sampler = SamplingFilter(every=10)
+        debug = logging.LogRecord('django', logging.DEBUG, __file__, 1, 'debug', None, None)
+        error = logging.LogRecord('django', logging.ERROR, __file__, 1, 'error', None, None)
+        self.assertEqual(sum(sampler.filter(debug) for _ in range(100)), 10)
+        self.assertTrue(all(sampler.filter(error) for _ in range(100)))
+
+@override_settings(PROFILING={'SAMPLE_RATE': 0.0, 'TOKEN': 'segredo', 'DIRECTORY': tempfile.mkdtemp(), 'MAX_PROFILES': 2})
+class ProfilingTests(APITestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='testpass', is_staff=True)
+        self.client.force_authenticate(user=self.staff)
+
+    def test_profile_with_token_header(self):
+        response = self.client.get(reverse('Customer-list-create'), HTTP_X_PROFILE='segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        name = response['X-Profile-Id']
+
+        response = self.client.get(reverse('profile-detail', args=[name]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['path'], reverse('Customer-list-create'))
+        self.assertTrue(response.data['top_functions'])
+
+    def test_request_without_token_not_profiled(self):
+        response = self.client.get(reverse('Customer-list-create'), HTTP_X_PROFILE='errado')
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_concurrent_request_not_profiled(self):
+        # Outro request segura o profiler do processo: este é servido normalmente, sem perfil
+        with profiling.PROFILER_LOCK:
+            response = self.client.get(reverse('Customer-list-create'), HTTP_X_PROFILE='segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        response = self.client.get(reverse('Customer-list-create'), HTTP_X_PROFILE='segredo')
+        self.assertIn('X-Profile-Id', response)
+
+    def test_ring_is_bounded(self):
+        for _ in range(4):
+            self.client.get(reverse('Customer-list-create'), HTTP_X_PROFILE='segredo')
+        response = self.client.get(reverse('profile-list'))
+        self.assertEqual(len(response.data), 2)
+
+    def test_profiles_staff_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='comum', password='testpass'))
+        response = self.client.get(reverse('profile-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class PrimaryReplicaRouterTests(APITestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def run_request(self, func):
+        # Cada request começa sem 'pin' no primário
+        return contextvars.Context().run(func)
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_reads_go_to_healthy_replica(self):
+        with mock.patch('Customer_api.routers.is_healthy', side_effect=lambda alias: alias == 'replica2'):
+            self.assertEqual(self.run_request(lambda: self.router.db_for_read(Customer)), 'replica2')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_no_healthy_replica_falls_back_to_primary(self):
+        with mock.patch('Customer_api.routers.is_healthy', return_value=False):
+            self.assertEqual(self.run_request(lambda: self.router.db_for_read(Customer)), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_read_after_write_sticks_to_primary(self):
+        def request():
+            before = self.router.db_for_read(Customer)
+            self.assertEqual(self.router.db_for_write(Customer), 'default')
+            return before, self.router.db_for_read(Customer)
+
+        with mock.patch('Customer_api.routers.is_healthy', return_value=True):
+            self.assertEqual(self.run_request(request), ('replica1', 'default'))
+            self.assertEqual(self.run_request(lambda: self.router.db_for_read(Customer)), 'replica1')
+
+    def test_replicate_sqlite_reaches_open_connections(self):
+        directory = tempfile.mkdtemp()
+        primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(primary) as source:
+            source.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        replicate = ReplicateSQLiteCommand().replicate
+        replicate(primary, replica)
+        # Conexão persistente da API (CONN_MAX_AGE) aberta antes da próxima cópia
+        reader = sqlite3.connect(replica)
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM item').fetchone()[0], 0)
+        with sqlite3.connect(primary) as source:
+            source.execute('INSERT INTO item DEFAULT VALUES')
+        replicate(primary, replica)
+        self.assertEqual(reader.execute('SELECT COUNT(*) FROM item').fetchone()[0], 1)
+        reader.close()
+
+@override_settings(FAVORITE_SHARDS=['shard0', 'shard1', 'shard2'])
+class FavoriteShardRouterTests(APITestCase):
+
+    def setUp(self):
+        self.router = FavoriteShardRouter()
+
+    def test_shard_for_is_stable(self):
+        shards = {shard_for(customer_id) for customer_id in range(1, 200)}
+        self.assertEqual(shards, {'shard0', 'shard1', 'shard2'})
+        self.assertEqual(shard_for(42), shard_for(42))
+
+    def test_routes_by_customer_hint(self):
+        customer = Customer(id=7, name="Customer", email="customer@example.com")
+        favorite = FavoriteProduct(customer_id=7, product_id_id=1)
+        self.assertEqual(self.router.db_for_read(FavoriteProduct, instance=customer), shard_for(7))
+        self.assertEqual(self.router.db_for_write(FavoriteProduct, instance=favorite), shard_for(7))
+        self.assertIsNone(self.router.db_for_read(Customer, instance=customer))
+
+    def test_for_customer_uses_shard(self):
+        self.assertEqual(FavoriteProduct.objects.for_customer(7).db, shard_for(7))
+
+    def test_bulk_create_groups_by_shard(self):
+        objs = [FavoriteProduct(customer_id=customer_id, product_id_id=1) for customer_id in range(1, 20)]
+        by_shard = FavoriteProduct.objects.group_by_shard(objs)
+        self.assertTrue(all(shard_for(obj.customer_id) == alias for alias, group in by_shard.items() for obj in group))
+        self.assertEqual(FavoriteProduct.objects.using('default').group_by_shard(objs), {'default': objs})
+
+    @override_settings(FAVORITE_SHARDS=['shard0'])
+    def test_bulk_create_single_shard(self):
+        # O queryset sem hint resolve para o 'default', onde os favoritos nunca seriam lidos
+        objs = [FavoriteProduct(customer_id=1, product_id_id=1)]
+        self.assertEqual(FavoriteProduct.objects.all().db, 'default')
+        self.assertEqual(FavoriteProduct.objects.group_by_shard(objs), {'shard0': objs})
+        self.assertEqual(FavoriteProduct.objects.for_customer(1).db, 'shard0')
+
+    def test_migrate_only_favorites_on_shards(self):
+        self.assertTrue(self.router.allow_migrate('shard1', 'Customer_api', 'favoriteproduct'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'Customer_api', 'customer'))
+        self.assertIsNone(self.router.allow_migrate('default', 'Customer_api', 'customer'))
+
+class RebalanceFavoritesTests(APITestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Customer', email='customer@example.com')
+        self.product = Product.objects.create(api_id=1, title='Produto', price=10, description='Produto',
+                                              category='jewelery', image_url='http://example.com/p.jpg')
+
+    def test_copy_keeps_date_addition(self):
+        original = timezone.now() - timedelta(days=30)
+        favorite = FavoriteProduct(customer=self.customer, product_id=self.product, date_addition=original)
+        copy_favorites('default', [favorite])
+        # Rodada anterior interrompida: a cópia já existe e é ignorada
+        copy_favorites('default', [favorite])
+        self.assertEqual(FavoriteProduct.objects.get().date_addition, original)
+        # O campo do modelo não é alterado: saves de outras threads continuam com auto_now_add
+        self.assertTrue(FavoriteProduct._meta.get_field('date_addition').auto_now_add)
+
+    def test_move_has_no_side_effects(self):
+        FavoriteProduct.objects.create(customer=self.customer, product_id=self.product)
+        changes_before = FavoriteChange.objects.count()
+        # Todos os favoritos pertencem a outro shard; a cópia para ele não faz parte deste teste
+        with mock.patch('Customer_api.management.commands.rebalance_favorites.shard_for', return_value='shard1'), \
+                mock.patch('Customer_api.management.commands.rebalance_favorites.copy_favorites') as copy, \
+                mock.patch.object(events, 'publish') as publish, \
+                mock.patch.object(documents, 'invalidate') as invalidate, \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('rebalance_favorites', '--source', 'default', stdout=io.StringIO())
+        self.assertEqual(copy.call_args.args[0], 'shard1')
+        self.assertFalse(FavoriteProduct.objects.exists())
+        self.assertEqual(FavoriteChange.objects.count(), changes_before)
+        publish.assert_not_called()
+        invalidate.assert_not_called()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.favorite_count, 1)
+
+class SQLiteProfileTests(APITestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_pragmas_applied_on_connection(self):
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    @mock.patch('Customer_api.sqlite.time.sleep')
+    @mock.patch('Customer_api.sqlite.in_atomic_block', return_value=False)
+    def test_retry_on_lock(self, in_atomic_block, sleep):
+        calls = mock.Mock(side_effect=[OperationalError('database is locked'), OperationalError('database is locked'), 'ok'])
+
+        def flaky_write():
+            return calls()
+
+        self.assertEqual(retry_on_lock(flaky_write)(), 'ok')
+        self.assertEqual(calls.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('Customer_api.sqlite.time.sleep')
+    def test_no_retry_for_other_errors(self, sleep):
+        calls = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(calls)()
+        self.assertEqual(calls.call_count, 1)
+
+class ProductSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        for i, (title, category) in enumerate([
+            ("Camiseta Algodão", "men's clothing"),
+            ("Camisa Social", "men's clothing"),
+            ("Mochila Notebook", "bags"),
+            ("Anel de prata", "jewelery"),
+        ], start=1):
+            Product.objects.create(
+                api_id=i, title=title, price=10, description="Produto de teste",
+                category=category, image_url="http://example.com/image.jpg"
+            )
+
+    def test_prefix_search(self):
+        response = self.client.get(reverse('product-search'), {'q': 'cami'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({p['title'] for p in response.data['results']}, {"Camiseta Algodão", "Camisa Social"})
+
+    def test_diacritics_and_category(self):
+        response = self.client.get(reverse('product-search'), {'q': 'algodao clothing'})
+        self.assertEqual([p['title'] for p in response.data['results']], ["Camiseta Algodão"])
+
+    def test_keyset_pagination(self):
+        url = reverse('product-search')
+        response = self.client.get(url, {'q': 'produto', 'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(url, {'q': 'produto', 'limit': 3, 'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_malformed_cursor(self):
+        url = reverse('product-search')
+        for value in ([1], {'a': 1}, 5, [1, 'x'], [True, 1], [0.5, 2 ** 70], 'texto'):
+            cursor = base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            response = self.client.get(url, {'q': 'produto', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, value)
+        response = self.client.get(url, {'q': 'produto', 'cursor': 'não é base64'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_updates_and_deletes(self):
+        product = Product.objects.get(api_id=3)
+        product.title = "Bolsa Executiva"
+        product.save()
+        self.assertEqual(self.client.get(reverse('product-search'), {'q': 'mochila'}).data['results'], [])
+        product.delete()
+        self.assertEqual(self.client.get(reverse('product-search'), {'q': 'bolsa'}).data['results'], [])
+
+    def test_query_required(self):
+        response = self.client.get(reverse('product-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch('Customer_api.views.requests.get')
+    def test_import_indexes_products(self, requests_get):
+        requests_get.return_value.json.return_value = [{
+            'id': 99, 'title': 'Jaqueta Jeans', 'price': 120.5, 'description': 'Jaqueta',
+            'category': "women's clothing", 'image': 'http://example.com/j.jpg',
+            'rating': {'rate': 4.1, 'count': 30},
+        }]
+        response = self.client.post(reverse('import-products'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported_ids'], [99])
+
+        response = self.client.get(reverse('product-search'), {'q': 'jaq'})
+        self.assertEqual([p['api_id'] for p in response.data['results']], [99])
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductListTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        for i, (category, price, rating) in enumerate([
+            ('electronics', 100, 4.5), ('electronics', 50, 3.0), ('jewelery', 300, 4.9), ('jewelery', 20, 2.0),
+        ], start=1):
+            Product.objects.create(
+                api_id=i, title=f"Produto {i}", price=price, description="Produto de teste",
+                category=category, image_url="http://example.com/image.jpg", rating_rate=rating
+            )
+
+    def test_filters_and_ordering(self):
+        response = self.client.get(reverse('product-list'), {'category': 'electronics', 'ordering': '-price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['api_id'] for p in response.data['results']], [1, 2])
+
+        response = self.client.get(reverse('product-list'), {'min_price': 40, 'min_rating': 4, 'ordering': 'price'})
+        self.assertEqual([p['api_id'] for p in response.data['results']], [1, 3])
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse('product-list'), {'min_price': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination(self):
+        response = self.client.get(reverse('product-list'), {'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([p['api_id'] for p in response.data['results']], [4])
+
+    def test_facets_are_incremental(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.data['facets'], {'electronics': 2, 'jewelery': 2})
+
+        product = Product.objects.get(api_id=4)
+        product.category = 'electronics'
+        product.save()
+        Product.objects.get(api_id=3).delete()
+        cache.clear()
+        self.assertEqual(catalog.get_category_facets(), {'electronics': 3})
+
+    def test_drifted_facet_does_not_block_delete(self):
+        # Faceta divergente (ex.: inserts que não passaram pelos signals)
+        CategoryFacet.objects.filter(category='jewelery').update(product_count=0)
+        Product.objects.get(api_id=3).delete()
+        self.assertEqual(CategoryFacet.objects.get(category='jewelery').product_count, 0)
+        self.assertEqual(catalog.rebuild_category_facets()['jewelery'], 1)
+
+    def test_facets_served_from_cache(self):
+        catalog.get_category_facets()
+        with self.assertNumQueries(0):
+            catalog.get_category_facets()
+
+    def test_rebuild_facets(self):
+        CategoryFacet.objects.all().update(product_count=99)
+        self.assertEqual(catalog.rebuild_category_facets(), {'electronics': 2, 'jewelery': 2})
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FavoriteCounterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.customers = [Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com") for i in range(3)]
+        self.products = [
+            Product.objects.create(
+                api_id=i, title=f"Produto {i}", price=10, description="Produto de teste",
+                category="Category", image_url="http://example.com/image.jpg"
+            )
+            for i in range(1, 4)
+        ]
+
+    def favorite_counts(self):
+        return list(Product.objects.order_by('api_id').values_list('favorite_count', flat=True))
+
+    def test_counts_follow_adds_and_removes(self):
+        favorite = FavoriteProduct.objects.create(customer=self.customers[0], product_id=self.products[0])
+        FavoriteProduct.objects.create(customer=self.customers[1], product_id=self.products[0])
+        self.assertEqual(self.favorite_counts(), [2, 0, 0])
+        favorite.delete()
+        self.assertEqual(self.favorite_counts(), [1, 0, 0])
+
+    def test_bulk_create_counts(self):
+        FavoriteProduct.objects.bulk_create([
+            FavoriteProduct(customer=customer, product_id=product)
+            for customer in self.customers for product in self.products[:2]
+        ])
+        self.assertEqual(self.favorite_counts(), [3, 3, 0])
+        FavoriteProduct.objects.filter(customer=self.customers[0]).delete()
+        self.assertEqual(self.favorite_counts(), [2, 2, 0])
+
+    def test_reconcile(self):
+        FavoriteProduct.objects.create(customer=self.customers[0], product_id=self.products[2])
+        Product.objects.update(favorite_count=7)
+        self.assertEqual(catalog.reconcile_favorite_counts(), 3)
+        self.assertEqual(self.favorite_counts(), [0, 0, 1])
+
+    def test_reconcile_keeps_concurrent_increments(self):
+        FavoriteProduct.objects.create(customer=self.customers[0], product_id=self.products[0])
+        Product.objects.update(favorite_count=7)
+        real_shards = catalog.get_shards()
+
+        def concurrent_increment():
+            # Favorito adicionado entre a leitura dos contadores e o UPDATE da correção
+            catalog.update_favorite_counts({self.products[0].pk: 1})
+            return real_shards
+
+        with mock.patch.object(catalog, 'get_shards', side_effect=concurrent_increment):
+            self.assertEqual(catalog.reconcile_favorite_counts(), 3)
+        self.assertEqual(self.favorite_counts(), [2, 0, 0])
+
+    def counter_updates(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE') and 'favorite_count' in q['sql']]
+
+    def test_bulk_delete_updates_counters_once(self):
+        for product in self.products:
+            FavoriteProduct.objects.create(customer=self.customers[0], product_id=product)
+        with CaptureQueriesContext(connection) as queries:
+            FavoriteProduct.objects.filter(customer=self.customers[0]).delete()
+        self.assertEqual(len(self.counter_updates(queries.captured_queries)), 1)
+        self.assertEqual(self.favorite_counts(), [0, 0, 0])
+
+        for customer in self.customers:
+            FavoriteProduct.objects.create(customer=customer, product_id=self.products[1])
+        with CaptureQueriesContext(connection) as queries:
+            self.products[1].delete()
+        self.assertEqual(self.counter_updates(queries.captured_queries), [])
+
+    def test_popular_endpoint(self):
+        for customer in self.customers:
+            FavoriteProduct.objects.create(customer=customer, product_id=self.products[1])
+        FavoriteProduct.objects.create(customer=self.customers[0], product_id=self.products[2])
+
+        response = self.client.get(reverse('product-popular'), {'limit': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['api_id'] for p in response.data], [2, 3])
+
+        with self.assertNumQueries(0):
+            catalog.get_popular_products(5)
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RelatedProductsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(
+                api_id=i, title=f"Produto {i}", price=10, description="Produto de teste",
+                category="Category", image_url="http://example.com/image.jpg"
+            )
+            for i in range(1, 5)
+        ]
+        customers = [Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com") for i in range(3)]
+        # Produto 1 aparece com o 2 em três clientes e com o 3 em um
+        baskets = [[0, 1, 2], [0, 1], [0, 1, 3]]
+        FavoriteProduct.objects.bulk_create([
+            FavoriteProduct(customer=customer, product_id=self.products[index])
+            for customer, basket in zip(customers, baskets) for index in basket
+        ])
+
+    def test_top_k_cooccurrence(self):
+        related = recommendations.top_k_cooccurrence(
+            np.array([1, 1, 1, 2, 2, 3, 3]), np.array([10, 20, 30, 10, 20, 10, 40]), top_k=2, block_size=2
+        )
+        self.assertEqual(related[10], [(20, 2), (30, 1)])
+        self.assertEqual(related[40], [(10, 1)])
+
+    def test_related_endpoint(self):
+        recommendations.compute_related_products(top_k=2)
+        response = self.client.get(reverse('product-related', args=[self.products[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(p['api_id'], p['score']) for p in response.data], [(2, 3), (3, 1)])
+
+        with self.assertNumQueries(0):
+            recommendations.get_related_products(self.products[0].id, 10)
+
+    def test_related_unknown_product(self):
+        response = self.client.get(reverse('product-related', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FavoriteChangeFeedTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.customer = Customer.objects.create(name="Test Customer", email="test@example.com")
+        self.products = [
+            Product.objects.create(
+                api_id=i, title=f"Produto {i}", price=10, description="Produto de teste",
+                category="Category", image_url="http://example.com/image.jpg"
+            )
+            for i in range(1, 4)
+        ]
+        self.url = reverse('favorite-changes', kwargs={'Customer_id': self.customer.id})
+
+    def sync(self, **params):
+        return self.client.get(self.url, params)
+
+    def test_snapshot_then_deltas_with_tombstones(self):
+        favorite = FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[0])
+        response = self.sync()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['reset'])
+        self.assertEqual([c['product_id'] for c in response.data['changes']], [self.products[0].id])
+
+        favorite.delete()
+        FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[1])
+        response = self.sync(since=response.data['cursor'])
+        self.assertFalse(response.data['reset'])
+        self.assertEqual(
+            [(c['product_id'], c['action']) for c in response.data['changes']],
+            [(self.products[0].id, 'remove'), (self.products[1].id, 'add')]
+        )
+
+        response = self.sync(since=response.data['cursor'])
+        self.assertEqual(response.data['changes'], [])
+
+    def test_pagination_and_bulk_create(self):
+        response = self.sync()
+        FavoriteProduct.objects.bulk_create([
+            FavoriteProduct(customer=self.customer, product_id=product) for product in self.products
+        ])
+        response = self.sync(since=response.data['cursor'], limit=2)
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual(len(response.data['changes']), 2)
+        response = self.sync(since=response.data['cursor'], limit=2)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual([c['product_id'] for c in response.data['changes']], [self.products[2].id])
+
+    def test_event_rolls_back_with_favorite(self):
+        with mock.patch.object(changes, 'record_changes', side_effect=OperationalError('boom')):
+            with self.assertRaises(OperationalError):
+                FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[0])
+        self.assertFalse(FavoriteProduct.objects.exists())
+
+    def test_invalid_and_expired_cursor(self):
+        self.assertEqual(self.sync(since='nope').status_code, status.HTTP_400_BAD_REQUEST)
+
+        cursor = self.sync().data['cursor']
+        with override_settings(FAVORITE_CHANGES_RETENTION_DAYS=0):
+            self.assertEqual(self.sync(since=cursor).status_code, status.HTTP_410_GONE)
+        other_shard = changes.encode_cursor('shard9', 0, 9e12)
+        self.assertEqual(self.sync(since=other_shard).status_code, status.HTTP_410_GONE)
+
+    def test_compaction(self):
+        FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[0])
+        FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[1])
+        old = FavoriteChange.objects.order_by('id').first()
+        FavoriteChange.objects.filter(pk=old.pk).update(created_at=old.created_at - timedelta(days=31))
+        self.assertEqual(changes.compact_changes(), 1)
+        self.assertEqual(FavoriteChange.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, EVENTS={'QUEUE_SIZE': 2, 'HEARTBEAT': 1, 'BLOCK_MS': 50})
+class EventStreamTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def read_events(self, stream, count):
+        # Ignora "retry:" e os pings; devolve (id, event, data) dos próximos `count` eventos
+        received = []
+        while len(received) < count:
+            chunk = await asyncio.wait_for(anext(stream), 2)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('id:'):
+                fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+                received.append((fields['id'], fields['event'], json.loads(fields['data'])))
+        return received
+
+    async def subscribed(self, stream):
+        # Primeira leitura em background; o yield seguinte só acontece depois do subscribe
+        first = await anext(stream)
+        self.assertTrue((first.decode() if isinstance(first, bytes) else first).startswith('retry:'))
+        pending = asyncio.ensure_future(self.read_events(stream, 1))
+        await asyncio.sleep(0.05)
+        return pending
+
+    async def test_filters_by_customer_and_type(self):
+        stream = events.stream(types=['favorite'], customer_id=1)
+        pending = await self.subscribed(stream)
+        events.publish('catalog', {'action': 'import', 'imported': 1, 'skipped': 0})
+        events.publish('favorite', {'customer_id': 2, 'product_id': 5, 'action': 'add'})
+        events.publish('favorite', {'customer_id': 1, 'product_id': 7, 'action': 'remove'})
+        [(_, event_type, data)] = await pending
+        self.assertEqual((event_type, data['product_id'], data['action']), ('favorite', 7, 'remove'))
+        await stream.aclose()
+
+    async def test_resume_from_last_event_id(self):
+        ids = [events.publish('favorite', {'customer_id': 1, 'product_id': i, 'action': 'add'}) for i in range(3)]
+        stream = events.stream(last_event_id=ids[0])
+        await anext(stream)
+        received = await self.read_events(stream, 2)
+        self.assertEqual([event_id for event_id, _, _ in received], ids[1:])
+        await stream.aclose()
+
+    async def test_slow_subscriber_catches_up_from_replay(self):
+        stream = events.stream()
+        pending = await self.subscribed(stream)
+        ids = [events.publish('favorite', {'customer_id': 1, 'product_id': i, 'action': 'add'}) for i in range(6)]
+        await asyncio.sleep(0.1)
+        received = (await pending) + await self.read_events(stream, 5)
+        self.assertEqual([event_id for event_id, _, _ in received], ids)
+        await stream.aclose()
+
+    async def test_endpoint(self):
+        response = await self.async_client.get(reverse('event-stream'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(
+            reverse('event-stream'), {'types': 'nope'}, headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self.async_client.get(
+            reverse('event-stream'), {'types': 'catalog'}, headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        pending = await self.subscribed(aiter(response.streaming_content))
+        events.publish('catalog', {'action': 'import', 'imported': 3, 'skipped': 0})
+        [(_, event_type, data)] = await pending
+        self.assertEqual((event_type, data['imported']), ('catalog', 3))
+
+    def test_rejected_under_wsgi(self):
+        response = self.client.get(reverse('event-stream'), HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class OpenAPISchemaArtifactTests(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = f'{directory}/openapi.json'
+        self.settings_override = override_settings(OPENAPI_SCHEMA_PATH=self.path)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        schema.reset_artifact()
+        self.addCleanup(schema.reset_artifact)
+
+    def test_served_from_artifact_with_etag_and_gzip(self):
+        call_command('build_openapi_schema', stdout=mock.MagicMock())
+
+        with mock.patch.object(schema, 'generate_schema') as generate:
+            response = self.client.get(reverse('schema-json'))
+            generate.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/customers/', json.loads(response.content)['paths'])
+
+        etag = response['ETag']
+        response = self.client.get(reverse('schema-json'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse('schema-json'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('/customers/', json.loads(gzip.decompress(response.content))['paths'])
+        # Cada representação tem o seu ETag; o 304 só vale para a mesma codificação
+        gzip_etag = response['ETag']
+        self.assertNotEqual(gzip_etag, etag)
+        response = self.client.get(reverse('schema-json'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzip_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(reverse('schema-json'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_accept_encoding_quality(self):
+        self.assertTrue(schema.accepts_gzip('br, gzip;q=0.5'))
+        self.assertTrue(schema.accepts_gzip('*'))
+        self.assertFalse(schema.accepts_gzip('gzip;q=0'))
+        self.assertFalse(schema.accepts_gzip('gzip;q=0.0, *'))
+        self.assertFalse(schema.accepts_gzip('identity, *;q=0'))
+        self.assertFalse(schema.accepts_gzip(''))
+        response = self.client.get(reverse('schema-json'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_generated_once_without_artifact(self):
+        with mock.patch.object(schema, 'generate_schema', wraps=schema.generate_schema) as generate:
+            self.client.get(reverse('schema-json'))
+            self.client.get(reverse('schema-json'))
+        self.assertEqual(generate.call_count, 1)
+
+
+def docs_test_view(request):
+    return None
+
+
+class DocsShimTests(APITestCase):
+
+    def test_resolves_drf_yasg_objects_when_docs_installed(self):
+        from drf_yasg import openapi
+
+        decorated = docs.swagger_auto_schema(
+            operation_description="Teste",
+            manual_parameters=[docs.openapi.Parameter('q', docs.openapi.IN_QUERY, type=docs.openapi.TYPE_STRING)],
+        )(docs_test_view)
+        [parameter] = decorated._swagger_auto_schema['manual_parameters']
+        self.assertIsInstance(parameter, openapi.Parameter)
+        self.assertEqual((parameter.in_, parameter.type), (openapi.IN_QUERY, openapi.TYPE_STRING))
+
+    def test_noop_without_docs(self):
+        with mock.patch.object(docs, 'docs_enabled', return_value=False):
+            decorated = docs.swagger_auto_schema(manual_parameters=[docs.openapi.Parameter('q')])(docs_test_view)
+        self.assertIs(decorated, docs_test_view)
+
+
+class ViewHookMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return HttpResponse(status=418)
+
+
+class ScopedMiddlewareTests(APITestCase):
+
+    def register(self):
+        return self.client.post(reverse('register'), {"username": "usuario", "password": "senha123"}, format='json')
+
+    @override_settings(MIDDLEWARE_TIMING=True)
+    def test_api_skips_session_stack(self):
+        response = self.register()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+$')
+        self.assertNotIn('Set-Cookie', response)
+
+    @override_settings(MIDDLEWARE_TIMING=True)
+    def test_full_stack_outside_api(self):
+        response = self.client.get(reverse('schema-json'))
+        names = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(names, [
+            'SessionMiddleware', 'CsrfViewMiddleware', 'AuthenticationMiddleware', 'MessageMiddleware', 'app',
+        ])
+
+    def test_no_timing_header_by_default(self):
+        self.assertNotIn('Server-Timing', self.register())
+
+    @override_settings(MIDDLEWARE_SCOPES=[('/api/', ['Customer_api.tests.ViewHookMiddleware'])])
+    def test_forwards_process_view(self):
+        self.assertEqual(self.register().status_code, 418)
+
+    @override_settings(MIDDLEWARE_SCOPES=[('/api/', [])])
+    def test_check_requires_admin_middleware(self):
+        from .middleware import check_admin_scope
+
+        self.assertEqual({error.id for error in check_admin_scope()}, {'Customer_api.E001'})
+        self.assertEqual(len(check_admin_scope()), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ServerTests(APITestCase):
+
+    def setUp(self):
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+
+    def test_readiness_warms_up_worker(self):
+        self.assertFalse(warmup.is_ready())
+        response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(warmup.is_ready())
+
+    def test_not_ready_when_database_unavailable(self):
+        with mock.patch('django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection',
+                        side_effect=OperationalError('down')):
+            response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(warmup.is_ready())
+
+    def test_options_preload_and_recycle(self):
+        options = server.build_options({**server.get_config(), 'MAX_REQUESTS': 100, 'MAX_MEMORY_MB': 256})
+        self.assertTrue(options['preload_app'])
+        self.assertEqual(options['max_requests'], 100)
+        self.assertEqual(server.Application(options).cfg.max_requests, 100)
+
+    def test_worker_recycled_above_memory_limit(self):
+        options = server.build_options({**server.get_config(), 'MAX_MEMORY_MB': 256})
+        worker = mock.Mock(alive=True)
+        with mock.patch.object(server, 'rss_bytes', return_value=200 * 1024 * 1024):
+            options['post_request'](worker, None, {}, None)
+        self.assertTrue(worker.alive)
+        with mock.patch.object(server, 'rss_bytes', return_value=300 * 1024 * 1024):
+            options['post_request'](worker, None, {}, None)
+        self.assertFalse(worker.alive)
+
+    def test_ready_file_only_after_all_workers_warm_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ready_file = f'{directory}/ready'
+            options = server.build_options({**server.get_config(), 'READY_FILE': ready_file, 'WORKERS': 2})
+            with mock.patch.object(server, 'warm_up_process'), \
+                    mock.patch.object(server, 'stop_listeners') as stop_listeners:
+                options['on_starting'](mock.Mock())
+            stop_listeners.assert_called_once_with()
+            with mock.patch.object(server, 'warm_up_worker', return_value=False):
+                options['post_worker_init'](mock.Mock(pid=1))
+            self.assertFalse(os.path.exists(ready_file))
+            options['post_worker_init'](mock.Mock(pid=2))
+            self.assertFalse(os.path.exists(ready_file))
+            # Worker reciclado antes de aquecer: o substituto completa o pool
+            options['child_exit'](mock.Mock(), mock.Mock(pid=1))
+            options['post_worker_init'](mock.Mock(pid=3))
+            self.assertTrue(os.path.exists(ready_file))
+            options['on_exit'](mock.Mock())
+            self.assertFalse(os.path.exists(ready_file))
+
+    def test_asgi_workers(self):
+        options = server.build_options({**server.get_config(), 'ASGI': True})
+        application = server.Application(options, asgi=True)
+        self.assertIs(application.cfg.worker_class, server.AsgiWorker)
+        self.assertIsInstance(application.load(), ASGIHandler)
+        self.assertEqual(server.build_options(server.get_config())['worker_class'], 'sync')
+
+    def test_asgi_worker_recycled_above_memory_limit(self):
+        worker = server.AsgiWorker.__new__(server.AsgiWorker)
+        worker.pid, worker.log, worker.max_memory = 1234, mock.Mock(), 256 * 1024 * 1024
+        with mock.patch.object(server, 'rss_bytes', return_value=300 * 1024 * 1024), \
+                mock.patch.object(server.os, 'kill') as kill, \
+                mock.patch.object(server.UvicornWorker, 'callback_notify', mock.AsyncMock()):
+            asyncio.run(worker.callback_notify())
+            asyncio.run(worker.callback_notify())
+        kill.assert_called_once_with(1234, signal.SIGTERM)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GenerateDataTests(APITestCase):
+
+    def generate(self, **options):
+        out = io.StringIO()
+        options = {'workers': 1, **options}
+        call_command('generate_data', customers=200, products=50, favorites=2000, max_favorites=40,
+                     chunk_size=64, stdout=out, **options)
+        return out.getvalue()
+
+    def test_generates_consistent_data(self):
+        self.generate()
+        self.assertEqual(Customer.objects.count(), 200)
+        self.assertEqual(Product.objects.count(), 50)
+        total = FavoriteProduct.objects.count()
+        self.assertGreater(total, 1800)
+        self.assertLessEqual(total, 2100)
+        # Contadores e facetas recalculados a partir dos favoritos
+        self.assertEqual(sum(Product.objects.values_list('favorite_count', flat=True)), total)
+        self.assertEqual(sum(catalog.get_category_facets().values()), 50)
+        per_customer = Counter(FavoriteProduct.objects.values_list('customer_id', flat=True))
+        self.assertLessEqual(max(per_customer.values()), 40)
+        self.assertGreater(max(per_customer.values()), 3 * total / 200)  # cauda longa
+
+    def test_deterministic_for_any_worker_count(self):
+        checksums = []
+        for workers in (1, 2):
+            output = self.generate(seed=7, skip_derived=True, workers=workers)
+            checksums.append(re.search(r'checksum ([0-9a-f]{8})', output).group(1))
+            # Tabelas vazias: a próxima execução começa dos mesmos ids
+            FavoriteProduct.objects.all().delete()
+            Customer.all_objects.all().delete()
+            Product.objects.all().delete()
+        self.assertEqual(checksums[0], checksums[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdempotencyTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('Customer-list-create')
+        self.data = {'name': 'Fernando', 'email': 'fernando@example.com'}
+
+    def post(self, data, key='chave-1', url=None):
+        return self.client.post(url or self.url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def lock_key(self, key='chave-1'):
+        request = mock.Mock(user=self.user, method='POST', path=self.url)
+        return idempotency.cache_keys(request, key)
+
+    def test_retry_replays_response(self):
+        first = self.post(self.data)
+        second = self.post(self.data)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_key_reused_with_other_body(self):
+        self.post(self.data)
+        response = self.post({**self.data, 'email': 'outro@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_key_is_per_user(self):
+        self.post(self.data)
+        self.client.force_authenticate(user=User.objects.create_user(username='outro', password='testpass'))
+        response = self.post({**self.data, 'email': 'outro@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_without_key(self):
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.post(self.data, key='x' * 256).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_duplicate_waits_for_in_flight_request(self):
+        result_key, lock_key = self.lock_key()
+        cache.set(lock_key, 'outro-worker')
+
+        def finish(seconds):
+            # A primeira requisição termina enquanto a duplicada espera
+            cache.set(result_key, {'fingerprint': 'corpo', 'status': 201, 'data': {'id': 7}})
+
+        with mock.patch('Customer_api.idempotency.fingerprint', return_value='corpo'), \
+                mock.patch('Customer_api.idempotency.time.sleep', side_effect=finish):
+            response = self.post(self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'id': 7})
+        self.assertEqual(Customer.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY={'WAIT': 0})
+    def test_duplicate_gives_up_while_in_flight(self):
+        cache.set(self.lock_key()[1], 'outro-worker')
+        response = self.post(self.data)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Customer.objects.count(), 0)
+
+    @mock.patch('Customer_api.views.requests.get')
+    def test_import_runs_once(self, requests_get):
+        requests_get.return_value.json.return_value = [{
+            'id': 99, 'title': 'Jaqueta Jeans', 'price': 120.5, 'description': 'Jaqueta',
+            'category': "women's clothing", 'image': 'http://example.com/j.jpg',
+            'rating': {'rate': 4.1, 'count': 30},
+        }]
+        url = reverse('import-products')
+        first = self.post({}, url=url)
+        second = self.post({}, url=url)
+        self.assertEqual(requests_get.call_count, 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    @mock.patch('Customer_api.views.requests.get')
+    def test_server_errors_are_not_stored(self, requests_get):
+        import requests
+        requests_get.side_effect = requests.exceptions.ConnectionError('fora do ar')
+        url = reverse('import-products')
+        self.assertEqual(self.post({}, url=url).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.post({}, url=url).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(requests_get.call_count, 2)
+
+    def test_favorite_retry(self):
+        customer = Customer.objects.create(name='Fernando', email='fernando@example.com')
+        product = Product.objects.create(api_id=1, title='Anel', price=10, description='Anel',
+                                         category='jewelery', image_url='http://example.com/a.jpg')
+        url = reverse('favorite-list', args=[customer.id])
+        self.assertEqual(self.post({'product_id': product.id}, url=url).status_code, status.HTTP_201_CREATED)
+        response = self.post({'product_id': product.id}, url=url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FavoriteProduct.objects.for_customer(customer.id).count(), 1)
+
+
+class CustomerPurgeTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.customer = Customer.objects.create(name='Fernando', email='fernando@example.com')
+        self.products = [
+            Product.objects.create(api_id=i, title=f'Produto {i}', price=10, description='Produto',
+                                   category='jewelery', image_url='http://example.com/p.jpg')
+            for i in range(1, 6)
+        ]
+        FavoriteProduct.objects.bulk_create(
+            FavoriteProduct(customer=self.customer, product_id=product) for product in self.products
+        )
+
+    def test_delete_hides_customer(self):
+        url = reverse('Customer-detail', args=[self.customer.id])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('Customer-list-create')).data, [])
+        self.assertEqual(self.client.get(reverse('favorite-list', args=[self.customer.id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        detail = reverse('favorite-detail', args=[self.customer.id, self.products[0].id])
+        self.assertEqual(self.client.get(detail).status_code, status.HTTP_404_NOT_FOUND)
+        # Os favoritos só saem no purge
+        self.assertEqual(FavoriteProduct.objects.for_customer(self.customer.id).count(), 5)
+        self.assertIsNotNone(Customer.all_objects.get(pk=self.customer.id).deleted_at)
+
+    def test_email_available_after_delete(self):
+        self.client.delete(reverse('Customer-detail', args=[self.customer.id]))
+        response = self.client.post(reverse('Customer-list-create'),
+                                    {'name': 'Outro', 'email': 'fernando@example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @mock.patch('Customer_api.purge.time.sleep')
+    def test_purge_in_batches(self, sleep):
+        other = Customer.objects.create(name='Outro', email='outro@example.com')
+        FavoriteProduct.objects.create(customer=other, product_id=self.products[0])
+        purge.soft_delete(self.customer)
+
+        out = io.StringIO()
+        call_command('purge_deleted_customers', batch_size=2, pause=0, stdout=out)
+        self.assertIn('1 cliente(s) e 5 favorito(s)', out.getvalue())
+        self.assertFalse(Customer.all_objects.filter(pk=self.customer.id).exists())
+        self.assertFalse(FavoriteProduct.objects.for_customer(self.customer.id).exists())
+        self.assertFalse(FavoriteChange.objects.using(shard_for(self.customer.id))
+                         .filter(customer_id=self.customer.id).exists())
+        # Favoritos: 3 lotes (2 + 2 + 1); log de mudanças: 3 lotes
+        self.assertEqual(sleep.call_count, 6)
+        self.assertEqual([p.favorite_count for p in Product.objects.order_by('api_id')], [1, 0, 0, 0, 0])
+        self.assertEqual(FavoriteProduct.objects.for_customer(other.id).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LargeTableAdminTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='adminpass'))
+        self.products = [
+            Product.objects.create(api_id=i, title=title, price=10 * i, description='Produto',
+                                   category=category, image_url='http://example.com/p.jpg')
+            for i, (title, category) in enumerate([
+                ('Camiseta Algodão', "men's clothing"), ('Anel de prata', 'jewelery'), ('Colar dourado', 'jewelery'),
+            ], start=1)
+        ]
+        self.customers = [
+            Customer.objects.create(name=f'Cliente {i}', email=f'cliente{i}@example.com') for i in range(1, 6)
+        ]
+
+    def changelist(self, model, **params):
+        return self.client.get(reverse(f'admin:Customer_api_{model}_changelist'), params)
+
+    def favorite(self, customer, product):
+        return FavoriteProduct.objects.create(customer=customer, product_id=product)
+
+    def test_favorite_changelist_queries_do_not_grow_with_rows(self):
+        self.favorite(self.customers[0], self.products[0])
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.changelist('favoriteproduct').status_code, status.HTTP_200_OK)
+        for customer in self.customers[1:]:
+            for product in self.products:
+                self.favorite(customer, product)
+        with CaptureQueriesContext(connection) as many:
+            response = self.changelist('favoriteproduct')
+        self.assertEqual(len(response.context['cl'].result_list), 13)
+        self.assertEqual(len(many), len(few))
+        self.assertContains(response, 'Anel de prata')
+
+    def test_estimated_count(self):
+        Customer.all_objects.filter(pk=self.customers[2].pk).delete()
+        with mock.patch.object(api_admin.EstimatedCountPaginator, 'exact_limit', 2):
+            # MAX(rowid) - MIN(rowid) + 1: o buraco do id apagado entra na estimativa
+            self.assertEqual(api_admin.EstimatedCountPaginator(Customer.objects.order_by('pk'), 2).count, 5)
+            filtered = Customer.objects.filter(pk__gt=self.customers[0].pk).order_by('pk')
+            self.assertEqual(api_admin.EstimatedCountPaginator(filtered, 2).count, 3)
+        self.assertEqual(api_admin.EstimatedCountPaginator(Customer.objects.order_by('pk'), 2).count, 4)
+
+    def test_indexed_search(self):
+        response = self.changelist('customer', q='cliente3@example.com')
+        self.assertEqual(list(response.context['cl'].result_list), [self.customers[2]])
+        response = self.changelist('customer', q=str(self.customers[1].pk))
+        self.assertEqual(list(response.context['cl'].result_list), [self.customers[1]])
+        self.assertEqual(list(self.changelist('customer', q='cliente').context['cl'].result_list), [])
+
+        response = self.changelist('product', q='algodao')
+        self.assertEqual(list(response.context['cl'].result_list), [self.products[0]])
+        response = self.changelist('product', category='jewelery')
+        self.assertEqual(set(response.context['cl'].result_list), set(self.products[1:]))
+
+    def test_product_autocomplete(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'Customer_api', 'model_name': 'favoriteproduct', 'field_name': 'product_id', 'term': 'anel',
+        })
+        self.assertEqual([item['text'] for item in response.json()['results']], ['Anel de prata'])
+
+    def test_soft_delete_action(self):
+        self.favorite(self.customers[0], self.products[0])
+        response = self.client.post(reverse('admin:Customer_api_customer_changelist'), {
+            'action': 'soft_delete_selected', '_selected_action': [self.customers[0].pk, self.customers[1].pk],
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(FavoriteProduct.objects.for_customer(self.customers[0].pk).count(), 1)
+
+    def test_delete_favorites_action(self):
+        favorites = [self.favorite(self.customers[0], product) for product in self.products]
+        self.favorite(self.customers[1], self.products[0])
+        shard = shard_for(self.customers[0].pk)
+        self.client.post(reverse('admin:Customer_api_favoriteproduct_changelist') + f'?shard={shard}', {
+            'action': 'delete_selected_favorites', '_selected_action': [favorite.pk for favorite in favorites[:2]],
+        })
+        self.assertEqual(FavoriteProduct.objects.for_customer(self.customers[0].pk).count(), 1)
+        self.assertEqual([p.favorite_count for p in Product.objects.order_by('api_id')], [1, 0, 1])
+        removed = FavoriteChange.objects.using(shard_for(self.customers[0].pk)).filter(
+            customer_id=self.customers[0].pk, action=FavoriteChange.REMOVE
+        )
+        self.assertEqual(removed.count(), 2)
+
+    def test_recount_favorites_action(self):
+        self.favorite(self.customers[0], self.products[0])
+        Product.objects.update(favorite_count=7)
+        self.client.post(reverse('admin:Customer_api_product_changelist'), {
+            'action': 'recount_favorites', '_selected_action': [product.pk for product in self.products[:2]],
+        })
+        self.assertEqual([p.favorite_count for p in Product.objects.order_by('api_id')], [1, 0, 7])
+
+    def test_favorite_str_without_queries(self):
+        pk = self.favorite(self.customers[0], self.products[0]).pk
+        favorite = FavoriteProduct.objects.for_customer(self.customers[0].pk).get(pk=pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(favorite), f'Favorito: produto {self.products[0].pk} do cliente {self.customers[0].pk}')
+
+
+class CustomerBatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('Customer-batch')
+        self.customers = [
+            Customer.objects.create(name=f'Cliente {i}', email=f'cliente{i}@example.com') for i in range(1, 11)
+        ]
+        self.products = [
+            Product.objects.create(api_id=i, title=f'Produto {i}', price=10, description='Produto',
+                                   category='jewelery', image_url='http://example.com/p.jpg')
+            for i in range(1, 4)
+        ]
+        for customer in self.customers:
+            for product in self.products[:customer.pk % 4]:
+                FavoriteProduct.objects.create(customer=customer, product_id=product)
+
+    def test_customers_keyed_by_id_with_missing(self):
+        ids = [self.customers[0].pk, 999, self.customers[3].pk]
+        response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(list(data['results']), [str(self.customers[0].pk), str(self.customers[3].pk)])
+        self.assertEqual(data['results'][str(self.customers[3].pk)]['email'], 'cliente4@example.com')
+        self.assertNotIn('favorites', data['results'][str(self.customers[0].pk)])
+        self.assertEqual(data['missing'], [999])
+
+    def test_favorites_with_fixed_queries(self):
+        ids = ','.join(str(customer.pk) for customer in self.customers)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'ids': ids, 'favorites': 'true'})
+        for customer in self.customers:
+            favorites = response.data['results'][customer.pk]['favorites']
+            self.assertEqual(sorted(f['product_id'] for f in favorites),
+                             [product.pk for product in self.products[:customer.pk % 4]])
+        # Clientes + favoritos (um shard), independente da quantidade de ids
+        self.assertEqual(len(queries), 2)
+
+    def test_deleted_customer_is_missing(self):
+        purge.soft_delete(self.customers[0])
+        response = self.client.get(self.url, {'ids': self.customers[0].pk, 'favorites': '1'})
+        self.assertEqual(response.data['results'], {})
+        self.assertEqual(response.data['missing'], [self.customers[0].pk])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,a'}).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ','.join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get(self.url, {'ids': too_many}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CustomerProfileDocumentTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.customer = Customer.objects.create(name='Fernando', email='fernando@example.com')
+        self.products = [
+            Product.objects.create(api_id=i, title=f'Produto {i}', price=10 * i, description='Produto',
+                                   category='jewelery', image_url='http://example.com/p.jpg')
+            for i in range(1, 4)
+        ]
+        for product in self.products[:2]:
+            FavoriteProduct.objects.create(customer=self.customer, product_id=product)
+        self.url = reverse('Customer-profile', args=[self.customer.pk])
+
+    def get_profile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)
+
+    def test_document_served_from_cache(self):
+        document = self.get_profile()
+        self.assertEqual(document['customer']['email'], 'fernando@example.com')
+        self.assertEqual([f['product']['title'] for f in document['favorites']], ['Produto 2', 'Produto 1'])
+        self.assertNotIn('favorite_count', document['favorites'][0]['product'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile(), document)
+
+    def test_favorite_changes_invalidate_document(self):
+        self.get_profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('favorite-list', args=[self.customer.pk]),
+                             {'product_id': self.products[2].pk}, format='json')
+        self.assertIsNone(cache.get(documents.cache_key(self.customer.pk)))
+        document = self.get_profile()
+        self.assertEqual(len(document['favorites']), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_profile(), document)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('favorite-detail', args=[self.customer.pk, self.products[0].pk]))
+        self.assertEqual({f['product_id'] for f in self.get_profile()['favorites']},
+                         {self.products[1].pk, self.products[2].pk})
+
+    def test_stale_build_finishing_after_commit_is_discarded(self):
+        build = documents.build
+
+        def build_then_concurrent_write(customer_id):
+            # A leitura montou o documento; um favorito é commitado antes de ela gravar no cache
+            document = build(customer_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[2])
+            return document
+
+        with mock.patch.object(documents, 'build', side_effect=build_then_concurrent_write):
+            self.assertEqual(len(documents.get_document(self.customer.pk)['favorites']), 2)
+        self.assertEqual(len(documents.get_document(self.customer.pk)['favorites']), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.get_profile()['favorites']), 3)
+
+    def test_out_of_order_invalidations(self):
+        self.get_profile()
+        with self.captureOnCommitCallbacks() as callbacks:
+            FavoriteProduct.objects.create(customer=self.customer, product_id=self.products[2])
+            FavoriteProduct.objects.filter(customer=self.customer, product_id=self.products[0]).delete()
+        for callback in reversed(callbacks):
+            callback()
+        self.assertEqual({f['product_id'] for f in self.get_profile()['favorites']},
+                         {self.products[1].pk, self.products[2].pk})
+
+    def test_evicted_version_discards_document(self):
+        self.get_profile()
+        Customer.objects.filter(pk=self.customer.pk).update(name='Fernanda')
+        cache.delete(documents.version_key(self.customer.pk))
+        self.assertEqual(self.get_profile()['customer']['name'], 'Fernanda')
+
+    def test_customer_update_invalidates_document(self):
+        self.get_profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('Customer-detail', args=[self.customer.pk]), {'name': 'Fernanda'}, format='json')
+        self.assertEqual(self.get_profile()['customer']['name'], 'Fernanda')
+        with self.assertNumQueries(0):
+            self.get_profile()
+
+    def test_product_change_invalidates_referencing_documents(self):
+        other = Customer.objects.create(name='Outro', email='outro@example.com')
+        FavoriteProduct.objects.create(customer=other, product_id=self.products[2])
+        self.get_profile()
+        documents.get_document(other.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.products[0]
+            product.price = 99
+            product.save()
+        self.assertIsNone(cache.get(documents.cache_key(self.customer.pk)))
+        self.assertIsNotNone(cache.get(documents.cache_key(other.pk)))
+        prices = {f['product_id']: f['product']['price'] for f in self.get_profile()['favorites']}
+        self.assertEqual(prices[product.pk], '99.00')
+
+    @mock.patch('Customer_api.views.requests.get')
+    def test_import_keeps_documents(self, requests_get):
+        # Produtos importados são novos: nenhum documento os embute
+        self.get_profile()
+        requests_get.return_value.json.return_value = [{
+            'id': 99, 'title': 'Jaqueta', 'price': 120.5, 'description': 'Jaqueta',
+            'category': "women's clothing", 'image': 'http://example.com/j.jpg',
+            'rating': {'rate': 4.1, 'count': 30},
+        }]
+        with mock.patch.object(documents, 'invalidate_products') as invalidate_products, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('import-products'), format='json')
+        invalidate_products.assert_not_called()
+        with self.assertNumQueries(0):
+            self.get_profile()
+
+    def test_deleted_customer(self):
+        self.get_profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('Customer-detail', args=[self.customer.pk]))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('Customer-profile', args=[999])).status_code,
+                         status.HTTP_404_NOT_FOUND)
@@ -3,9 +3,20 @@ from .views import (
     RegisterView,
     CustomerListCreateView,
     CustomerDetailView,
+    CustomerBatchView,
+    CustomerProfileView,
     ImportProductsView,
     FavoriteProductListView,
     FavoriteProductDetailView,
+    FavoriteChangeListView,
+    ProfileListView,
+    ProfileDetailView,
+    ProductSearchView,
+    ProductListView,
+    PopularProductListView,
+    RelatedProductListView,
+    EventStreamView,
+    ReadinessView,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -18,11 +29,30 @@ urlpatterns = [
     # Customers
     path('customers/', CustomerListCreateView.as_view(), name='Customer-list-create'),
     path('customers/<int:id>/', CustomerDetailView.as_view(), name='Customer-detail'),
+    path('customers/batch/', CustomerBatchView.as_view(), name='Customer-batch'),
+    path('customers/<int:id>/profile/', CustomerProfileView.as_view(), name='Customer-profile'),
 
     #Importar produtos
     path('import-products/', ImportProductsView.as_view(), name='import-products'),
+
+    # Produtos
+    path('products/', ProductListView.as_view(), name='product-list'),
+    path('products/search/', ProductSearchView.as_view(), name='product-search'),
+    path('products/popular/', PopularProductListView.as_view(), name='product-popular'),
+    path('products/<int:id>/related/', RelatedProductListView.as_view(), name='product-related'),
     
     # Produtos Favoritos
     path('customers/<int:Customer_id>/favorites/', FavoriteProductListView.as_view(), name='favorite-list'),
+    path('customers/<int:Customer_id>/favorites/changes/', FavoriteChangeListView.as_view(), name='favorite-changes'),
     path('customers/<int:customer_id>/favorites/<int:product_id>/', FavoriteProductDetailView.as_view(), name='favorite-detail'),
+
+    # Eventos (SSE, servido pelo ASGI)
+    path('events/', EventStreamView.as_view(), name='event-stream'),
+
+    # Prontidão (readiness probe)
+    path('health/ready/', ReadinessView.as_view(), name='health-ready'),
+
+    # Profiling (somente staff)
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:name>/', ProfileDetailView.as_view(), name='profile-detail'),
 ]
\ No newline at end of file
@@ -3,17 +3,40 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Customer, FavoriteProduct, Product
 from .serializers import CustomerSerializer, ProductSerializer, FavoriteProductSerializer, UserSerializer, TokenSerializer
+from . import catalog, changes, documents, events, purge, recommendations, search, warmup
+from .idempotency import idempotent
+from .profiling import get_store
+from .sqlite import retry_on_lock
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
+from django.core.handlers.wsgi import WSGIRequest
 from django.shortcuts import get_object_or_404
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
+from django.db import router, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import NotFound
+from .docs import openapi, swagger_auto_schema
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+from collections import Counter
+from decimal import Decimal, InvalidOperation
 import requests
 import logging
 
 User = get_user_model()
+IDEMPOTENCY_KEY = openapi.Parameter(
+    'Idempotency-Key',
+    openapi.IN_HEADER,
+    description="Chave única por operação: repetições com a mesma chave devolvem a resposta original",
+    type=openapi.TYPE_STRING,
+    required=False,
+)
+
 logger = logging.getLogger(__name__)
 
 class PublicEndpoint(permissions.BasePermission):
@@ -110,12 +133,16 @@ class CustomerListCreateView(generics.ListCreateAPIView):
     @swagger_auto_schema(
         operation_description="Cria um novo cliente",
         request_body=CustomerSerializer,
+        manual_parameters=[IDEMPOTENCY_KEY],
         responses={
             201: CustomerSerializer(),
-            400: "Dados inválidos ou email já cadastrado"
+            400: "Dados inválidos ou email já cadastrado",
+            409: "Requisição com a mesma Idempotency-Key em andamento",
+            422: "Idempotency-Key já usada com outro conteúdo"
         },
         security=[{'Bearer': []}]
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
@@ -174,12 +201,14 @@ class CustomerDetailView(generics.RetrieveUpdateDestroyAPIView):
                 }
 
         DELETE - DELETA informações do Customer (Cliente)
+            O cliente deixa de aparecer na hora; os favoritos são apagados em lotes
+            pelo comando purge_deleted_customers.
             Header:{
                     "Content-Type": "application/json",
                     "Authorization": "Bearer {{Token}}"
                 }
             Response code: {
-                    204	: Cliente removido com sucesso
+                    202	: Cliente removido, favoritos aguardando o purge
                     404	:Cliente não encontrado
             }
     """
@@ -226,9 +255,9 @@ class CustomerDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().patch(request, *args, **kwargs)
 
     @swagger_auto_schema(
-        operation_description="Remove um cliente do sistema",
+        operation_description="Remove um cliente do sistema (os favoritos são apagados em segundo plano)",
         responses={
-            204: "Cliente removido com sucesso",
+            202: "Cliente removido, favoritos aguardando o purge",
             404: "Cliente não encontrado"
         },
         security=[{'Bearer': []}]
@@ -236,6 +265,132 @@ class CustomerDetailView(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+    def destroy(self, request, *args, **kwargs):
+        # Sem cascade no request: um cliente com muitos favoritos travaria o shard inteiro
+        purge.soft_delete(self.get_object())
+        return Response({'message': 'Cliente removido'}, status=status.HTTP_202_ACCEPTED)
+
+class CustomerBatchView(APIView):
+    """ Leitura de vários clientes em uma chamada (serviços internos)
+    /api/customers/batch/?ids=1,2,3&favorites=true
+
+        GET - Retorna até 100 clientes por id e, com favorites=true, os favoritos de cada um
+            Consultas fixas: uma para os clientes e uma por shard para os favoritos.
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response:{
+                    "results": {
+                        "1": {
+                            "id": INTEGER,
+                            "name": STRING,
+                            "email": STRING,
+                            "date_register": DATE STRING,
+                            "favorites": [FAVORITE]
+                        }
+                    },
+                    "missing": [INTEGER]
+                }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_ids = 100
+
+    @swagger_auto_schema(
+        operation_description="Recupera vários clientes (e opcionalmente seus favoritos) de uma vez",
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, description="Ids separados por vírgula (máx. 100)",
+                              type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('favorites', openapi.IN_QUERY, description="Inclui os favoritos de cada cliente",
+                              type=openapi.TYPE_BOOLEAN),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Clientes por id e ids não encontrados",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'results': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'missing': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                    }
+                )
+            ),
+            400: "Parâmetros inválidos"
+        },
+        security=[{'Bearer': []}]
+    )
+    def get(self, request):
+        try:
+            ids = list(dict.fromkeys(
+                int(value) for param in request.query_params.getlist('ids') for value in param.split(',') if value.strip()
+            ))
+        except ValueError:
+            return Response({'ids': 'Informe ids inteiros separados por vírgula.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'ids': 'Este parâmetro é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_ids:
+            return Response({'ids': f'Máximo de {self.max_ids} ids por chamada.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        customers = Customer.objects.in_bulk(ids)
+        # Serializers com many=True: montar os campos de um serializer por objeto custa mais que as consultas
+        found = [customers[customer_id] for customer_id in ids if customer_id in customers]
+        results = {customer['id']: customer for customer in CustomerSerializer(found, many=True).data}
+        if request.query_params.get('favorites', '').lower() in ('1', 'true'):
+            for customer in results.values():
+                customer['favorites'] = []
+            for favorite in FavoriteProductSerializer(FavoriteProduct.objects.for_customers(list(results)), many=True).data:
+                results[favorite['customer']]['favorites'].append(favorite)
+
+        return Response({
+            'results': results,
+            'missing': [customer_id for customer_id in ids if customer_id not in customers],
+        }, status=status.HTTP_200_OK)
+
+class CustomerProfileView(APIView):
+    """ Perfil completo do cliente em um documento (página "minha conta")
+    /api/customers/<int:id>/profile/
+
+        GET - Cliente, favoritos e os dados de cada produto favoritado
+            O documento é materializado no cache e mantido a cada mudança do cliente,
+            dos favoritos ou dos produtos: com o cache quente é uma única leitura.
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response:{
+                    "customer": CUSTOMER,
+                    "favorites": [{
+                        "product_id": INTEGER,
+                        "date_addition": DATE STRING,
+                        "product": PRODUCT
+                    }]
+                }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Documento com o cliente, os favoritos e os produtos favoritados",
+        responses={
+            200: openapi.Response(
+                description="Perfil do cliente",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'customer': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'favorites': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    }
+                )
+            ),
+            404: "Cliente não encontrado"
+        },
+        security=[{'Bearer': []}]
+    )
+    def get(self, request, id):
+        document = documents.get_document(id)
+        if document is None:
+            raise NotFound("Cliente não encontrado.")
+        return Response(document, status=status.HTTP_200_OK)
+
 class ImportProductsView(APIView):
     """ Importa produtos da API extrena
     /api/import-products/
@@ -266,36 +421,21 @@ class ImportProductsView(APIView):
                     }
                 )
             ),
+            409: "Requisição com a mesma Idempotency-Key em andamento",
+            422: "Idempotency-Key já usada com outro conteúdo",
             503: "Serviço de importação indisponível"
         },
+        manual_parameters=[IDEMPOTENCY_KEY],
         security=[{'Bearer': []}]
     )
+    @idempotent
     def post(self, request, format=None):
         try:
             response = requests.get('https://fakestoreapi.com/products')
             response.raise_for_status() 
             
             products_data = response.json()
-            imported_products = []
-            skipped_products = []
-            
-            for product_data in products_data:
-                if Product.objects.filter(api_id=product_data['id']).exists():
-                    skipped_products.append(product_data['id'])
-                    continue
-                
-                product = Product(
-                    api_id=product_data['id'],
-                    title=product_data['title'],
-                    price=product_data['price'],
-                    description=product_data['description'],
-                    category=product_data['category'],
-                    image_url=product_data['image'],
-                    rating_rate=product_data['rating']['rate'],
-                    rating_count=product_data['rating']['count']
-                )
-                product.save()
-                imported_products.append(product_data['id'])
+            imported_products, skipped_products = self.save_products(products_data)
             
             return Response({
                 'message': 'Importação concluída',
@@ -315,6 +455,49 @@ class ImportProductsView(APIView):
                 'error': f'Erro inesperado: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    @retry_on_lock
+    def save_products(products_data):
+        # Uma única transação: em caso de "database is locked" o lote inteiro é repetido
+        imported_products = []
+        skipped_products = []
+        new_products = []
+
+        with transaction.atomic():
+            existing = set(
+                Product.objects.filter(api_id__in=[product_data['id'] for product_data in products_data])
+                .values_list('api_id', flat=True)
+            )
+            for product_data in products_data:
+                if product_data['id'] in existing:
+                    skipped_products.append(product_data['id'])
+                    continue
+
+                new_products.append(Product(
+                    api_id=product_data['id'],
+                    title=product_data['title'],
+                    price=product_data['price'],
+                    description=product_data['description'],
+                    category=product_data['category'],
+                    image_url=product_data['image'],
+                    rating_rate=product_data['rating']['rate'],
+                    rating_count=product_data['rating']['count']
+                ))
+                existing.add(product_data['id'])
+                imported_products.append(product_data['id'])
+
+            # bulk_create não dispara post_save: índice de busca e contagens por categoria são atualizados aqui
+            Product.objects.bulk_create(new_products)
+            search.index_products(new_products, using=router.db_for_write(Product))
+            catalog.update_category_counts(Counter(product.category for product in new_products))
+            events.publish_on_commit('catalog', {
+                'action': 'import',
+                'imported': len(imported_products),
+                'skipped': len(skipped_products),
+            }, using=router.db_for_write(Product))
+
+        return imported_products, skipped_products
+
 class FavoriteProductListView(generics.ListCreateAPIView):
     """ Crud para adicionar e listas produtos favoritos em Customers (Cliente)
     /api/customers/<int:Customer_id>/favorites/
@@ -370,7 +553,7 @@ class FavoriteProductListView(generics.ListCreateAPIView):
     def get_queryset(self):
         customer_id = self.kwargs.get('Customer_id')
         customer = get_object_or_404(Customer, id=customer_id)
-        return customer.favoritos.all()
+        return FavoriteProduct.objects.for_customer(customer.id)
     
     @swagger_auto_schema(
         operation_description="Adiciona um novo produto favorito para um cliente",
@@ -384,10 +567,17 @@ class FavoriteProductListView(generics.ListCreateAPIView):
         responses={
             201: FavoriteProductSerializer(),
             400: "Dados inválidos ou produto já existe na lista",
-            404: "Cliente não encontrado"
-        }
+            404: "Cliente não encontrado",
+            409: "Requisição com a mesma Idempotency-Key em andamento",
+            422: "Idempotency-Key já usada com outro conteúdo"
+        },
+        manual_parameters=[IDEMPOTENCY_KEY],
     )
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
 
+    @retry_on_lock
     def perform_create(self, serializer):
         customer_id = self.kwargs.get('Customer_id')
         customer = get_object_or_404(Customer, id=customer_id)
@@ -399,7 +589,7 @@ class FavoriteProductListView(generics.ListCreateAPIView):
 
         product = get_object_or_404(Product, id=product_id)
 
-        if customer.favoritos.filter(product_id=product_id).exists():
+        if FavoriteProduct.objects.for_customer(customer.id).filter(product_id=product_id).exists():
             raise serializers.ValidationError({'product_id': 'Este produto já está na sua lista de favoritos.'})
         serializer.save(customer=customer, product_id=product)
 
@@ -473,7 +663,11 @@ class FavoriteProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         customer_id = self.kwargs.get('customer_id')
         product_id = self.kwargs.get('product_id')
 
-        favorite_product = FavoriteProduct.objects.filter(customer_id=customer_id, product_id=product_id).first()
+        # Favoritos de um cliente removido continuam no shard até o purge
+        if not Customer.objects.filter(id=customer_id).exists():
+            raise NotFound("Cliente não encontrado.")
+
+        favorite_product = FavoriteProduct.objects.for_customer(customer_id).filter(product_id=product_id).first()
         
         if not favorite_product:
             raise NotFound("Produto favorito não encontrado para este cliente.")
@@ -575,3 +769,403 @@ class FavoriteProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     )
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
+
+class FavoriteChangeListView(APIView):
+    """ Sincronização incremental dos favoritos de um cliente
+    /api/customers/<int:Customer_id>/favorites/changes/?since=<cursor>&limit=<int>
+
+        GET - Sem "since" retorna o snapshot atual (reset=true) e um cursor; com "since"
+            retorna só os eventos depois do cursor, incluindo remoções (tombstones).
+            Enquanto has_more for true, chame de novo com o cursor retornado.
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response:{
+                    "reset": BOOLEAN,
+                    "changes": [{"id": INTEGER, "product_id": INTEGER, "action": "add" | "remove", "created_at": DATE STRING}],
+                    "cursor": STRING,
+                    "has_more": BOOLEAN
+                }
+            Response code: {
+                    410 : Cursor expirado (compactado ou cliente mudou de shard), refazer sem "since"
+            }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Lista as mudanças nos favoritos de um cliente desde um cursor",
+        manual_parameters=[
+            openapi.Parameter('Customer_id', openapi.IN_PATH, description="ID do cliente", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('since', openapi.IN_QUERY, description="Cursor retornado pela chamada anterior", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Eventos por página (padrão 100, máx. 1000)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: "Mudanças e próximo cursor",
+            400: "Parâmetros inválidos",
+            404: "Cliente não encontrado",
+            410: "Cursor expirado, refazer o snapshot"
+        },
+        security=[{'Bearer': []}]
+    )
+    def get(self, request, Customer_id):
+        customer = get_object_or_404(Customer, id=Customer_id)
+        try:
+            limit = int(request.query_params.get('limit', changes.CHANGES_PAGE_SIZE))
+        except ValueError:
+            return Response({'limit': 'Informe um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, changes.CHANGES_MAX_PAGE_SIZE))
+
+        try:
+            data = changes.get_changes(customer.id, request.query_params.get('since'), limit)
+        except ValueError as exc:
+            return Response({'since': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except changes.CursorExpired:
+            return Response(
+                {'detail': 'Cursor expirado. Refaça a sincronização sem "since".'},
+                status=status.HTTP_410_GONE
+            )
+        return Response(data, status=status.HTTP_200_OK)
+
+class ReadinessView(APIView):
+    """ Prontidão do worker para receber tráfego (readiness probe)
+    /api/health/ready/
+
+        GET - 200 depois do aquecimento (conexões com os bancos e o cache abertas).
+            No `manage.py serve` os workers já aquecem antes de aceitar conexões; em
+            outros servidores a primeira chamada faz o aquecimento.
+            Response:
+                200 {"status": "ready"}
+                503 {"status": "warming"} (algum banco indisponível)
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="Prontidão do worker para receber tráfego",
+        responses={200: "Pronto", 503: "Aquecendo ou banco indisponível"}
+    )
+    def get(self, request):
+        if not warmup.is_ready():
+            warmup.warm_up_worker()
+        if warmup.is_ready():
+            return Response({'status': 'ready'}, status=status.HTTP_200_OK)
+        return Response({'status': 'warming'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+class ProfileListView(APIView):
+    """ Lista os perfis de requests gravados pelo ProfilingMiddleware (somente staff)
+    /api/profiles/
+
+        GET - Lista os perfis mais recentes primeiro
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response: [{
+                    "name": STRING,
+                    "method": STRING,
+                    "path": STRING,
+                    "status": INTEGER,
+                    "duration_ms": FLOAT,
+                    "created": FLOAT
+                }]
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Lista os perfis de requests gravados",
+        responses={200: "Lista de perfis", 403: "Acesso restrito a staff"},
+        security=[{'Bearer': []}]
+    )
+    def get(self, request):
+        return Response(get_store().list(), status=status.HTTP_200_OK)
+
+class ProfileDetailView(APIView):
+    """ Download de um perfil gravado (somente staff)
+    /api/profiles/<str:name>/
+
+        GET - Retorna o perfil completo (top funções + pilhas collapsed)
+            ?output=collapsed retorna apenas as pilhas em texto, no formato do flamegraph.pl/speedscope
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Faz o download de um perfil gravado",
+        manual_parameters=[
+            openapi.Parameter(
+                'output',
+                openapi.IN_QUERY,
+                description="'collapsed' para baixar apenas as pilhas em texto",
+                type=openapi.TYPE_STRING
+            ),
+        ],
+        responses={200: "Perfil", 403: "Acesso restrito a staff", 404: "Perfil não encontrado"},
+        security=[{'Bearer': []}]
+    )
+    def get(self, request, name):
+        profile = get_store().get(name)
+        if profile is None:
+            raise NotFound("Perfil não encontrado.")
+
+        if request.query_params.get('output') == 'collapsed':
+            response = HttpResponse(profile['collapsed'], content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{name}.collapsed"'
+            return response
+        return Response(profile, status=status.HTTP_200_OK)
+
+class ProductSearchView(APIView):
+    """ Busca textual de produtos
+    /api/products/search/?q=<texto>&limit=<int>&cursor=<string>
+
+        GET - Busca produtos por título, descrição e categoria, ordenados por relevância
+            Cada termo é buscado por prefixo ("cam" encontra "camiseta").
+            Para a próxima página envie o next_cursor da resposta anterior.
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response:{
+                    "results": [PRODUCT],
+                    "next_cursor": STRING | null
+                }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 100
+
+    @swagger_auto_schema(
+        operation_description="Busca produtos por título, descrição e categoria",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Texto da busca", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Itens por página (máx. 100)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor da próxima página", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Produtos encontrados",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'next_cursor': openapi.Schema(type=openapi.TYPE_STRING),
+                    }
+                )
+            ),
+            400: "Parâmetros inválidos"
+        },
+        security=[{'Bearer': []}]
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': 'Este parâmetro é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+            products, next_cursor = search.search_products(
+                query, limit=max(limit, 1), cursor=request.query_params.get('cursor')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': ProductSerializer(products, many=True).data,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+class ProductCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = 'id'
+
+class ProductOrderingFilter(OrderingFilter):
+    """Acrescenta o id como desempate, para a paginação por cursor ser estável"""
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering.append('id')
+        return ordering
+
+class ProductListView(generics.ListAPIView):
+    """ Listagem de produtos com filtros, ordenação e contagem por categoria
+    /api/products/?category=<str>&min_price=<decimal>&max_price=<decimal>&min_rating=<decimal>&ordering=<campo>&limit=<int>&cursor=<str>
+
+        GET - Lista produtos paginados por cursor
+            ordering aceita: price, -price, rating_rate, -rating_rate, title, -title, id, -id
+            facets traz a quantidade de produtos por categoria em todo o catálogo
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response:{
+                    "next": URL | null,
+                    "previous": URL | null,
+                    "results": [PRODUCT],
+                    "facets": {"category": INTEGER}
+                }
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProductCursorPagination
+    filter_backends = [ProductOrderingFilter]
+    ordering_fields = ['price', 'rating_rate', 'title', 'id']
+    ordering = ['id']
+
+    decimal_filters = {
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+        'min_rating': 'rating_rate__gte',
+    }
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = Product.objects.all()
+
+        if params.get('category'):
+            queryset = queryset.filter(category=params['category'])
+
+        for param, lookup in self.decimal_filters.items():
+            value = params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: Decimal(value)})
+            except InvalidOperation:
+                raise serializers.ValidationError({param: 'Informe um número válido.'})
+        return queryset
+
+    @swagger_auto_schema(
+        operation_description="Lista produtos com filtros, ordenação e contagem por categoria",
+        manual_parameters=[
+            openapi.Parameter('category', openapi.IN_QUERY, description="Categoria exata", type=openapi.TYPE_STRING),
+            openapi.Parameter('min_price', openapi.IN_QUERY, description="Preço mínimo", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('max_price', openapi.IN_QUERY, description="Preço máximo", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('min_rating', openapi.IN_QUERY, description="Avaliação mínima", type=openapi.TYPE_NUMBER),
+        ],
+        security=[{'Bearer': []}]
+    )
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        response.data['facets'] = catalog.get_category_facets()
+        return response
+
+class PopularProductListView(APIView):
+    """ Produtos mais favoritados
+    /api/products/popular/?limit=<int>
+
+        GET - Retorna os N produtos com mais favoritos (máx. 100), do mais favoritado para o menos
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response: [PRODUCT]
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Lista os produtos mais favoritados",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Quantidade (padrão 10, máx. 100)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ProductSerializer(many=True), 400: "Parâmetros inválidos"},
+        security=[{'Bearer': []}]
+    )
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'limit': 'Informe um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, catalog.POPULAR_MAX))
+        return Response(catalog.get_popular_products(limit), status=status.HTTP_200_OK)
+
+class RelatedProductListView(APIView):
+    """ Quem favoritou este produto também favoritou
+    /api/products/<int:id>/related/?limit=<int>
+
+        GET - Produtos relacionados pré-calculados pelo comando compute_related_products
+            score é a quantidade de clientes que favoritaram os dois produtos
+            Header:{
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {{Token}}"
+                }
+            Response: [PRODUCT + {"score": INTEGER}]
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Lista produtos favoritados pelos mesmos clientes",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Quantidade (padrão 10)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: "Produtos relacionados", 404: "Produto não encontrado"},
+        security=[{'Bearer': []}]
+    )
+    def get(self, request, id):
+        try:
+            limit = max(1, int(request.query_params.get('limit', 10)))
+        except ValueError:
+            return Response({'limit': 'Informe um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        related = recommendations.get_related_products(id, limit)
+        if not related and not Product.objects.filter(id=id).exists():
+            raise NotFound("Produto não encontrado.")
+        return Response(related, status=status.HTTP_200_OK)
+
+class EventStreamView(View):
+    """ Stream (Server-Sent Events) de mudanças em favoritos e no catálogo
+    /api/events/?types=favorite,catalog&customer=<int>
+
+        GET - Mantém a conexão aberta e envia os eventos à medida que acontecem.
+            Só no ASGI (manage.py serve --asgi ou uvicorn Settings.asgi:application); no
+            WSGI responde 503. Conexões ociosas recebem um comentário ": ping" periódico.
+            Header:{
+                    "Accept": "text/event-stream",
+                    "Authorization": "Bearer {{Token}}",
+                    "Last-Event-ID": STRING (opcional, retoma a partir desse evento)
+                }
+            Response:
+                id: 1714000000000-0
+                event: favorite
+                data: {"customer_id": 1, "product_id": 2, "action": "add" | "remove"}
+
+                event: catalog
+                data: {"action": "import", "imported": INTEGER, "skipped": INTEGER}
+
+                event: reset   (eventos perdidos além do replay; ressincronizar via REST)
+    """
+    async def get(self, request):
+        # No WSGI o stream ficaria em buffer e prenderia um worker sync por conexão
+        if isinstance(request, WSGIRequest):
+            return JsonResponse({'detail': 'O stream de eventos só é servido pelo ASGI (manage.py serve --asgi).'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if authenticated is None:
+            return JsonResponse({'detail': 'As credenciais de autenticação não foram fornecidas.'},
+                                status=status.HTTP_401_UNAUTHORIZED)
+
+        types = [t for t in request.GET.get('types', '').split(',') if t]
+        if any(t not in events.EVENT_TYPES for t in types):
+            return JsonResponse({'types': f"Tipos válidos: {', '.join(events.EVENT_TYPES)}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            customer_id = int(request.GET['customer']) if request.GET.get('customer') else None
+            last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+            if last_event_id:
+                events.parse_id(last_event_id)
+        except ValueError:
+            return JsonResponse({'detail': 'Parâmetros inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            events.stream(types, customer_id, last_event_id or None),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,72 @@
+"""
+    Aquecimento de processos do servidor (ver server.py) e estado de prontidão.
+"""
+import gc
+import logging
+import os
+import resource
+import threading
+
+from django.apps import apps
+from django.core.cache import cache, caches
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+WARMUP_CACHE_KEY = 'server:warmup'
+
+_ready = threading.Event()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def warm_up_process():
+    """Master, antes do fork: só estado em memória, herdado pelos workers"""
+    from rest_framework.settings import api_settings
+
+    get_resolver().reverse_dict  # popula o URLconf (resolve e reverse)
+    for name in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_RENDERER_CLASSES',
+                 'DEFAULT_PARSER_CLASSES', 'DEFAULT_THROTTLE_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
+    if apps.is_installed('drf_yasg'):
+        from .schema import get_artifact
+
+        get_artifact()
+    # Conexões não podem atravessar o fork: cada worker abre as suas
+    connections.close_all()
+    caches.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def warm_up_worker():
+    """
+        Worker, antes de aceitar conexões: conexões com todos os bancos (mantidas pelo
+        CONN_MAX_AGE) e com o cache. Só fica pronto se os bancos responderem.
+    """
+    healthy = True
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except Exception as exc:
+            logger.warning('Aquecimento: banco %s indisponível (%s)', alias, exc)
+            healthy = False
+    try:
+        cache.get(WARMUP_CACHE_KEY)
+    except Exception as exc:
+        logger.warning('Aquecimento: cache indisponível (%s)', exc)
+    if healthy:
+        _ready.set()
+    return healthy
+
+
+def rss_bytes():
+    """Memória residente atual do processo (pico, fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,15 +50,33 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Customer_api.log.RequestIdMiddleware',
+    'Customer_api.profiling.ProfilingMiddleware',
+    'Customer_api.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Customer_api.middleware.ScopedMiddleware',
 ]
 
+# Middlewares por prefixo de path (vale o primeiro que casar). A API autentica por JWT e
+# não usa sessions, CSRF nem messages; admin e documentação mantêm a pilha completa.
+MIDDLEWARE_SCOPES = [
+    ('/api/', []),
+    ('', [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    ]),
+]
+
+# O admin só procura esses middlewares em MIDDLEWARE; Customer_api.E001 confere os escopos
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+# Tempo próprio de cada middleware de MIDDLEWARE_SCOPES no header Server-Timing
+MIDDLEWARE_TIMING = os.environ.get('MIDDLEWARE_TIMING', '0') == '1'
+
 ROOT_URLCONF = 'Settings.urls'
 
 TEMPLATES = [
@@ -87,6 +107,64 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+
+# Réplicas de leitura (DB_REPLICAS=N cria replica1..replicaN). Localmente são arquivos
+# SQLite atualizados pelo comando `replicate_sqlite`; nos testes espelham o 'default'.
+DATABASE_REPLICAS = [f'replica{i}' for i in range(1, int(os.environ.get('DB_REPLICAS', '0')) + 1)]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICA_HEALTH = {
+    'INTERVAL': 5,   # segundos entre health checks de cada réplica
+    'COOLDOWN': 30,  # segundos fora do pool depois de uma falha
+}
+
+# Shards de FavoriteProduct (FAVORITE_SHARDS=N cria shard0..shardN-1, particionados por
+# hash do customer_id). Sem a variável todos os favoritos ficam no 'default'.
+FAVORITE_SHARDS = [f'shard{i}' for i in range(int(os.environ.get('FAVORITE_SHARDS', '0')))] or ['default']
+for alias in FAVORITE_SHARDS:
+    if alias != 'default':
+        DATABASES[alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_{alias}.sqlite3',
+        }
+
+# Dias de histórico do log de mudanças de favoritos (sincronização incremental);
+# cursores mais antigos recebem 410 e o cliente refaz o snapshot
+FAVORITE_CHANGES_RETENTION_DAYS = int(os.environ.get('FAVORITE_CHANGES_RETENTION_DAYS', '30'))
+
+# Perfil de produção do SQLite (SQLITE_PROFILE=default desliga): WAL para leitores não
+# esperarem escritores, transações IMMEDIATE e pragmas aplicados em cada conexão
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+SQLITE_PRAGMAS = {}
+if SQLITE_PROFILE == 'production':
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,          # ms
+        'cache_size': -64000,          # KiB (64 MB)
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    for database in DATABASES.values():
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            database.setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+# Conexões persistentes: abertas no aquecimento do worker (manage.py serve) e reaproveitadas
+CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE', CONN_MAX_AGE)
+    database.setdefault('CONN_HEALTH_CHECKS', True)
+
+DATABASE_ROUTERS = [
+    'Customer_api.routers.FavoriteShardRouter',
+    'Customer_api.routers.PrimaryReplicaRouter',
+]
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.postgresql',
@@ -143,6 +221,24 @@ REST_FRAMEWORK = {
     }
 }
 
+# Perfil de runtime (RUNTIME_PROFILE=api): workers só com a API, sem documentação, admin,
+# sessions/messages e templates, com menos módulos no boot (ver benchmarks/import_time.py)
+RUNTIME_PROFILE = os.environ.get('RUNTIME_PROFILE', 'full')
+if RUNTIME_PROFILE == 'api':
+    NON_API_APPS = {
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'drf_yasg',
+    }
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in NON_API_APPS]
+    # Só a pilha da API: a pilha completa depende de sessions e messages
+    MIDDLEWARE_SCOPES = [scope for scope in MIDDLEWARE_SCOPES if scope[0] == '/api/']
+    ROOT_URLCONF = 'Settings.urls_api'
+    TEMPLATES = []
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ('rest_framework.renderers.JSONRenderer',)
+
 
 
 # Internationalization
@@ -182,15 +278,67 @@ SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
     'LOGIN_URL': None,
     'LOGOUT_URL': None,
-    'DEFAULT_INFO': 'Settings.urls.schema_view',
+    'DEFAULT_INFO': 'Settings.urls.api_info',
+    'DEFAULT_GENERATOR_CLASS': 'Settings.urls.PublicSchemaGenerator',
+    'SPEC_URL': 'schema-json',
 }
 
+# Documento OpenAPI pré-gerado no deploy (manage.py build_openapi_schema)
+OPENAPI_SCHEMA_PATH = BASE_DIR / 'openapi.json'
+
 REDOC_SETTINGS = {
     'LAZY_RENDERING': False,
     'SPEC_URL': 'swagger.json',
     'HIDE_HOSTNAME': False,
 }
 
+# Servidor de produção (manage.py serve): gunicorn com preload, aquecimento e reciclagem
+SERVE = {
+    'BIND': os.environ.get('SERVE_BIND', '0.0.0.0:8000'),
+    'WORKERS': int(os.environ.get('SERVE_WORKERS', (os.cpu_count() or 1) * 2 + 1)),
+    'MAX_REQUESTS': int(os.environ.get('SERVE_MAX_REQUESTS', '5000')),
+    'MAX_MEMORY_MB': int(os.environ.get('SERVE_MAX_MEMORY_MB', '512')),
+    'READY_FILE': os.environ.get('SERVE_READY_FILE', ''),
+    # Pool ASGI (uvicorn) para o /api/events/; a API REST fica nos workers sync
+    'ASGI': os.environ.get('SERVE_ASGI', '0') == '1',
+}
+
+# Purge dos clientes removidos (manage.py purge_deleted_customers): lotes pequenos com pausa entre transações
+CUSTOMER_PURGE = {
+    'BATCH_SIZE': int(os.environ.get('CUSTOMER_PURGE_BATCH_SIZE', '500')),
+    'PAUSE': float(os.environ.get('CUSTOMER_PURGE_PAUSE', '0.1')),
+}
+
+# Documento materializado do perfil do cliente (/api/customers/<id>/profile/)
+CUSTOMER_PROFILE = {
+    'TTL': int(os.environ.get('CUSTOMER_PROFILE_TTL', 24 * 60 * 60)),
+}
+
+# Header Idempotency-Key nos POSTs: respostas guardadas no cache para os retries dos clientes
+IDEMPOTENCY = {
+    'TTL': int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60)),
+    'LOCK_TIMEOUT': 30,
+    'WAIT': 10,
+}
+
+# Profiling sob demanda: uma fração dos requests ou os que enviarem o header com o token
+PROFILING = {
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', '0')),
+    'HEADER': 'X-Profile',
+    'TOKEN': os.environ.get('PROFILING_TOKEN', ''),
+    # Dumps .prof fora da árvore do projeto (PROFILING_DIRECTORY para um diretório persistente)
+    'DIRECTORY': os.environ.get('PROFILING_DIRECTORY', os.path.join(tempfile.gettempdir(), 'aiqfome-profiles')),
+    'MAX_PROFILES': 50,
+}
+
+# Server-Sent Events (/api/events/): stream no Redis do cache, com replay pelo Last-Event-ID
+EVENTS = {
+    'STREAM': 'events',
+    'MAXLEN': 10_000,
+    'QUEUE_SIZE': 256,
+    'HEARTBEAT': 15,
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -204,22 +352,33 @@ LOGGING = {
             'style': '{',
         },
     },
-    'handlers': {
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+    'filters': {
+        'request_id': {
+            '()': 'Customer_api.log.RequestIdFilter',
+        },
+        # Mantém 1 a cada 20 records DEBUG (os de nível INFO+ passam todos)
+        'sample_debug': {
+            '()': 'Customer_api.log.SamplingFilter',
+            'every': 20,
         },
-        'file': {
+    },
+    'handlers': {
+        # Enfileira o record; formatação JSON e escrita em arquivo rodam em background.
+        # Via '()' e não 'class': a partir do 3.12 o dictConfig trata toda subclasse de
+        # QueueHandler em 'class' como o QueueHandler padrão (chaves handlers/listener)
+        'async': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            '()': 'Customer_api.log.QueueLogHandler',
+            'filters': ['request_id', 'sample_debug'],
             'filename': 'debug.log',
-            'formatter': 'verbose',
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'console': True,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['async'],
             'level': 'DEBUG',
             'propagate': True,
         },
@@ -6,6 +6,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
 from drf_yasg.generators import OpenAPISchemaGenerator
+from Customer_api.schema import SchemaArtifactView
 
 class PublicSchemaGenerator(OpenAPISchemaGenerator):
     def get_schema(self, request=None, public=False):
@@ -16,15 +17,17 @@ class PublicSchemaGenerator(OpenAPISchemaGenerator):
                     del schema.paths[path]
         return schema
 
+api_info = openapi.Info(
+    title="API de Produtos Favoritos",
+    default_version='v1',
+    description="Documentação pública da API",
+    terms_of_service="https://www.suaapi.com/terms/",
+    contact=openapi.Contact(email="contato@suaapi.com"),
+    license=openapi.License(name="BSD License"),
+)
+
 schema_view = get_schema_view(
-    openapi.Info(
-        title="API de Produtos Favoritos",
-        default_version='v1',
-        description="Documentação pública da API",
-        terms_of_service="https://www.suaapi.com/terms/",
-        contact=openapi.Contact(email="contato@suaapi.com"),
-        license=openapi.License(name="BSD License"),
-    ),
+    api_info,
     generator_class=PublicSchemaGenerator,
     public=True,  # Define como True para acesso público
     permission_classes=(permissions.AllowAny,),  # Permite acesso sem autenticação
@@ -35,6 +38,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('Customer_api.urls')),
     # URLs da documentação pública
+    # A UI não introspecta as views; o documento vem do artefato (SWAGGER_SETTINGS['SPEC_URL'])
     path('docs/swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('docs/swagger.json/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+    path('docs/swagger.json/', SchemaArtifactView.as_view(), name='schema-json'),
 ]
\ No newline at end of file
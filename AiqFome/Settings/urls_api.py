@@ -0,0 +1,6 @@
+"""URLs do perfil só-API (RUNTIME_PROFILE=api): sem admin e sem documentação"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/', include('Customer_api.urls')),
+]
@@ -0,0 +1,53 @@
+"""
+    Mede o cálculo de co-ocorrência (recommendations.top_k_cooccurrence) sobre
+    pares (cliente, produto) sintéticos com popularidade de Zipf.
+
+        python benchmarks/co_favorites.py --pairs 10000000 --products 200000
+
+    Não usa banco: os pares são gerados direto em arrays NumPy. Reporta o tempo
+    e o pico de memória residente do processo.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, default=10_000_000)
+    parser.add_argument('--customers', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=200_000)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--block-size', type=int, default=2048)
+    parser.add_argument('--zipf', type=float, default=1.2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    django.setup()
+
+    import numpy as np
+    from Customer_api.recommendations import top_k_cooccurrence
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    customer_ids = rng.integers(1, args.customers + 1, size=args.pairs, dtype=np.int64)
+    product_ids = (rng.zipf(args.zipf, size=args.pairs) - 1) % args.products + 1
+    print(f'{args.pairs} pares gerados em {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    related = top_k_cooccurrence(customer_ids, product_ids, top_k=args.top_k, block_size=args.block_size)
+    elapsed = time.perf_counter() - started
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'{len(related)} produtos com recomendações em {elapsed:.1f}s (pico de memória {peak_mb:.0f} MB)')
+
+
+if __name__ == '__main__':
+    main()
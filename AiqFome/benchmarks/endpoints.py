@@ -0,0 +1,358 @@
+"""
+    Benchmark dos endpoints de Customer_api/urls.py: popula um banco SQLite temporário
+    com volumes realistas (favoritos por cliente com cauda longa) e mede, por endpoint,
+    vazão, latência p50/p95/p99 e o máximo de queries por request.
+
+        python benchmarks/endpoints.py --customers 2000 --requests 200
+        python benchmarks/endpoints.py --check                # CI: compara com o baseline
+        python benchmarks/endpoints.py --update-baseline      # grava o baseline atual
+
+    Os resultados vão em JSON (--output). O baseline (benchmarks/endpoints_baseline.json)
+    guarda, para a mesma escala, o orçamento de queries de cada endpoint (limite rígido,
+    pega N+1) e o p95 de referência. --check falha se um endpoint passar do orçamento; um
+    p95 que piore mais que --threshold e --min-delta-ms ao mesmo tempo só gera aviso, porque
+    o baseline foi medido em outra máquina. Com --fail-on-latency (mesma máquina do
+    baseline) a piora de p95 também falha.
+    Todo endpoint novo precisa entrar em endpoints() (ou em SKIPPED, com o motivo).
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endpoints_baseline.json')
+
+# Endpoints fora do benchmark, com o motivo
+SKIPPED = {
+    ('GET', 'event-stream'): 'conexão SSE de longa duração (ver benchmarks/sse_idle.py)',
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def configure(directory):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES = {'default': {
+        **settings.DATABASES['default'], 'NAME': os.path.join(directory, 'db.sqlite3'), 'CONN_MAX_AGE': None,
+    }}
+    settings.FAVORITE_SHARDS = ['default']
+    settings.DATABASE_REPLICAS = []
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    # Hash de senha rápido: mede o endpoint, não o PBKDF2
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    settings.PROFILING = {**settings.PROFILING, 'DIRECTORY': os.path.join(directory, 'profiles')}
+    settings.LOGGING = {'version': 1, 'disable_existing_loggers': False, 'root': {'level': 'WARNING'}}
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    django.setup()
+
+
+def seed(args, rng):
+    """Clientes, produtos e favoritos (Pareto por cliente, Zipf por produto) com bulk_create"""
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from Customer_api import catalog, search
+    from Customer_api.models import Customer, FavoriteProduct, Product
+    from Customer_api.profiling import get_store
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    User = get_user_model()
+    user = User.objects.create_user(username='bench', password='bench')
+    staff = User.objects.create_user(username='bench-staff', password='bench', is_staff=True)
+
+    categories = ["men's clothing", "women's clothing", 'jewelery', 'electronics']
+    Product.objects.bulk_create([
+        Product(api_id=i, title=f'Produto {i} {rng.choice(categories)}', price=rng.randint(100, 100_000) / 100,
+                description=f'Descrição do produto {i}', category=rng.choice(categories),
+                image_url=f'https://example.com/{i}.jpg', rating_rate=rng.randint(10, 50) / 10,
+                rating_count=rng.randint(0, 500))
+        for i in range(1, args.products + 1)
+    ], batch_size=1000)
+    search.rebuild_index()
+    catalog.rebuild_category_facets()
+    product_ids = list(Product.objects.values_list('id', flat=True))
+
+    Customer.objects.bulk_create([
+        Customer(name=f'Cliente {i}', email=f'cliente{i}@example.com') for i in range(args.customers)
+    ], batch_size=1000)
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(product_ids) + 1)))
+    favorites, counts = [], {}
+    for customer_id in customer_ids:
+        count = min(int(rng.paretovariate(1.2)) - 1, args.max_favorites)
+        chosen = set(rng.choices(product_ids, cum_weights=weights, k=count)) if count > 0 else set()
+        counts[customer_id] = len(chosen)
+        favorites += [FavoriteProduct(customer_id=customer_id, product_id_id=product_id) for product_id in chosen]
+    FavoriteProduct.objects.bulk_create(favorites, batch_size=1000)
+    call_command('compute_related_products', stdout=io.StringIO())
+
+    profile = get_store().save({'method': 'GET', 'path': '/api/products/', 'status': 200, 'duration_ms': 1.0,
+                                'created': time.time(), 'top_functions': [], 'collapsed': ''})
+    heavy = max(counts, key=counts.get)
+    return {
+        'user': user,
+        'staff': staff,
+        'customer': heavy,
+        'customer_favorites': counts[heavy],
+        'product': product_ids[0],
+        'favorite_product': FavoriteProduct.objects.filter(customer_id=heavy).values_list('product_id', flat=True)[0],
+        'profile': profile,
+        'batch': ','.join(str(customer_id) for customer_id in [heavy, *customer_ids[:49]]),
+        'favorites': len(favorites),
+    }
+
+
+def fake_products(counter):
+    """Resposta da fakestoreapi com produtos novos a cada chamada (o import insere de verdade)"""
+    def get(url, *args, **kwargs):
+        start = next(counter) * 20 + 10_000_000
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [
+            {'id': api_id, 'title': f'Importado {api_id}', 'price': 9.9, 'description': 'Importado',
+             'category': 'electronics', 'image': f'https://example.com/{api_id}.jpg',
+             'rating': {'rate': 4.0, 'count': 10}}
+            for api_id in range(start, start + 20)
+        ]
+        return response
+    return get
+
+
+def new_customer(index):
+    from Customer_api.models import Customer
+
+    return Customer.objects.create(name='Temporário', email=f'temp{index}@example.com').id
+
+
+def new_favorite(ctx, index):
+    from Customer_api.models import FavoriteProduct
+
+    customer_id = new_customer(f'fav{index}')
+    FavoriteProduct.objects.create(customer_id=customer_id, product_id_id=ctx['product'])
+    return {'customer_id': customer_id, 'product_id': ctx['product']}
+
+
+def endpoints(ctx):
+    """
+        (método, nome da URL, usuário, preparo) -> o preparo roda fora da medição e devolve
+        (kwargs da URL, query string, body, status esperado) para a iteração `i`.
+    """
+    customer, product, refresh = ctx['customer'], ctx['product'], ctx['refresh']
+    return [
+        ('POST', 'register', None, lambda i: ({}, {}, {'username': f'novo{i}', 'password': 'senha123'}, 201)),
+        ('POST', 'token_obtain_pair', None, lambda i: ({}, {}, {'username': 'bench', 'password': 'bench'}, 200)),
+        ('POST', 'token_refresh', None, lambda i: ({}, {}, {'refresh': refresh}, 200)),
+        ('GET', 'Customer-list-create', 'user', lambda i: ({}, {}, None, 200)),
+        ('POST', 'Customer-list-create', 'user',
+         lambda i: ({}, {}, {'name': 'Novo', 'email': f'novo{i}@example.com'}, 201)),
+        ('GET', 'Customer-detail', 'user', lambda i: ({'id': customer}, {}, None, 200)),
+        ('PUT', 'Customer-detail', 'user',
+         lambda i: ({'id': customer}, {}, {'name': f'Cliente {i}', 'email': 'pesado@example.com'}, 200)),
+        ('PATCH', 'Customer-detail', 'user', lambda i: ({'id': customer}, {}, {'name': f'Cliente {i}'}, 200)),
+        ('DELETE', 'Customer-detail', 'user', lambda i: ({'id': new_customer(i)}, {}, None, 202)),
+        ('GET', 'Customer-batch', 'user', lambda i: ({}, {'ids': ctx['batch'], 'favorites': 'true'}, None, 200)),
+        ('GET', 'Customer-profile', 'user', lambda i: ({'id': customer}, {}, None, 200)),
+        ('POST', 'import-products', 'user', lambda i: ({}, {}, None, 201)),
+        ('GET', 'product-list', 'user', lambda i: ({}, {'category': 'electronics'}, None, 200)),
+        ('GET', 'product-search', 'user', lambda i: ({}, {'q': 'produto'}, None, 200)),
+        ('GET', 'product-popular', 'user', lambda i: ({}, {}, None, 200)),
+        ('GET', 'product-related', 'user', lambda i: ({'id': product}, {}, None, 200)),
+        ('GET', 'favorite-list', 'user', lambda i: ({'Customer_id': customer}, {}, None, 200)),
+        ('POST', 'favorite-list', 'user',
+         lambda i: ({'Customer_id': new_customer(f'post{i}')}, {}, {'product_id': product}, 201)),
+        ('GET', 'favorite-changes', 'user', lambda i: ({'Customer_id': customer}, {}, None, 200)),
+        ('GET', 'favorite-detail', 'user',
+         lambda i: ({'customer_id': customer, 'product_id': ctx['favorite_product']}, {}, None, 200)),
+        ('PUT', 'favorite-detail', 'user',
+         lambda i: ({'customer_id': customer, 'product_id': ctx['favorite_product']}, {}, {}, 200)),
+        ('PATCH', 'favorite-detail', 'user',
+         lambda i: ({'customer_id': customer, 'product_id': ctx['favorite_product']}, {}, {}, 200)),
+        ('DELETE', 'favorite-detail', 'user', lambda i: (new_favorite(ctx, i), {}, None, 204)),
+        ('GET', 'health-ready', None, lambda i: ({}, {}, None, 200)),
+        ('GET', 'profile-list', 'staff', lambda i: ({}, {}, None, 200)),
+        ('GET', 'profile-detail', 'staff', lambda i: ({'name': ctx['profile']}, {}, None, 200)),
+    ]
+
+
+def url_endpoints():
+    """(método, nome) de todas as rotas de Customer_api/urls.py"""
+    from Customer_api.urls import urlpatterns
+
+    found = set()
+    for pattern in urlpatterns:
+        view = pattern.callback.view_class
+        for method in ('get', 'post', 'put', 'patch', 'delete'):
+            if hasattr(view, method):
+                found.add((method.upper(), pattern.name))
+    return found
+
+
+def measure(client, method, url, query, body, expected, headers):
+    from django.db import connection
+
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        if method == 'GET':
+            response = client.get(url, query, headers=headers)
+        else:
+            response = getattr(client, method.lower())(url, body, content_type='application/json', headers=headers)
+        elapsed = time.perf_counter() - started
+    if response.status_code != expected:
+        sys.exit(f'{method} {url}: status {response.status_code} (esperado {expected}): {response.content[:300]!r}')
+    return elapsed, queries
+
+
+def run(args):
+    from django.test import Client
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    ctx = seed(args, rng)
+    seed_seconds = time.perf_counter() - started
+    ctx['refresh'] = str(RefreshToken.for_user(ctx['user']))
+    tokens = {
+        name: {'Authorization': f"Bearer {RefreshToken.for_user(ctx[name]).access_token}"}
+        for name in ('user', 'staff')
+    }
+
+    specs = endpoints(ctx)
+    missing = url_endpoints() - {(method, name) for method, name, _, _ in specs} - set(SKIPPED)
+    if missing:
+        sys.exit('Endpoints sem benchmark: ' + ', '.join(f'{m} {n}' for m, n in sorted(missing)))
+
+    client = Client()
+    counter = itertools.count()
+    results = {}
+    with mock.patch('Customer_api.views.requests.get', side_effect=fake_products(counter)):
+        for method, name, user, prepare in specs:
+            if args.only and name not in args.only:
+                continue
+            headers = tokens.get(user, {})
+            timings, max_queries = [], 0
+            for i in range(args.warmup + args.requests):
+                kwargs, query, body, expected = prepare(i)
+                elapsed, queries = measure(client, method, reverse(name, kwargs=kwargs), query, body, expected, headers)
+                if i >= args.warmup:
+                    timings.append(elapsed * 1000)
+                    max_queries = max(max_queries, queries)
+            results[f'{method} {name}'] = {
+                'requests': len(timings),
+                'rps': round(len(timings) / (sum(timings) / 1000), 1),
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'max_queries': max_queries,
+            }
+    return {
+        'scale': scale(args),
+        'seed_seconds': round(seed_seconds, 2),
+        'favorites': ctx['favorites'],
+        'heaviest_customer_favorites': ctx['customer_favorites'],
+        'endpoints': results,
+    }
+
+
+def scale(args):
+    return {'customers': args.customers, 'products': args.products,
+            'max_favorites': args.max_favorites, 'seed': args.seed}
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """(regressões de queries, regressões de p95) de `results` em relação ao baseline"""
+    if baseline.get('scale') != results['scale']:
+        return [f"Escala diferente do baseline: {results['scale']} != {baseline.get('scale')}"], []
+    errors, slower = [], []
+    for key, current in results['endpoints'].items():
+        reference = baseline['endpoints'].get(key)
+        if reference is None:
+            errors.append(f'{key}: sem baseline (rode --update-baseline)')
+            continue
+        if current['max_queries'] > reference['max_queries']:
+            errors.append(f"{key}: {current['max_queries']} queries > orçamento de {reference['max_queries']}")
+        delta = current['p95_ms'] - reference['p95_ms']
+        if delta > min_delta_ms and current['p95_ms'] > reference['p95_ms'] * (1 + threshold):
+            slower.append(f"{key}: p95 {current['p95_ms']:.1f} ms > baseline {reference['p95_ms']:.1f} ms "
+                          f"(+{threshold:.0%})")
+    return errors, slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--max-favorites', type=int, default=500, help='teto de favoritos por cliente')
+    parser.add_argument('--requests', type=int, default=100, help='requests medidos por endpoint')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', action='append', help='nome da URL (repetível)')
+    parser.add_argument('--output', help='grava os resultados em JSON')
+    parser.add_argument('--check', action='store_true', help='compara com o baseline e sai com erro se regredir')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=1.0, help='piora relativa tolerada no p95 (1.0 = 2x)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='piora absoluta tolerada no p95')
+    parser.add_argument('--fail-on-latency', action='store_true',
+                        help='com --check, a piora de p95 também falha (só na máquina que gravou o baseline)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure(directory)
+        results = run(args)
+
+    print(f"{results['favorites']} favoritos (cliente mais pesado: {results['heaviest_customer_favorites']}), "
+          f"carga em {results['seed_seconds']}s")
+    print(f"{'endpoint':<34} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}")
+    for key, row in results['endpoints'].items():
+        print(f"{key:<34} {row['rps']:>8.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {row['max_queries']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as output:
+            json.dump({'scale': results['scale'], 'endpoints': {
+                key: {'max_queries': row['max_queries'], 'p95_ms': row['p95_ms']}
+                for key, row in results['endpoints'].items()
+            }}, output, indent=2)
+            output.write('\n')
+        print(f'Baseline gravado em {BASELINE_FILE}')
+    if args.check:
+        with open(BASELINE_FILE, encoding='utf-8') as baseline_file:
+            errors, slower = compare(results, json.load(baseline_file), args.threshold, args.min_delta_ms)
+        if args.fail_on_latency:
+            errors += slower
+        elif slower:
+            print('Aviso, p95 acima do baseline (outra máquina, não falha):\n  ' + '\n  '.join(slower))
+        if errors:
+            print('Regressões em relação ao baseline:\n  ' + '\n  '.join(errors))
+            sys.exit(1)
+        print('Dentro do baseline')
+
+
+if __name__ == '__main__':
+    main()
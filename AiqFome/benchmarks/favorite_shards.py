@@ -0,0 +1,99 @@
+"""
+    Mede a vazão de escrita de favoritos (um INSERT por transação, como um POST
+    em /favorites/) com 1, 2 e 4 shards SQLite locais.
+
+        python benchmarks/favorite_shards.py --shards 1 2 4 --threads 8 --writes 500
+
+    Cada quantidade de shards roda em um subprocesso com bancos temporários.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def run_once(shards, threads, writes, directory):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    from django.conf import settings
+
+    aliases = [f'shard{i}' for i in range(shards)]
+    settings.DATABASES = {
+        alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, f'{alias}.sqlite3')}
+        for alias in ['default'] + aliases
+    }
+    settings.FAVORITE_SHARDS = aliases
+    settings.DATABASE_REPLICAS = []
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+    from Customer_api.models import FavoriteProduct
+
+    for alias in settings.DATABASES:
+        call_command('migrate', run_syncdb=True, database=alias, verbosity=0)
+
+    errors = []
+
+    def writer(worker):
+        try:
+            for i in range(writes):
+                customer_id = worker * writes + i + 1
+                FavoriteProduct.objects.create(customer_id=customer_id, product_id_id=i % 20 + 1)
+        except Exception as exc:
+            errors.append(repr(exc))
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'shards': shards,
+        'writes': threads * writes,
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(threads * writes / elapsed, 1),
+        'errors': errors[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=500, help='escritas por thread')
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        with tempfile.TemporaryDirectory() as directory:
+            print(json.dumps(run_once(args.run, args.threads, args.writes, directory)))
+        return
+
+    for shards in args.shards:
+        output = subprocess.run(
+            [sys.executable, __file__, '--run', str(shards), '--threads', str(args.threads),
+             '--writes', str(args.writes)],
+            capture_output=True, text=True, check=True, cwd=BASE_DIR,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['shards']} shard(s): {result['writes_per_second']:>9.1f} escritas/s "
+              f"({result['writes']} em {result['seconds']}s)")
+        for error in result['errors']:
+            print(f'    erro: {error}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+    Tempo de boot de um worker por perfil de runtime (RUNTIME_PROFILE), medido com
+    `python -X importtime` em processos novos: django.setup(), aplicação WSGI
+    (middlewares) e URLconf com todas as views importadas.
+
+        python benchmarks/import_time.py --runs 5
+        python benchmarks/import_time.py --check     # CI: compara o perfil api com o full
+
+    As execuções dos perfis são intercaladas e o --check é relativo ao perfil de
+    referência medido na mesma máquina (benchmarks/import_budget.json): proporção de
+    módulos carregados e módulos proibidos, ambos determinísticos. O tempo varia ±30%
+    entre execuções em runners compartilhados, mais que a diferença entre os perfis:
+    a razão mediana dos tempos (soma do self-time do -X importtime) só gera aviso.
+
+    O perfil api carrega ~6% menos módulos e economiza ~8% do tempo de import: o que é
+    caro fica nos dois perfis (requests, pelas views; django.test, pelo
+    rest_framework_simplejwt.settings; yaml, pelo rest_framework.compat; e o admin, que o
+    rest_framework.views importa via rest_framework.schemas e admindocs).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+PROFILES = ('full', 'api')
+
+BOOT = """
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import json, sys
+print(json.dumps(sorted(sys.modules)))
+"""
+
+LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """Tempo total de import em ms a partir da saída do -X importtime"""
+    total_us = 0
+    for line in stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match and len(match.group(3)) == 1:  # nível superior: o cumulativo já inclui os filhos
+            total_us += int(match.group(2))
+    return total_us / 1000
+
+
+def boot(profile):
+    env = {**os.environ, 'RUNTIME_PROFILE': profile}
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f'Boot do perfil {profile} falhou:\n{result.stderr[-2000:]}')
+    # Os módulos vêm do sys.modules no fim do boot (o -X importtime não lista todos)
+    return parse_importtime(result.stderr), set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def measure(profiles, runs):
+    """{perfil: ([ms de cada execução], módulos)}, com as execuções dos perfis intercaladas"""
+    timings = {profile: [] for profile in profiles}
+    modules = {}
+    # Uma rodada extra de aquecimento (compila .pyc e esquenta o cache de disco)
+    for run in range(runs + 1):
+        # Ordem alternada: nenhum perfil fica sempre com o cache mais quente
+        for profile in (profiles if run % 2 else profiles[::-1]):
+            elapsed_ms, modules[profile] = boot(profile)
+            if run:
+                timings[profile].append(elapsed_ms)
+    return {profile: (timings[profile], modules[profile]) for profile in profiles}
+
+
+def time_ratio(results, profile, reference):
+    """Mediana das razões de tempo entre o perfil e a referência, execução a execução"""
+    return statistics.median(
+        elapsed / reference_elapsed
+        for elapsed, reference_elapsed in zip(results[profile][0], results[reference][0])
+    )
+
+
+def check(results, budget):
+    """(erros, avisos): erros para os limites determinísticos, avisos para o tempo"""
+    reference = budget['reference']
+    errors, warnings = [], []
+    for profile, limits in budget['profiles'].items():
+        modules = results[profile][1]
+        modules_ratio = len(modules) / len(results[reference][1])
+        if modules_ratio > limits.get('max_modules_ratio', float('inf')):
+            errors.append(
+                f"{profile}: {len(modules)} módulos, {modules_ratio:.1%} dos do {reference} "
+                f"(máximo {limits['max_modules_ratio']:.0%})"
+            )
+        for forbidden in limits.get('forbidden', []):
+            loaded = sorted(name for name in modules if name == forbidden or name.startswith(forbidden + '.'))
+            if loaded:
+                errors.append(f"{profile}: {forbidden} não deveria ser importado ({', '.join(loaded[:3])})")
+        ratio = time_ratio(results, profile, reference)
+        if ratio > limits.get('warn_time_ratio', float('inf')):
+            warnings.append(f'{profile}: import {ratio:.2f}x o do {reference} (mediana das razões)')
+    return errors, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--profile', action='append', choices=PROFILES, dest='profiles')
+    parser.add_argument('--check', action='store_true', help='Compara os perfis com a referência de import_budget.json e sai com erro se estourar')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE, encoding='utf-8') as budget_file:
+        budget = json.load(budget_file)
+    profiles = list(dict.fromkeys(args.profiles or PROFILES))
+    if args.check:
+        profiles = list(dict.fromkeys([budget['reference'], *budget['profiles'], *profiles]))
+
+    results = measure(profiles, args.runs)
+    for profile, (timings, modules) in results.items():
+        print(f'{profile:>5}: {statistics.median(timings):7.1f} ms de import (mediana de {args.runs}), {len(modules)} módulos')
+
+    if args.check:
+        errors, warnings = check(results, budget)
+        for warning in warnings:
+            print(f'Aviso: {warning}')
+        if errors:
+            print('Orçamento de boot estourado:\n  ' + '\n  '.join(errors))
+            sys.exit(1)
+        print('Dentro do orçamento')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+    Compara a latência por request do logging síncrono antigo
+    (StreamHandler + FileHandler no thread do request) com o pipeline
+    QueueLogHandler (fila + listener em background, JSON).
+
+        python benchmarks/logging_p99.py --requests 5000 --records 30 --io-ms 1 --sample-every 20
+
+    Os dois lados usam a mesma amostragem de DEBUG (--sample-every; 1 desliga), para
+    a diferença medir só a fila e não quantos records cada lado descarta.
+
+    Cada request simulado faz uma espera de I/O (banco, rede), como um request
+    real; é nessa janela que a listener grava sem competir pelo GIL.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Customer_api.log import QueueLogHandler, RequestIdFilter, SamplingFilter  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def build_sync_logger(directory, stream, sample_every):
+    logger = logging.getLogger('bench.sync')
+    formatter = logging.Formatter('{levelname} {asctime} {module} {message}', style='{')
+    # Filtro no logger: o record descartado não chega a nenhum dos dois handlers
+    logger.addFilter(SamplingFilter(every=sample_every))
+    for handler in (logging.StreamHandler(stream), logging.FileHandler(os.path.join(directory, 'sync.log'))):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def build_async_logger(directory, stream, sample_every):
+    logger = logging.getLogger('bench.async')
+    handler = QueueLogHandler(filename=os.path.join(directory, 'async.log'), console=False)
+    # O console também fica na listener, apontado para o mesmo destino do modo síncrono
+    console = logging.StreamHandler(stream)
+    console.setFormatter(handler.listener.handlers[0].formatter)
+    handler.listener.handlers += (console,)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter(every=sample_every))
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def run(logger, requests, records, io_wait):
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        for j in range(records):
+            logger.debug('request %s: passo %s (%s)', i, j, {'customer': i % 100})
+            if j == records // 2 and io_wait:
+                time.sleep(io_wait)
+        logger.info('request %s concluído', i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label, latencies):
+    print(f'{label:<8} p50={percentile(latencies, 50) * 1e6:9.1f}us '
+          f'p95={percentile(latencies, 95) * 1e6:9.1f}us '
+          f'p99={percentile(latencies, 99) * 1e6:9.1f}us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--records', type=int, default=30, help='records DEBUG por request')
+    parser.add_argument('--io-ms', type=float, default=1.0, help='espera de I/O simulada por request')
+    parser.add_argument('--sample-every', type=int, default=20,
+                        help='mantém 1 a cada N records DEBUG nos dois lados (1 = todos)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+        sync_logger = build_sync_logger(directory, devnull, args.sample_every)
+        async_logger, handler = build_async_logger(directory, devnull, args.sample_every)
+        for logger in (sync_logger, async_logger):
+            logger.setLevel(logging.DEBUG)
+            logger.propagate = False
+
+        io_wait = args.io_ms / 1000
+        report('sync', run(sync_logger, args.requests, args.records, io_wait))
+        report('async', run(async_logger, args.requests, args.records, io_wait))
+        handler.close()
+        if handler.dropped:
+            print(f'async: {handler.dropped} records descartados (fila cheia)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+    Compara a busca FTS5 (/api/products/search/) com icontains em title,
+    description e category sobre um catálogo sintético.
+
+        python benchmarks/product_search.py --products 1000000 --queries 50
+
+    Usa um banco SQLite temporário; a carga dos produtos é feita com INSERTs em lote.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+SYLLABLES = 'ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo ga go la le li lo lu ma me mi mo mu na ne ni no pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi'.split()
+CATEGORIES = ["men's clothing", "women's clothing", 'jewelery', 'electronics']
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--vocabulary', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES = {'default': {**settings.DATABASES['default'], 'NAME': os.path.join(directory, 'db.sqlite3')}}
+    settings.FAVORITE_SHARDS = ['default']
+    settings.DATABASE_REPLICAS = []
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from django.db.models import Q
+    from Customer_api import search
+    from Customer_api.models import Product
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    rng = random.Random(args.seed)
+
+    # Vocabulário com distribuição de Zipf, como em títulos e descrições reais
+    vocabulary = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(args.vocabulary)})
+    rng.shuffle(vocabulary)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def words(count):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+
+    started = time.perf_counter()
+    table = Product._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        batch = []
+        for i in range(1, args.products + 1):
+            title = words(4)
+            description = words(25)
+            batch.append((i, title, 10 + i % 500, description, rng.choice(CATEGORIES), 'http://example.com/p.jpg'))
+            if len(batch) == 10_000 or i == args.products:
+                cursor.executemany(
+                    f'INSERT INTO {table} (api_id, title, price, description, category, image_url) '
+                    f'VALUES (%s, %s, %s, %s, %s, %s)', batch
+                )
+                batch = []
+    print(f'{args.products} produtos carregados em {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        search.rebuild_index()
+    print(f'índice FTS5 construído em {time.perf_counter() - started:.1f}s')
+
+    # Termos de frequência média/baixa (os 100 mais comuns ficam de fora), às vezes só o prefixo
+    queries = []
+    for _ in range(args.queries):
+        terms = rng.sample(vocabulary[100:], rng.choice([1, 2]))
+        queries.append(' '.join(term[:max(4, len(term) - rng.randint(0, 2))] for term in terms))
+
+    def run_icontains(query):
+        filters = Q()
+        for token in query.split():
+            filters &= Q(title__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token)
+        return list(Product.objects.filter(filters).order_by('id')[:20])
+
+    def run_fts(query):
+        return search.search_products(query, limit=20)[0]
+
+    for label, func in (('icontains', run_icontains), ('fts5', run_fts)):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            func(query)
+            latencies.append(time.perf_counter() - started)
+        print(f'{label:<10} p50={statistics.median(latencies) * 1000:8.2f}ms '
+              f'p95={percentile(latencies, 95) * 1000:8.2f}ms max={max(latencies) * 1000:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
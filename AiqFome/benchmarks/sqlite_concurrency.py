@@ -0,0 +1,128 @@
+"""
+    Leitores e escritores concorrentes no SQLite, antes e depois do perfil de
+    produção (WAL + pragmas + transações IMMEDIATE + retry com jitter).
+
+        python benchmarks/sqlite_concurrency.py --readers 4 --writers 4 --seconds 5
+
+    Cada perfil roda em um subprocesso com um banco temporário.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+PROFILES = ['default', 'production']
+
+
+def run_once(profile, readers, writers, seconds, directory):
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES = {'default': {**settings.DATABASES['default'], 'NAME': os.path.join(directory, 'db.sqlite3')}}
+    settings.FAVORITE_SHARDS = ['default']
+    settings.DATABASE_REPLICAS = []
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, connections, transaction
+    from Customer_api.models import Customer, FavoriteProduct, Product
+    from Customer_api.sqlite import retry_on_lock
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    Customer.objects.bulk_create(Customer(name=f'Cliente {i}', email=f'c{i}@example.com') for i in range(2000))
+    Product.objects.bulk_create(
+        Product(api_id=i, title=f'Produto {i}', price=10, description='-', category='c',
+                image_url='http://example.com/p.jpg')
+        for i in range(1, 201)
+    )
+
+    def add_favorite(customer_id, product_id):
+        with transaction.atomic():
+            if not FavoriteProduct.objects.filter(customer_id=customer_id, product_id=product_id).exists():
+                FavoriteProduct.objects.create(customer_id=customer_id, product_id_id=product_id)
+
+    if profile == 'production':
+        add_favorite = retry_on_lock(add_favorite)
+
+    deadline = time.perf_counter() + seconds
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader(worker):
+        i = worker
+        while time.perf_counter() < deadline:
+            try:
+                customer_id = i % 2000 + 1
+                list(Customer.objects.order_by('id')[customer_id:customer_id + 20])
+                FavoriteProduct.objects.filter(customer_id=customer_id).count()
+                count('reads')
+            except OperationalError:
+                count('errors')
+            i += readers
+        connections.close_all()
+
+    def writer(worker):
+        i = worker
+        while time.perf_counter() < deadline:
+            try:
+                add_favorite(i % 2000 + 1, i % 200 + 1)
+                count('writes')
+            except OperationalError:
+                count('errors')
+            i += writers
+        connections.close_all()
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'profile': profile,
+        'reads_per_second': round(counts['reads'] / seconds, 1),
+        'writes_per_second': round(counts['writes'] / seconds, 1),
+        'lock_errors': counts['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--run', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        with tempfile.TemporaryDirectory() as directory:
+            print(json.dumps(run_once(args.run, args.readers, args.writers, args.seconds, directory)))
+        return
+
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--run', profile, '--readers', str(args.readers),
+             '--writers', str(args.writers), '--seconds', str(args.seconds)],
+            capture_output=True, text=True, check=True, cwd=BASE_DIR,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['profile']:<11} leituras/s={result['reads_per_second']:>9.1f} "
+              f"escritas/s={result['writes_per_second']:>8.1f} erros de lock={result['lock_errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+    Custo de assinantes SSE ociosos em um worker: abre N geradores events.stream()
+    no mesmo event loop, espera alguns segundos sem eventos e mede o tempo de CPU
+    do processo; depois publica um evento e mede o tempo até todos o receberem.
+
+        python benchmarks/sse_idle.py --subscribers 5000 --idle 10
+
+    Usa o backend em memória (sem Redis), o mesmo caminho de fan-out do worker.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+async def run(args):
+    from Customer_api import events
+
+    streams = [events.stream() for _ in range(args.subscribers)]
+    for stream in streams:
+        await anext(stream)  # "retry:"
+
+    async def next_event(stream):
+        while not (chunk := await anext(stream)).startswith('id:'):
+            pass
+
+    pending = [asyncio.ensure_future(next_event(stream)) for stream in streams]
+    await asyncio.sleep(0.5)
+
+    cpu = time.process_time()
+    await asyncio.sleep(args.idle)
+    cpu = time.process_time() - cpu
+    print(f'{args.subscribers} assinantes ociosos por {args.idle}s: {cpu * 1000:.0f} ms de CPU '
+          f'({cpu / args.idle * 100:.2f}% de um core)')
+
+    started = time.perf_counter()
+    events.publish('favorite', {'customer_id': 1, 'product_id': 1, 'action': 'add'})
+    await asyncio.gather(*pending)
+    print(f'Evento entregue a todos em {(time.perf_counter() - started) * 1000:.1f} ms')
+
+    for stream in streams:
+        await stream.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--idle', type=float, default=10)
+    parser.add_argument('--heartbeat', type=int, default=15)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Settings.settings')
+    import django
+    from django.conf import settings
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.EVENTS = {**settings.EVENTS, 'HEARTBEAT': args.heartbeat, 'QUEUE_SIZE': 16}
+    django.setup()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()